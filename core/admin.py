@@ -1,59 +1,278 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .forms import UsuarioAdminForm
 from .models import (
     Ingreso, Empresa, CentroCosto, Clasificacion, 
-    Egreso, CajaChica, Trabajador, Cargo, Perfil
+    Egreso, CajaChica, Trabajador, Cargo, Perfil, OperacionMasivaTrabajadores, Conciliacion,
+    PosibleDuplicado, opciones_catalogo
 )
 
+# --- 0. BASE: LISTADOS CON CONSULTAS CONSTANTES ---
+# Sin filtros, sobre esta cantidad de filas (estimada por PostgreSQL) no se hace COUNT(*)
+CONTEO_EXACTO_HASTA = getattr(settings, 'ADMIN_CONTEO_EXACTO_HASTA', 10000)
+# Catálogos más largos que esto no se listan en el filtro lateral: se usa la búsqueda
+MAX_OPCIONES_FILTRO = getattr(settings, 'ADMIN_MAX_OPCIONES_FILTRO', 50)
+
+
+def _filas_estimadas(queryset):
+    """Filas según las estadísticas de PostgreSQL (pg_class), sumando las particiones (core/particiones.py)."""
+    tabla = queryset.model._meta.db_table
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            "SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint FROM pg_class c "
+            "WHERE c.oid = to_regclass(%s) "
+            "OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))",
+            [tabla, tabla],
+        )
+        return cursor.fetchone()[0]
+
+
+class ConteoEstimadoPaginator(Paginator):
+    """El listado sin filtros de una tabla grande usa el conteo estimado en vez de COUNT(*)."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where and connections[queryset.db].vendor == 'postgresql':
+            estimado = _filas_estimadas(queryset)
+            if estimado > CONTEO_EXACTO_HASTA:
+                return estimado
+        return super().count
+
+
+class FiltroCatalogo(admin.SimpleListFilter):
+    """
+    Filtro lateral por una FK a un catálogo (Empresa, CentroCosto, ...). Las opciones
+    salen de opciones_catalogo() (cache), no de una consulta por página; si el
+    catálogo es muy largo no se listan, pero el filtro de la URL sigue aplicando.
+    """
+    campo = None
+    modelo = None
+
+    def lookups(self, request, model_admin):
+        opciones = opciones_catalogo(self.modelo)
+        return opciones if len(opciones) <= MAX_OPCIONES_FILTRO else []
+
+    def queryset(self, request, queryset):
+        if self.value():
+            try:
+                return queryset.filter(**{f'{self.campo}_id': int(self.value())})
+            except ValueError:
+                raise IncorrectLookupParameters
+        return queryset
+
+
+def filtro_catalogo(campo, modelo):
+    # Mismo parámetro de URL que el filtro por defecto de Django (?empresa__id__exact=3)
+    return type(f'Filtro{modelo.__name__}', (FiltroCatalogo,), {
+        'campo': campo, 'modelo': modelo, 'title': modelo._meta.verbose_name,
+        'parameter_name': f'{campo}__id__exact',
+    })
+
+
+class AdminRapido(admin.ModelAdmin):
+    """
+    Base de los admins de core: sin el segundo COUNT(*) de "n de N resultados",
+    conteo estimado en tablas grandes y select_related de las FK que muestra
+    list_display (Django solo sigue las FK no nulas).
+    """
+    show_full_result_count = False
+    paginator = ConteoEstimadoPaginator
+
+    def get_list_select_related(self, request):
+        if self.list_select_related is not False:
+            return self.list_select_related
+        relacionadas = []
+        for nombre in self.get_list_display(request):
+            try:
+                campo = self.model._meta.get_field(nombre)
+            except (FieldDoesNotExist, TypeError):
+                continue
+            if campo.many_to_one or campo.one_to_one:
+                relacionadas.append(nombre)
+        return tuple(relacionadas)
+
 # --- 1. CONFIGURACIÓN DE USUARIO (Con Script de RUT) ---
 admin.site.unregister(User) # Quitamos el admin original
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(AdminRapido, UserAdmin):
     # Hemos eliminado la clase Media y el js.
     # Ahora se comporta como el admin por defecto de Django.
-    pass
+    form = UsuarioAdminForm  # correo único sin distinguir mayúsculas (ver core/backends.py)
 
 # --- 2. CONFIGURACIÓN DE INGRESOS ---
 @admin.register(Ingreso)
-class IngresoAdmin(admin.ModelAdmin):
+class IngresoAdmin(AdminRapido):
     list_display = ('fecha', 'n_documento', 'monto_transferencia', 'empresa', 'estado', 'centro_costo')
     search_fields = ('n_documento', 'empresa__nombre')
-    list_filter = ('estado', 'empresa', 'centro_costo', 'fecha')
+    list_filter = (
+        'estado', 'requiere_revision', 'clasificado_por_ia',
+        filtro_catalogo('empresa', Empresa), filtro_catalogo('centro_costo', CentroCosto),
+    )
+    date_hierarchy = 'fecha'  # indexada; los rangos por año descartan particiones
+    autocomplete_fields = ('empresa', 'centro_costo', 'clasificacion')
     list_per_page = 50
 
 # --- 3. CONFIGURACIÓN DE TRABAJADORES ---
 @admin.register(Trabajador)
-class TrabajadorAdmin(admin.ModelAdmin):
+class TrabajadorAdmin(AdminRapido):
     list_display = ('nombre', 'rut', 'cargo', 'empresa', 'estado')
     search_fields = ('nombre', 'rut')
-    list_filter = ('empresa', 'estado')
+    list_filter = (filtro_catalogo('empresa', Empresa), 'estado')
+    autocomplete_fields = ('empresa', 'cargo')
+
+@admin.register(OperacionMasivaTrabajadores)
+class OperacionMasivaTrabajadoresAdmin(AdminRapido):
+    list_display = ('fecha', 'accion', 'cantidad', 'usuario')
+    list_filter = ('accion',)
+    readonly_fields = ('fecha', 'usuario', 'accion', 'criterio', 'cambios', 'cantidad', 'detalle')
+
+    def has_add_permission(self, request):
+        return False
 
 # --- 4. CONFIGURACIÓN DE CAJA CHICA ---
 @admin.register(CajaChica)
-class CajaChicaAdmin(admin.ModelAdmin):
+class CajaChicaAdmin(AdminRapido):
     list_display = ('fecha', 'responsable', 'monto', 'tipo_documento', 'descripcion')
     list_filter = ('tipo_documento',)
+    date_hierarchy = 'fecha'  # índice (-fecha, -id)
+
+# --- 5. CONCILIACIÓN BANCARIA (la crea core/conciliacion.py; borrarla deja ambos pendientes) ---
+@admin.register(Conciliacion)
+class ConciliacionAdmin(AdminRapido):
+    list_display = ('movimiento', 'ingreso', 'regla', 'diferencia_dias', 'fecha_creacion')
+    list_filter = ('regla',)
+    raw_id_fields = ('movimiento', 'ingreso')
+
+    def has_add_permission(self, request):
+        return False
 
-# --- 5. REGISTRO DE MODELOS SIMPLES ---
-admin.site.register(Empresa)
-admin.site.register(CentroCosto)
-admin.site.register(Clasificacion)
-admin.site.register(Egreso)
-admin.site.register(Cargo)
-admin.site.register(Perfil)
+# --- 6. POSIBLES DUPLICADOS (los busca core/duplicados.py; aquí se revisan) ---
+@admin.register(PosibleDuplicado)
+class PosibleDuplicadoAdmin(AdminRapido):
+    list_display = ('ingreso', 'duplicado', 'similitud', 'diferencia_dias', 'estado', 'fecha_creacion')
+    list_filter = ('estado',)
+    raw_id_fields = ('ingreso', 'duplicado')
+    actions = ['marcar_duplicado', 'marcar_descartado']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Marcar como duplicado")
+    def marcar_duplicado(self, request, queryset):
+        self.message_user(request, f"{queryset.update(estado='DUPLICADO')} pares marcados como duplicados.")
+
+    @admin.action(description="Marcar como no duplicado")
+    def marcar_descartado(self, request, queryset):
+        self.message_user(request, f"{queryset.update(estado='DESCARTADO')} pares descartados.")
+
+# --- 7. CATÁLOGOS Y MODELOS SIMPLES (search_fields: los usan los autocompletados) ---
+@admin.register(Empresa, Clasificacion, Cargo)
+class CatalogoAdmin(AdminRapido):
+    search_fields = ('nombre',)
+    ordering = ('nombre',)
+
+@admin.register(CentroCosto)
+class CentroCostoAdmin(AdminRapido):
+    list_display = ('nombre', 'codigo')
+    search_fields = ('nombre', 'codigo')
+    ordering = ('nombre',)
+
+@admin.register(Egreso)
+class EgresoAdmin(AdminRapido):
+    list_display = ('fecha', 'n_documento', 'monto_transferencia', 'clasificacion', 'estado')
+    search_fields = ('n_documento',)
+    autocomplete_fields = ('clasificacion',)
+
+@admin.register(Perfil)
+class PerfilAdmin(AdminRapido):
+    list_display = ('user', 'telefono')
+    search_fields = ('user__username',)
+    autocomplete_fields = ('user',)
 
 from django.contrib import admin
-from .models import Producto, Lote
+from .models import Producto, Lote, MovimientoStock
+from .inventario import registrar_ajuste, registrar_baja
 
 class LoteInline(admin.TabularInline):
     model = Lote
     extra = 1
 
-class ProductoAdmin(admin.ModelAdmin):
+def _registrar_cambio_lote(lote, usuario, cantidad_anterior):
+    # Toda edición de cantidad desde el admin queda en el libro como AJUSTE
+    registrar_ajuste(lote, cantidad_anterior, usuario, referencia='Edición desde administración')
+
+def _registrar_baja_lote(lote, usuario):
+    # El stock que tenía el lote sale del inventario antes de borrarlo
+    registrar_baja(lote, usuario, referencia='Lote eliminado desde administración')
+
+class ProductoAdmin(AdminRapido):
     list_display = ('codigo', 'nombre', 'stock_total')
+    search_fields = ('codigo', 'nombre')
     inlines = [LoteInline] # Esto te permite agregar lotes DENTRO del producto
 
+    def get_queryset(self, request):
+        # Stock sumado en la misma consulta del listado (y ordenable)
+        return super().get_queryset(request).con_stock()
+
+    @admin.display(description="Stock total", ordering='stock')
+    def stock_total(self, obj):
+        return obj.stock_total
+
+    def save_formset(self, request, form, formset, change):
+        anteriores = {
+            f.instance.pk: f.initial.get('cantidad', 0)
+            for f in formset.forms if f.instance.pk
+        }
+        for f in formset.deleted_forms:
+            if isinstance(f.instance, Lote) and f.instance.pk:
+                _registrar_baja_lote(f.instance, request.user)
+        super().save_formset(request, form, formset, change)
+        for lote in formset.new_objects + [obj for obj, _ in formset.changed_objects]:
+            _registrar_cambio_lote(lote, request.user, anteriores.get(lote.pk, 0))
+
+class LoteAdmin(AdminRapido):
+    list_display = ('numero_lote', 'producto', 'fecha_vencimiento', 'cantidad')
+    search_fields = ('numero_lote', 'producto__codigo', 'producto__nombre')
+    date_hierarchy = 'fecha_vencimiento'  # índice (fecha_vencimiento, producto)
+    autocomplete_fields = ('producto',)
+
+    def save_model(self, request, obj, form, change):
+        cantidad_anterior = form.initial.get('cantidad', 0) if change else 0
+        super().save_model(request, obj, form, change)
+        _registrar_cambio_lote(obj, request.user, cantidad_anterior)
+
+    def delete_model(self, request, obj):
+        _registrar_baja_lote(obj, request.user)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for lote in queryset:
+            _registrar_baja_lote(lote, request.user)
+        super().delete_queryset(request, queryset)
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(AdminRapido):
+    # Libro de solo lectura
+    # Código y nombre guardados en el movimiento: se leen aunque el producto ya no exista
+    list_display = ('fecha', 'tipo', 'codigo_producto', 'nombre_producto', 'numero_lote', 'cantidad', 'usuario', 'referencia')
+    list_filter = ('tipo',)
+    date_hierarchy = 'fecha'  # índice (fecha, producto)
+    search_fields = ('codigo_producto', 'nombre_producto', 'numero_lote')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 admin.site.register(Producto, ProductoAdmin)
-admin.site.register(Lote)
\ No newline at end of file
+admin.site.register(Lote, LoteAdmin)
\ No newline at end of file
@@ -0,0 +1,132 @@
+# core/alertas.py
+import datetime
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+
+from .models import DIAS_ALERTA_VENCIMIENTO, AlertaVencimiento, Lote
+
+DIAS_AVISO = DIAS_ALERTA_VENCIMIENTO
+
+
+def lotes_en_riesgo(hoy=None, dias=DIAS_AVISO):
+    """
+    Lotes con stock vencidos o que vencen dentro de `dias`.
+    UNA consulta con el producto incluido (select_related) y el semáforo calculado en SQL.
+    """
+    hoy = hoy or datetime.date.today()
+
+    lotes = list(
+        Lote.objects.select_related('producto')
+                    .con_estado(hoy, dias)
+                    .filter(fecha_vencimiento__lte=hoy + datetime.timedelta(days=dias), cantidad__gt=0)
+                    .order_by('producto__categoria', 'producto__nombre', 'producto_id', 'fecha_vencimiento')
+    )
+    for lote in lotes:
+        lote.dias = lote.dias_para_vencer
+        lote.estado_alerta = lote.estado_vencimiento
+    return lotes
+
+
+def excluir_ya_notificados(lotes):
+    """Quita los lotes cuyo estado actual ya fue avisado."""
+    if not lotes:
+        return lotes
+    enviados = set(
+        AlertaVencimiento.objects.filter(lote_id__in=[l.id for l in lotes])
+                                 .values_list('lote_id', 'estado')
+    )
+    return [l for l in lotes if (l.id, l.estado_alerta) not in enviados]
+
+
+def agrupar_por_categoria(lotes):
+    """
+    [{'categoria', 'productos': [{'producto', 'lotes', 'cantidad'}]}]
+    Requiere los lotes ordenados por categoría y producto (ver lotes_en_riesgo).
+    """
+    grupos = []
+    for categoria, lotes_cat in groupby(lotes, key=lambda l: l.producto.categoria or 'Sin Categoría'):
+        productos = []
+        for _, lotes_prod in groupby(lotes_cat, key=lambda l: l.producto_id):
+            lotes_prod = list(lotes_prod)
+            productos.append({
+                'producto': lotes_prod[0].producto,
+                'lotes': lotes_prod,
+                'cantidad': sum(l.cantidad for l in lotes_prod),
+            })
+        grupos.append({'categoria': categoria, 'productos': productos})
+    return grupos
+
+
+def destinatarios_suscritos():
+    return list(
+        User.objects.filter(is_active=True, perfil__recibir_alertas_stock=True)
+                    .exclude(email__isnull=True).exclude(email='')
+    )
+
+
+def despachar_alertas(hoy=None, dias=DIAS_AVISO, destinatarios=None, deduplicar=True, connection=None):
+    """
+    Calcula los lotes en riesgo y envía UN correo por destinatario, todos por la misma
+    conexión SMTP. Con `deduplicar`, solo se informan lotes no avisados antes y luego
+    se registran en AlertaVencimiento.
+
+    Devuelve {'lotes', 'vencidos', 'por_vencer', 'correos'}.
+    """
+    hoy = hoy or datetime.date.today()
+    lotes = lotes_en_riesgo(hoy, dias)
+    if deduplicar:
+        lotes = excluir_ya_notificados(lotes)
+
+    vencidos = sum(1 for l in lotes if l.estado_alerta == 'VENCIDO')
+    resumen = {'lotes': len(lotes), 'vencidos': vencidos, 'por_vencer': len(lotes) - vencidos, 'correos': 0}
+    if not lotes:
+        return resumen
+
+    if destinatarios is None:
+        destinatarios = destinatarios_suscritos()
+    correos = sorted({u.email for u in destinatarios if u.email})
+    if not correos:
+        return resumen
+
+    # El contenido es el mismo para todos: se renderiza una sola vez
+    context = {
+        'grupos': agrupar_por_categoria(lotes),
+        'total_vencidos': resumen['vencidos'],
+        'total_por_vencer': resumen['por_vencer'],
+        'fecha': hoy,
+        'dias_aviso': dias,
+    }
+    asunto = f"⚠️ ALERTA DE STOCK - {hoy.strftime('%d/%m/%Y')}"
+    mensaje_html = render_to_string('core/emails/alerta_stock.html', context)
+    mensaje_texto = (
+        f"Lotes vencidos: {resumen['vencidos']}\n"
+        f"Lotes por vencer (próximos {dias} días): {resumen['por_vencer']}\n"
+        "Revise el detalle en el módulo de Inventario."
+    )
+
+    connection = connection or get_connection()
+    mensajes = []
+    for correo in correos:
+        email = EmailMultiAlternatives(
+            subject=asunto,
+            body=mensaje_texto,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[correo],
+            connection=connection,
+        )
+        email.attach_alternative(mensaje_html, 'text/html')
+        mensajes.append(email)
+
+    # send_messages abre la conexión una vez para todo el lote
+    resumen['correos'] = connection.send_messages(mensajes) or 0
+
+    if deduplicar and resumen['correos']:
+        AlertaVencimiento.objects.bulk_create(
+            [AlertaVencimiento(lote_id=l.id, estado=l.estado_alerta) for l in lotes],
+            ignore_conflicts=True,
+        )
+    return resumen
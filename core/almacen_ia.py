@@ -0,0 +1,253 @@
+# core/almacen_ia.py
+"""
+Almacén versionado de modelos de IA.
+
+    modelos_ia/
+        cajachica/
+            v0001/modelo.joblib   <- artefacto (joblib sin comprimir, permite mmap)
+            v0001/meta.json       <- filas, fecha, versión de sklearn, métricas, sha256
+            v0002/...
+            ACTUAL                <- nombre de la versión en uso
+
+Promover una versión es reescribir ACTUAL con os.replace (atómico): los procesos
+que están prediciendo ven la versión anterior o la nueva, nunca una mezcla.
+Los arreglos numéricos se cargan con mmap_mode='r', así los workers de gunicorn
+comparten las mismas páginas de memoria en vez de tener cada uno su copia.
+joblib y sklearn se importan recién al guardar o cargar el primer modelo.
+"""
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+
+DIRECTORIO = getattr(settings, 'IA_MODELOS_DIR', os.path.join(settings.BASE_DIR, 'modelos_ia'))
+MAX_VERSIONES = getattr(settings, 'IA_MODELOS_MAX_VERSIONES', 10)
+ARTEFACTO = 'modelo.joblib'
+METADATOS = 'meta.json'
+PUNTERO = 'ACTUAL'
+FORMATO = 1  # se incrementa si cambia la estructura del directorio / meta.json
+
+_cache = {}  # (directorio, familia) -> (mtime del puntero, versión, modelo)
+_cache_lock = threading.Lock()
+
+
+class ModeloInvalido(Exception):
+    pass
+
+
+def _dir_familia(familia):
+    return os.path.join(DIRECTORIO, familia)
+
+
+def _sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _escribir_atomico(ruta, texto):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(texto)
+        os.replace(tmp, ruta)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _numero(version):
+    try:
+        return int(version.lstrip('v'))
+    except ValueError:
+        return -1
+
+
+# =========================================================
+# CONSULTA
+# =========================================================
+def versiones(familia):
+    """Nombres de versión ordenados de la más antigua a la más nueva."""
+    base = _dir_familia(familia)
+    if not os.path.isdir(base):
+        return []
+    nombres = [
+        n for n in os.listdir(base)
+        if n.startswith('v') and _numero(n) >= 0 and os.path.isfile(os.path.join(base, n, METADATOS))
+    ]
+    return sorted(nombres, key=_numero)
+
+
+def version_actual(familia):
+    try:
+        with open(os.path.join(_dir_familia(familia), PUNTERO), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def metadatos(familia, version):
+    with open(os.path.join(_dir_familia(familia), version, METADATOS), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def listar(familia):
+    """[{version, actual, fecha, filas, sklearn, metricas, ...}] de la más nueva a la más antigua."""
+    actual = version_actual(familia)
+    resultado = []
+    for version in reversed(versiones(familia)):
+        meta = metadatos(familia, version)
+        meta['actual'] = version == actual
+        resultado.append(meta)
+    return resultado
+
+
+def familias():
+    if not os.path.isdir(DIRECTORIO):
+        return []
+    return sorted(n for n in os.listdir(DIRECTORIO) if os.path.isdir(os.path.join(DIRECTORIO, n)))
+
+
+# =========================================================
+# ESCRITURA
+# =========================================================
+def guardar(familia, modelo, filas=None, metricas=None, promover_version=True, extra=None):
+    """
+    Guarda `modelo` como una versión nueva y (por defecto) la deja en uso.
+    La versión se arma en un directorio temporal y se publica con un rename.
+    """
+    import joblib
+    import sklearn
+
+    base = _dir_familia(familia)
+    os.makedirs(base, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=base, prefix='.nueva-')
+    try:
+        ruta_modelo = os.path.join(tmp, ARTEFACTO)
+        # Sin compresión: es requisito para cargar con mmap_mode
+        joblib.dump(modelo, ruta_modelo)
+        meta = {
+            'familia': familia,
+            'formato': FORMATO,
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'filas': filas,
+            'sklearn': sklearn.__version__,
+            'metricas': metricas or {},
+            'sha256': _sha256(ruta_modelo),
+            'bytes': os.path.getsize(ruta_modelo),
+        }
+        meta.update(extra or {})
+
+        # El número se reserva al publicar: si dos procesos chocan, el segundo reintenta
+        for _ in range(5):
+            existentes = versiones(familia)
+            version = f"v{(_numero(existentes[-1]) + 1) if existentes else 1:04d}"
+            meta['version'] = version
+            with open(os.path.join(tmp, METADATOS), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            try:
+                os.rename(tmp, os.path.join(base, version))
+                break
+            except OSError:
+                continue
+        else:
+            raise ModeloInvalido(f"No se pudo reservar una versión nueva para '{familia}'.")
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    if promover_version:
+        promover(familia, version, verificar_integridad=False)
+        limpiar(familia)
+    return version
+
+
+def verificar(familia, version):
+    """Comprueba que el artefacto existe, no está corrupto y es de un formato conocido."""
+    ruta_version = os.path.join(_dir_familia(familia), version)
+    try:
+        meta = metadatos(familia, version)
+    except (OSError, ValueError):
+        raise ModeloInvalido(f"La versión '{version}' de '{familia}' no existe o no tiene metadatos.")
+    if meta.get('formato') != FORMATO:
+        raise ModeloInvalido(f"Formato {meta.get('formato')} no soportado (se espera {FORMATO}).")
+    ruta_modelo = os.path.join(ruta_version, ARTEFACTO)
+    if not os.path.isfile(ruta_modelo) or _sha256(ruta_modelo) != meta.get('sha256'):
+        raise ModeloInvalido(f"El artefacto de '{familia}' {version} está dañado (sha256 no coincide).")
+    return meta
+
+
+def promover(familia, version, verificar_integridad=True):
+    """Deja `version` en uso. Los procesos la toman en su próxima predicción."""
+    if verificar_integridad:
+        verificar(familia, version)
+    elif not os.path.isdir(os.path.join(_dir_familia(familia), version)):
+        raise ModeloInvalido(f"La versión '{version}' de '{familia}' no existe.")
+    _escribir_atomico(os.path.join(_dir_familia(familia), PUNTERO), version)
+    return version
+
+
+def rollback(familia):
+    """Vuelve a la versión anterior a la actual. Devuelve la versión que quedó en uso."""
+    todas = versiones(familia)
+    actual = version_actual(familia)
+    anteriores = [v for v in todas if _numero(v) < _numero(actual or 'v0')] if actual else []
+    if not anteriores:
+        raise ModeloInvalido(f"No hay una versión anterior a '{actual}' para '{familia}'.")
+    return promover(familia, anteriores[-1])
+
+
+def limpiar(familia, conservar=None):
+    """Borra las versiones más antiguas, sin tocar nunca la que está en uso."""
+    conservar = MAX_VERSIONES if conservar is None else conservar
+    actual = version_actual(familia)
+    todas = versiones(familia)
+    borradas = []
+    for version in todas[:max(0, len(todas) - conservar)]:
+        if version == actual:
+            continue
+        shutil.rmtree(os.path.join(_dir_familia(familia), version), ignore_errors=True)
+        borradas.append(version)
+    return borradas
+
+
+# =========================================================
+# CARGA
+# =========================================================
+def cargar(familia):
+    """
+    Modelo en uso de la familia (o None si todavía no hay).
+    Se recarga solo cuando cambia el puntero; si la versión nueva no se puede
+    abrir, se sigue usando la última que funcionó.
+    """
+    clave = (DIRECTORIO, familia)
+    puntero = os.path.join(_dir_familia(familia), PUNTERO)
+    mtime_cache, version_cache, modelo_cache = _cache.get(clave, (None, None, None))
+    try:
+        mtime = os.stat(puntero).st_mtime_ns
+    except OSError:
+        return modelo_cache
+
+    if mtime == mtime_cache:
+        return modelo_cache
+
+    with _cache_lock:
+        version = version_actual(familia)
+        if version == version_cache:
+            _cache[clave] = (mtime, version_cache, modelo_cache)
+            return modelo_cache
+        try:
+            import joblib
+            modelo = joblib.load(os.path.join(_dir_familia(familia), version, ARTEFACTO), mmap_mode='r')
+        except Exception:
+            return modelo_cache
+        _cache[clave] = (mtime, version, modelo)
+        return modelo
@@ -0,0 +1,282 @@
+# core/archivo.py
+"""
+Archivo histórico: años cerrados fuera de las tablas vivas, en Parquet.
+
+    archivo/
+        2019/
+            ingreso.parquet      <- filas del año (columnar, comprimido)
+            movimiento.parquet
+            cajachica.parquet
+            meta.json            <- filas, suma del monto, sha256 y bytes por tabla
+        2020/...
+
+archivar_anio() escribe los archivos en un directorio temporal, los vuelve a leer
+y compara filas y suma de montos con la base. Solo si cuadran renombra el
+directorio (atómico) y borra el año de las tablas vivas, en la misma transacción.
+En PostgreSQL el año de Ingreso y Movimiento se borra soltando su partición
+(core/particiones.py) en vez de fila a fila.
+
+Lectura: leer() devuelve un DataFrame con las filas archivadas de un rango de
+fechas. Lo usan la exportación CSV de finanzas y los dashboards filtrados por un
+año archivado. Se guardan también los nombres de empresa / centro / clasificación:
+el archivo no depende de que esos catálogos sigan existiendo.
+pandas (y pyarrow, su motor de Parquet) se importan recién al archivar o leer.
+"""
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from . import particiones
+from .models import CajaChica, Conciliacion, Ingreso, Movimiento, PosibleDuplicado
+
+DIRECTORIO = getattr(settings, 'ARCHIVO_DIR', os.path.join(settings.BASE_DIR, 'archivo'))
+COMPRESION = getattr(settings, 'ARCHIVO_COMPRESION', 'zstd')
+METADATOS = 'meta.json'
+FORMATO = 1  # se incrementa si cambian las columnas o meta.json
+
+# nombre del archivo -> (modelo, columna del monto, columnas de catálogos que se guardan por nombre)
+TABLAS = {
+    'ingreso': (Ingreso, 'monto_transferencia', ('empresa__nombre', 'centro_costo__nombre', 'clasificacion__nombre')),
+    'movimiento': (Movimiento, 'monto', ('empresa__nombre', 'centro_costo__nombre')),
+    'cajachica': (CajaChica, 'monto', ()),
+}
+
+
+class ArchivoError(Exception):
+    pass
+
+
+def _dir_anio(anio):
+    return os.path.join(DIRECTORIO, str(int(anio)))
+
+
+def _columnas(nombre):
+    modelo, _monto, catalogos = TABLAS[nombre]
+    return [campo.attname for campo in modelo._meta.concrete_fields] + list(catalogos)
+
+
+def _sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _huella(queryset, monto):
+    totales = queryset.aggregate(filas=Count('id'), suma=Sum(monto))
+    return {'filas': totales['filas'], 'suma': int(totales['suma'] or 0)}
+
+
+def _huella_archivo(ruta, monto):
+    import pandas as pd
+
+    df = pd.read_parquet(ruta, columns=[monto])
+    return {'filas': len(df), 'suma': int(df[monto].dropna().sum())}
+
+
+# =========================================================
+# LECTURA
+# =========================================================
+def anios_archivados():
+    if not os.path.isdir(DIRECTORIO):
+        return []
+    return sorted(
+        int(nombre) for nombre in os.listdir(DIRECTORIO)
+        if nombre.isdigit() and os.path.exists(os.path.join(DIRECTORIO, nombre, METADATOS))
+    )
+
+
+def esta_archivado(anio):
+    try:
+        return os.path.exists(os.path.join(_dir_anio(anio), METADATOS))
+    except (TypeError, ValueError):
+        return False
+
+
+def metadatos(anio):
+    with open(os.path.join(_dir_anio(anio), METADATOS), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _leer_vivos(nombre, desde, hasta):
+    """Filas que siguen en la tabla para el rango, con las mismas columnas que el archivo."""
+    import pandas as pd
+
+    modelo = TABLAS[nombre][0]
+    filas = modelo.objects.all()
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha__lt=hasta)
+    columnas = _columnas(nombre)
+    return pd.DataFrame.from_records(filas.values_list(*columnas).iterator(chunk_size=5000), columns=columnas)
+
+
+def leer(nombre, desde=None, hasta=None, con_vivos=False):
+    """
+    Filas archivadas de la tabla con desde <= fecha < hasta (None: sin límite),
+    de todos los años archivados que toca el rango, como DataFrame.
+    con_vivos=True agrega las filas del mismo rango que siguen en la tabla (p. ej.
+    una importación tardía de un año ya archivado): no se repiten, archivar las borra.
+    """
+    import pandas as pd
+
+    filtros = []
+    if desde:
+        filtros.append(('fecha', '>=', desde))
+    if hasta:
+        filtros.append(('fecha', '<', hasta))
+    partes = [
+        pd.read_parquet(os.path.join(_dir_anio(anio), f'{nombre}.parquet'), filters=filtros or None)
+        for anio in anios_archivados()
+        if (not desde or anio >= desde.year) and (not hasta or datetime.date(anio, 1, 1) < hasta)
+    ]
+    if con_vivos:
+        partes.append(_leer_vivos(nombre, desde, hasta))
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame(columns=_columnas(nombre))
+    return pd.concat(partes, ignore_index=True)
+
+
+def resumen_movimientos(desde, hasta, por_dia=False, ultimos=50):
+    """
+    Lo mismo que calcula finanzas_dashboard con el ORM, para un período archivado:
+    totales de ingresos/egresos, evolución por día o mes y los últimos movimientos,
+    sumando el archivo y lo que siga en la tabla para ese período.
+    """
+    import pandas as pd
+
+    df = leer('movimiento', desde, hasta, con_vivos=True)
+    df['monto'] = df['monto'].fillna(0).astype('int64')
+    ingresos = df['monto'].where(df['tipo'] == 'INGRESO', 0)
+    egresos = df['monto'].where(df['tipo'] == 'EGRESO', 0)
+
+    periodo = pd.to_datetime(df['fecha'])
+    if not por_dia:
+        periodo = periodo.dt.to_period('M').dt.to_timestamp()
+    evolucion = (
+        pd.DataFrame({'fecha_trunc': periodo, 'ingreso': ingresos, 'egreso': egresos})
+          .groupby('fecha_trunc').sum().reset_index()
+    )
+
+    recientes = df.sort_values(['fecha', 'id'], ascending=False).head(ultimos)
+    return {
+        'total_ingresos': int(ingresos.sum()),
+        'total_egresos': int(egresos.sum()),
+        'evolucion': evolucion.to_dict('records'),
+        'movimientos': [
+            {
+                'fecha': fila['fecha'],
+                'tipo': fila['tipo'],
+                'descripcion': fila['descripcion'],
+                'monto': fila['monto'],
+                # el template muestra m.empresa.nombre
+                'empresa': {'nombre': fila['empresa__nombre']} if fila['empresa__nombre'] else None,
+            }
+            for fila in recientes.to_dict('records')
+        ],
+    }
+
+
+# =========================================================
+# ARCHIVAR
+# =========================================================
+def _bloquear_tablas():
+    """Postgres: nadie escribe en las tablas mientras se exporta y borra (las lecturas siguen)."""
+    if connection.vendor == 'postgresql':
+        tablas = ', '.join(connection.ops.quote_name(m._meta.db_table) for m, _, _ in TABLAS.values())
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {tablas} IN SHARE MODE')
+
+
+def _exportar(directorio, desde, hasta):
+    import pandas as pd
+
+    tablas = {}
+    for nombre, (modelo, monto, _catalogos) in TABLAS.items():
+        filas = modelo.objects.filter(fecha__gte=desde, fecha__lt=hasta)
+        esperado = _huella(filas, monto)
+        columnas = _columnas(nombre)
+        df = pd.DataFrame.from_records(
+            filas.order_by('fecha', 'id').values_list(*columnas).iterator(chunk_size=5000),
+            columns=columnas,
+        )
+        ruta = os.path.join(directorio, f'{nombre}.parquet')
+        df.to_parquet(ruta, compression=COMPRESION, index=False)
+
+        leido = _huella_archivo(ruta, monto)
+        if leido != esperado:
+            raise ArchivoError(f"{nombre}: la base tiene {esperado} y el archivo {leido}.")
+        tablas[nombre] = {**esperado, 'sha256': _sha256(ruta), 'bytes': os.path.getsize(ruta)}
+    return tablas
+
+
+def _borrar(anio, desde, hasta, tablas):
+    # Las conciliaciones del año no se archivan; la contraparte de otro año vuelve a pendientes
+    Conciliacion.objects.filter(
+        Q(movimiento__fecha__gte=desde, movimiento__fecha__lt=hasta)
+        | Q(ingreso__fecha__gte=desde, ingreso__fecha__lt=hasta)
+    ).delete()
+    PosibleDuplicado.objects.filter(
+        Q(ingreso__fecha__gte=desde, ingreso__fecha__lt=hasta)
+        | Q(duplicado__fecha__gte=desde, duplicado__fecha__lt=hasta)
+    ).delete()
+    soltadas = particiones.eliminar_particion(anio)
+    for nombre, (modelo, _monto, _catalogos) in TABLAS.items():
+        if particiones.nombre_particion(modelo._meta.db_table, anio) in soltadas:
+            continue  # la partición tenía exactamente las filas exportadas (tablas bloqueadas)
+        _, por_modelo = modelo.objects.filter(fecha__gte=desde, fecha__lt=hasta).delete()
+        borradas = por_modelo.get(modelo._meta.label, 0)
+        if borradas != tablas[nombre]['filas']:
+            raise ArchivoError(f"{nombre}: se iban a borrar {borradas} filas y se archivaron {tablas[nombre]['filas']}.")
+    transaction.on_commit(Ingreso.invalidar_cubos)  # la partición se suelta sin señales
+
+
+def archivar_anio(anio, hoy=None):
+    """
+    Pasa el año (ya cerrado) de Ingreso, Movimiento y CajaChica a Parquet y lo borra
+    de las tablas vivas. Si algo falla no queda ni el directorio ni el borrado a medias.
+    Devuelve meta.json como dict.
+    """
+    anio = int(anio)
+    hoy = hoy or timezone.localdate()
+    if anio >= hoy.year:
+        raise ArchivoError(f"El año {anio} no está cerrado.")
+    destino = _dir_anio(anio)
+    if os.path.exists(destino):
+        raise ArchivoError(f"Ya existe {destino}.")
+
+    desde, hasta = particiones.rango_periodo(anio)
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    temporal = tempfile.mkdtemp(dir=DIRECTORIO, prefix=f'.{anio}-')
+    publicado = False
+    try:
+        with transaction.atomic():
+            _bloquear_tablas()
+            meta = {
+                'formato': FORMATO,
+                'anio': anio,
+                'archivado': timezone.now().isoformat(),
+                'compresion': COMPRESION,
+                'tablas': _exportar(temporal, desde, hasta),
+            }
+            with open(os.path.join(temporal, METADATOS), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2)
+            # Se publica el archivo antes de borrar: el año nunca deja de poder leerse
+            os.replace(temporal, destino)
+            publicado = True
+            _borrar(anio, desde, hasta, meta['tablas'])
+    except Exception:
+        shutil.rmtree(destino if publicado else temporal, ignore_errors=True)
+        raise
+    return meta
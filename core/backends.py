@@ -1,17 +1,128 @@
-from django.contrib.auth.backends import ModelBackend
+# core/backends.py
+"""
+Autenticación por correo o RUT.
+
+Búsqueda: una consulta que usa un índice.
+- Correo: LOWER(email) contra el índice único auth_user_email_ci_uniq
+  (migración 0024). El correo no distingue mayúsculas y no puede repetirse.
+- RUT / usuario: username (índice único de auth_user). Los RUT se guardan y se
+  buscan en forma canónica ('12345678-9'), así '12.345.678-9' encuentra al mismo.
+
+Límite de intentos: fallos contados en el cache de Django por cuenta y por IP,
+en una ventana fija que abre la primera falla. Superado el límite, authenticate()
+corta antes de check_password: un ataque de fuerza bruta no consume CPU del hasher.
+"""
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db.models.functions import Lower
+
+from . import rut as rut_util
+
+LOGIN_VENTANA_SEGUNDOS = getattr(settings, 'LOGIN_VENTANA_SEGUNDOS', 15 * 60)
+LOGIN_MAX_FALLOS_CUENTA = getattr(settings, 'LOGIN_MAX_FALLOS_CUENTA', 5)
+LOGIN_MAX_FALLOS_IP = getattr(settings, 'LOGIN_MAX_FALLOS_IP', 50)
+
+
+# =========================================================
+# BÚSQUEDA POR ÍNDICE
+# =========================================================
+def usuarios_por_email(email):
+    """Usuarios con ese correo, sin distinguir mayúsculas (usa el índice LOWER(email))."""
+    UserModel = get_user_model()
+    email = (email or '').strip().lower()
+    if not email:
+        return UserModel._default_manager.none()
+    return UserModel._default_manager.alias(email_ci=Lower('email')).filter(email_ci=email)
+
+
+def buscar_usuario(identificador):
+    """Correo, RUT (con o sin puntos/guion) o nombre de usuario -> User o None."""
+    UserModel = get_user_model()
+    texto = str(identificador or '').strip()
+    if not texto:
+        return None
+    consultas = []
+    if '@' in texto:
+        consultas.append(usuarios_por_email(texto))
+    consultas.append(UserModel._default_manager.filter(username=rut_util.normalizar(texto) or texto))
+    for consulta in consultas:
+        try:
+            return consulta.get()
+        except UserModel.DoesNotExist:
+            continue
+    return None
+
+
+# =========================================================
+# LÍMITE DE INTENTOS
+# =========================================================
+def _ip(request):
+    # Detrás de un proxy REMOTE_ADDR debe venir ya resuelto (p. ej. por el proxy de gunicorn)
+    return request.META.get('REMOTE_ADDR') if request is not None else None
+
+
+def _contadores(request, identificador):
+    """[(clave de cache, máximo)] que aplican a este intento."""
+    texto = str(identificador or '').strip()
+    cuenta = rut_util.normalizar(texto) or texto.lower()
+    contadores = [
+        ('login:fallos:cuenta:' + hashlib.sha256(cuenta.encode()).hexdigest()[:32], LOGIN_MAX_FALLOS_CUENTA),
+    ]
+    ip = _ip(request)
+    if ip:
+        contadores.append((f'login:fallos:ip:{ip}', LOGIN_MAX_FALLOS_IP))
+    return contadores
+
+
+def login_bloqueado(request, identificador):
+    contadores = _contadores(request, identificador)
+    fallos = cache.get_many([clave for clave, _ in contadores])
+    return any(fallos.get(clave, 0) >= maximo for clave, maximo in contadores)
+
+
+def registrar_fallo(request, identificador):
+    for clave, _ in _contadores(request, identificador):
+        # add() solo crea la clave (abre la ventana) si no existía; incr() es atómico
+        cache.add(clave, 0, LOGIN_VENTANA_SEGUNDOS)
+        try:
+            cache.incr(clave)
+        except ValueError:  # expiró justo entre add() e incr()
+            cache.set(clave, 1, LOGIN_VENTANA_SEGUNDOS)
+
+
+def limpiar_fallos(request, identificador):
+    """Login correcto: se perdonan los fallos de la cuenta (los de la IP siguen contando)."""
+    cache.delete(_contadores(request, identificador)[0][0])
+
+
+def reiniciar_intentos(request, identificador):
+    """Borra los contadores de la cuenta y de la IP (desbloqueo manual, benchmark)."""
+    cache.delete_many([clave for clave, _ in _contadores(request, identificador)])
+
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         UserModel = get_user_model()
-        try:
-            # Buscamos al usuario por su CORREO (email)
-            # 'username' es lo que llega del formulario (el texto que escribió el usuario)
-            user = UserModel.objects.get(email=username)
-        except UserModel.DoesNotExist:
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if not username or password is None:
             return None
-        else:
-            # Si existe el correo, chequeamos la contraseña
-            if user.check_password(password):
-                return user
-        return None
\ No newline at end of file
+
+        if login_bloqueado(request, username):
+            # authenticate() deja de probar backends y responde como credenciales inválidas
+            raise PermissionDenied
+
+        user = buscar_usuario(username)
+        if user is None:
+            # Mismo costo que con un usuario real: no se distingue quién existe por el tiempo
+            UserModel().set_password(password)
+        elif user.check_password(password) and self.user_can_authenticate(user):
+            limpiar_fallos(request, username)
+            return user
+        registrar_fallo(request, username)
+        return None
@@ -0,0 +1,212 @@
+# core/conciliacion.py
+"""
+Conciliación bancaria: Movimiento (hoja "Control de Finanzas", el banco) contra
+Ingreso (hoja de egresos).
+
+Solo entran las filas sin conciliar (anti-join con Conciliacion), así cada
+importación concilia lo nuevo contra lo pendiente del otro lado. Tres pasadas
+en pandas, sin ciclos anidados:
+
+1. DOCUMENTO   hash join por (monto, N° de documento normalizado), con las
+               fechas a no más de TOLERANCIA_DIAS.
+2. MONTO_FECHA sort-merge (merge_asof) por monto a la fecha más cercana dentro
+               de la tolerancia.
+3. AGRUPADO    varios ingresos con el mismo N° de documento cuya suma es el
+               monto de un movimiento (una transferencia que paga varias facturas).
+
+Cada pasada es 1 a 1 (un movimiento con un ingreso o un grupo): si dos candidatos
+quieren al mismo, gana el de menor diferencia de días y el otro sigue buscando en
+la ronda siguiente. Los resultados quedan en Conciliacion; borrar una la devuelve
+a pendientes. pandas se importa al conciliar.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count
+
+from .models import Conciliacion, Ingreso, Movimiento
+
+TOLERANCIA_DIAS = getattr(settings, 'CONCILIACION_TOLERANCIA_DIAS', 3)
+# La hoja de egresos se paga con cargos del banco
+TIPOS_MOVIMIENTO = getattr(settings, 'CONCILIACION_TIPOS_MOVIMIENTO', ('EGRESO',))
+CLAVE_ULTIMA = 'conciliacion:ultima'
+LOCK_PG = 7_340_112  # pg_advisory_xact_lock: una conciliación a la vez
+
+
+# =========================================================
+# DATOS PENDIENTES
+# =========================================================
+def movimientos_pendientes():
+    return Movimiento.objects.filter(tipo__in=TIPOS_MOVIMIENTO, conciliaciones__isnull=True)
+
+
+def ingresos_pendientes():
+    return Ingreso.objects.filter(conciliacion__isnull=True)
+
+
+def _normalizar_documento(serie):
+    """'Nº 00123-A ' -> '123A'; vacío -> None."""
+    texto = (serie.fillna('').astype(str).str.upper()
+                  .str.replace(r'^\s*(N\s*[°º.]|NRO\.?|NUM\.?|NUMERO)\s*', '', regex=True)
+                  .str.replace(r'[^0-9A-Z]', '', regex=True).str.lstrip('0'))
+    return texto.where(texto != '', None)
+
+
+def _cargar(queryset, monto):
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(
+        queryset.values_list('id', 'fecha', monto, 'n_documento').iterator(chunk_size=10000),
+        columns=['id', 'fecha', 'monto', 'doc'],
+    )
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    df['monto'] = df['monto'].fillna(0).astype('int64')
+    df['doc'] = _normalizar_documento(df['doc'])
+    return df
+
+
+# =========================================================
+# PASADAS
+# =========================================================
+def _uno_a_uno(candidatos):
+    """
+    Candidatos (mov, ing, dias) -> pares sin repetir movimiento ni ingreso.
+    Por rondas: cada movimiento toma su mejor ingreso y cada ingreso se queda con
+    el mejor movimiento que lo eligió; los demás vuelven a intentar sin ellos.
+    """
+    import pandas as pd
+
+    elegidos = []
+    candidatos = candidatos.sort_values(['dias', 'mov', 'ing'])
+    while not candidatos.empty:
+        ronda = candidatos.drop_duplicates('mov').drop_duplicates('ing')
+        elegidos.append(ronda)
+        candidatos = candidatos[~candidatos['mov'].isin(ronda['mov']) & ~candidatos['ing'].isin(ronda['ing'])]
+    if not elegidos:
+        return candidatos
+    return pd.concat(elegidos, ignore_index=True)
+
+
+def _por_documento(movs, ings, tolerancia):
+    con_doc = ['monto', 'doc']
+    cruce = movs.dropna(subset=['doc']).merge(ings.dropna(subset=['doc']), on=con_doc, suffixes=('_mov', '_ing'))
+    cruce['dias'] = (cruce['fecha_mov'] - cruce['fecha_ing']).dt.days.abs()
+    cruce = cruce[cruce['dias'] <= tolerancia]
+    return _uno_a_uno(cruce.rename(columns={'id_mov': 'mov', 'id_ing': 'ing'})[['mov', 'ing', 'dias']])
+
+
+def _por_monto_fecha(movs, ings, tolerancia):
+    """merge_asof da a cada movimiento el ingreso de igual monto más cercano en fecha."""
+    import pandas as pd
+
+    elegidos = []
+    ings = ings.assign(fecha_ing=ings['fecha']).sort_values('fecha')
+    movs = movs.sort_values('fecha')
+    while not movs.empty and not ings.empty:
+        cercano = pd.merge_asof(
+            movs[['id', 'fecha', 'monto']], ings[['id', 'fecha', 'monto', 'fecha_ing']],
+            on='fecha', by='monto', direction='nearest',
+            tolerance=pd.Timedelta(days=tolerancia), suffixes=('_mov', '_ing'),
+        ).dropna(subset=['id_ing'])
+        if cercano.empty:
+            break
+        cercano['dias'] = (cercano['fecha'] - cercano['fecha_ing']).dt.days.abs()
+        ronda = (cercano.rename(columns={'id_mov': 'mov', 'id_ing': 'ing'})[['mov', 'ing', 'dias']]
+                        .astype({'ing': 'int64'})
+                        .sort_values(['dias', 'mov']).drop_duplicates('ing'))
+        elegidos.append(ronda)
+        movs = movs[~movs['id'].isin(ronda['mov'])]
+        ings = ings[~ings['id'].isin(ronda['ing'])]
+    if not elegidos:
+        return pd.DataFrame(columns=['mov', 'ing', 'dias'])
+    return pd.concat(elegidos, ignore_index=True)
+
+
+def _agrupados(movs, ings, tolerancia):
+    """Grupos de 2+ ingresos con el mismo documento cuya suma calza con un movimiento."""
+    grupos = ings.dropna(subset=['doc']).groupby('doc')
+    resumen = grupos.agg(monto=('monto', 'sum'), fecha=('fecha', 'max'), cantidad=('id', 'size')).reset_index()
+    resumen = resumen[resumen['cantidad'] > 1]
+    # Mismo documento en el banco o, si no, solo monto: un grupo hace las veces de un ingreso
+    candidatos = movs.merge(resumen, on='monto', suffixes=('_mov', '_grupo'))
+    candidatos['dias'] = (candidatos['fecha_mov'] - candidatos['fecha_grupo']).dt.days.abs()
+    candidatos = candidatos[(candidatos['dias'] <= tolerancia)
+                            & (candidatos['doc_mov'].isna() | (candidatos['doc_mov'] == candidatos['doc_grupo']))]
+    pares = _uno_a_uno(candidatos.rename(columns={'id': 'mov', 'doc_grupo': 'ing'})[['mov', 'ing', 'dias']])
+    miembros = ings.dropna(subset=['doc'])[['id', 'doc', 'fecha']]
+    filas = pares.rename(columns={'ing': 'doc'}).merge(miembros, on='doc')
+    return filas.rename(columns={'id': 'ing'})[['mov', 'ing', 'dias']]
+
+
+# =========================================================
+# CONCILIAR
+# =========================================================
+def conciliar(tolerancia=TOLERANCIA_DIAS):
+    """
+    Concilia todo lo pendiente y guarda las coincidencias nuevas.
+    Devuelve {'nuevas': {regla: ingresos}, 'pendientes': {...}, 'segundos': ...}.
+    """
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [LOCK_PG])
+        movs = _cargar(movimientos_pendientes(), 'monto')
+        ings = _cargar(ingresos_pendientes(), 'monto_transferencia')
+
+        nuevas = {}
+        conciliaciones = []
+        for regla, pasada in (('DOCUMENTO', _por_documento), ('MONTO_FECHA', _por_monto_fecha), ('AGRUPADO', _agrupados)):
+            pares = pasada(movs, ings, tolerancia) if not (movs.empty or ings.empty) else []
+            nuevas[regla] = len(pares)
+            if not nuevas[regla]:
+                continue
+            conciliaciones.extend(
+                Conciliacion(movimiento_id=int(mov), ingreso_id=int(ing), regla=regla, diferencia_dias=int(dias))
+                for mov, ing, dias in pares[['mov', 'ing', 'dias']].itertuples(index=False)
+            )
+            movs = movs[~movs['id'].isin(pares['mov'])]
+            ings = ings[~ings['id'].isin(pares['ing'])]
+        # ignore_conflicts: si otra corrida ya tomó el ingreso (OneToOne), se respeta la suya
+        Conciliacion.objects.bulk_create(conciliaciones, batch_size=2000, ignore_conflicts=True)
+
+    resultado = {
+        'nuevas': nuevas,
+        'pendientes': {'movimientos': len(movs), 'ingresos': len(ings)},
+        'segundos': round(time.perf_counter() - inicio, 2),
+        'fecha': time.time(),
+    }
+    cache.set(CLAVE_ULTIMA, resultado, None)
+    return resultado
+
+
+def _en_segundo_plano():
+    try:
+        conciliar()
+    finally:
+        close_old_connections()
+
+
+def solicitar():
+    """Después de una importación (transaction.on_commit): concilia sin hacer esperar la respuesta."""
+    threading.Thread(target=_en_segundo_plano, daemon=True).start()
+
+
+def resumen(limite=100):
+    """Conciliado por regla, pendientes y la última corrida, para el endpoint."""
+    por_regla = dict(Conciliacion.objects.values_list('regla').annotate(n=Count('id')).order_by())
+    campos = ('id', 'fecha', 'n_documento')
+    return {
+        'conciliados': por_regla,
+        'pendientes': {'movimientos': movimientos_pendientes().count(), 'ingresos': ingresos_pendientes().count()},
+        'ultima': cache.get(CLAVE_ULTIMA),
+        'movimientos_sin_conciliar': list(
+            movimientos_pendientes().order_by('-fecha').values(*campos, 'monto', 'descripcion')[:limite]
+        ),
+        'ingresos_sin_conciliar': list(
+            ingresos_pendientes().order_by('-fecha').values(*campos, 'monto_transferencia', 'descripcion_movimiento')[:limite]
+        ),
+    }
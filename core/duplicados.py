@@ -0,0 +1,148 @@
+# core/duplicados.py
+"""
+Posibles duplicados en Ingreso (hoja de egresos): misma empresa, mismo monto,
+fechas a no más de VENTANA_DIAS y descripción / detalle parecidos.
+
+Para no comparar todos contra todos, primero se arman bloques: (empresa, monto,
+fecha // (VENTANA_DIAS + 1)). Dos filas a VENTANA_DIAS o menos caen en el mismo
+bloque o en el vecino, así que basta un join de cada bloque consigo mismo y con
+los dos de al lado (pandas). El texto se compara solo dentro de esos candidatos
+(difflib), y los pares sobre UMBRAL quedan en PosibleDuplicado para revisar en
+el admin. Un par ya guardado no se vuelve a crear, aunque se haya descartado.
+
+- buscar(): toda la tabla.
+- buscar(ids=[...]) / buscar(desde_id=N): solo filas nuevas contra las de sus
+  mismos montos y fechas (lo que hace importar_excel después de cada carga).
+"""
+import difflib
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Ingreso, PosibleDuplicado
+
+VENTANA_DIAS = getattr(settings, 'DUPLICADOS_VENTANA_DIAS', 2)
+UMBRAL = getattr(settings, 'DUPLICADOS_UMBRAL', 0.85)
+MAX_MONTOS_FILTRO = 5000  # más montos distintos que esto: se filtra solo por fecha
+
+
+def _normalizar_texto(serie):
+    """Sin tildes, minúsculas y solo letras/números separados por un espacio."""
+    return (serie.fillna('').str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+                 .str.lower().str.replace(r'[^0-9a-z]+', ' ', regex=True).str.strip())
+
+
+def _cargar(queryset):
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(
+        queryset.values_list('id', 'empresa_id', 'monto_transferencia', 'fecha',
+                             'descripcion_movimiento', 'detalle').iterator(chunk_size=10000),
+        columns=['id', 'empresa', 'monto', 'fecha', 'descripcion', 'detalle'],
+    )
+    df['empresa'] = df['empresa'].fillna(-1).astype('int64')  # sin empresa: un bloque más
+    df['monto'] = df['monto'].fillna(0).astype('int64')
+    df['dia'] = (pd.to_datetime(df['fecha']) - pd.Timestamp('1970-01-01')).dt.days
+    df['texto'] = _normalizar_texto(df['descripcion'].fillna('') + ' ' + df['detalle'].fillna(''))
+    return df[['id', 'empresa', 'monto', 'dia', 'texto']]
+
+
+def candidatos(nuevos, existentes, ventana=VENTANA_DIAS):
+    """
+    Pares (ingreso < duplicado) de `nuevos` con `existentes` en el mismo bloque o en
+    uno vecino y a `ventana` días o menos. Columnas: ingreso, duplicado, dias, texto_a, texto_b.
+    """
+    import pandas as pd
+
+    ancho = ventana + 1
+    izquierda = nuevos.assign(bloque=nuevos['dia'] // ancho)
+    partes = [
+        izquierda.merge(existentes.assign(bloque=existentes['dia'] // ancho + desfase),
+                        on=['empresa', 'monto', 'bloque'], suffixes=('_a', '_b'))
+        for desfase in (-1, 0, 1)
+    ]
+    pares = pd.concat(partes, ignore_index=True)
+    pares['dias'] = (pares['dia_a'] - pares['dia_b']).abs()
+    pares = pares[(pares['dias'] <= ventana) & (pares['id_a'] != pares['id_b'])]
+
+    # Cada par una vez y con el menor id como `ingreso`
+    invertir = pares['id_a'] > pares['id_b']
+    return pd.DataFrame({
+        'ingreso': pares['id_a'].where(~invertir, pares['id_b']),
+        'duplicado': pares['id_b'].where(~invertir, pares['id_a']),
+        'dias': pares['dias'],
+        'texto_a': pares['texto_a'].where(~invertir, pares['texto_b']),
+        'texto_b': pares['texto_b'].where(~invertir, pares['texto_a']),
+    }).drop_duplicates(['ingreso', 'duplicado'])
+
+
+def similitud(a, b, umbral=UMBRAL):
+    """0..1 (difflib). Las cotas rápidas descartan sin calcular el ratio completo."""
+    if a == b:
+        return 1.0
+    comparador = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    if comparador.real_quick_ratio() < umbral or comparador.quick_ratio() < umbral:
+        return 0.0
+    return comparador.ratio()
+
+
+def buscar(ids=None, desde_id=None, ventana=VENTANA_DIAS, umbral=UMBRAL):
+    """
+    Busca y guarda posibles duplicados. Sin ids ni desde_id recorre toda la tabla.
+    Devuelve {'filas', 'candidatos', 'nuevos', 'segundos'}.
+    """
+    import pandas as pd
+
+    inicio = time.perf_counter()
+    if ids is None and desde_id is None:
+        nuevos = existentes = _cargar(Ingreso.objects.all())
+    else:
+        filtro = Ingreso.objects.filter(id__in=ids) if ids is not None else Ingreso.objects.filter(id__gt=desde_id)
+        nuevos = _cargar(filtro)
+        existentes = nuevos.iloc[0:0]
+        if not nuevos.empty:
+            desde = pd.Timestamp('1970-01-01') + pd.Timedelta(days=int(nuevos['dia'].min()) - ventana)
+            hasta = pd.Timestamp('1970-01-01') + pd.Timedelta(days=int(nuevos['dia'].max()) + ventana)
+            vecinos = Ingreso.objects.filter(fecha__gte=desde.date(), fecha__lte=hasta.date())
+            montos = nuevos['monto'].unique().tolist()
+            if len(montos) <= MAX_MONTOS_FILTRO:
+                vecinos = vecinos.filter(monto_transferencia__in=montos)
+            existentes = _cargar(vecinos)
+
+    pares = candidatos(nuevos, existentes, ventana) if not (nuevos.empty or existentes.empty) else None
+    evaluados = guardados = 0
+    if pares is not None and not pares.empty:
+        evaluados = len(pares)
+        pares['similitud'] = [similitud(a, b, umbral) for a, b in zip(pares['texto_a'], pares['texto_b'])]
+        pares = pares[pares['similitud'] >= umbral]
+        with transaction.atomic():
+            antes = PosibleDuplicado.objects.count()
+            PosibleDuplicado.objects.bulk_create(
+                [
+                    PosibleDuplicado(ingreso_id=int(a), duplicado_id=int(b), similitud=round(float(s), 4), diferencia_dias=int(d))
+                    for a, b, s, d in pares[['ingreso', 'duplicado', 'similitud', 'dias']].itertuples(index=False)
+                ],
+                batch_size=2000, ignore_conflicts=True,  # pares ya guardados (y su estado) se respetan
+            )
+            guardados = PosibleDuplicado.objects.count() - antes
+
+    return {
+        'filas': len(nuevos),
+        'candidatos': evaluados,
+        'nuevos': guardados,
+        'segundos': round(time.perf_counter() - inicio, 2),
+    }
+
+
+def _en_segundo_plano(ids):
+    try:
+        buscar(ids=ids)
+    finally:
+        close_old_connections()
+
+
+def solicitar(ids):
+    """Después de una importación (transaction.on_commit): revisa solo las filas cargadas."""
+    threading.Thread(target=_en_segundo_plano, args=(list(ids),), daemon=True).start()
@@ -1,10 +1,11 @@
 from django import forms
-from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
+from django.contrib.auth.forms import AuthenticationForm, UserChangeForm, UserCreationForm
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.core.exceptions import ValidationError
-from django.db.models import Q
 
+from . import rut as rut_util
+from .backends import usuarios_por_email
 # Importamos todos los modelos en una sola línea para mantener el orden
 from .models import (
     Ingreso, 
@@ -14,7 +15,8 @@ from .models import (
     CentroCosto, 
     Clasificacion, 
     Producto, 
-    Lote
+    Lote,
+    Cargo
 )
 class CargaExcelForm(forms.Form):
     archivo_excel = forms.FileField(label="Selecciona tu archivo Excel")
@@ -22,7 +24,7 @@ class CargaExcelForm(forms.Form):
 class IngresoForm(forms.ModelForm):
     class Meta:
         model = Ingreso
-        fields = '__all__'
+        exclude = ['clasificado_por_ia', 'confianza_ia', 'requiere_revision']
         widgets = {
             'fecha': forms.DateInput(attrs={'type': 'date'}),
             'descripcion_movimiento': forms.Textarea(attrs={'rows': 3}),
@@ -59,38 +61,31 @@ class RutLoginForm(AuthenticationForm):
 
         if cuerpo_rut and password:
             try:
-                # Algoritmo de validación y formateo de RUT para Login
-                rut_limpio = str(int(cuerpo_rut))
-                
-                suma = 0
-                multiplo = 2
-                
-                for c in reversed(rut_limpio):
-                    suma += int(c) * multiplo
-                    multiplo += 1
-                    if multiplo == 8: multiplo = 2
-                
-                dv_calculado = 11 - (suma % 11)
-                if dv_calculado == 11: dv = '0'
-                elif dv_calculado == 10: dv = 'K'
-                else: dv = str(dv_calculado)
-
-                rut_completo = f"{rut_limpio}-{dv}"
-                
-                self.cleaned_data['username'] = rut_completo
-                self.user_cache = authenticate(self.request, username=rut_completo, password=password)
-                
-                if self.user_cache is None:
-                    raise self.get_invalid_login_error()
-                else:
-                    self.confirm_login_allowed(self.user_cache)
-                    
+                rut_completo = f"{int(cuerpo_rut)}-{rut_util.calcular_dv(cuerpo_rut)}"
             except ValueError:
                 raise ValidationError("El RUT debe contener solo números.")
 
+            self.cleaned_data['username'] = rut_completo
+            self.user_cache = authenticate(self.request, username=rut_completo, password=password)
+
+            if self.user_cache is None:
+                raise self.get_invalid_login_error()
+            self.confirm_login_allowed(self.user_cache)
+
         return self.cleaned_data
 
-class RegistroUsuarioForm(UserCreationForm):
+class EmailUnicoMixin:
+    """El correo identifica al usuario en el login: no se repite (sin distinguir mayúsculas)."""
+    def clean_email(self):
+        email = (self.cleaned_data.get('email') or '').strip()
+        if email and usuarios_por_email(email).exclude(pk=self.instance.pk).exists():
+            raise ValidationError("Ya existe un usuario con este correo.")
+        return email
+
+class UsuarioAdminForm(EmailUnicoMixin, UserChangeForm):
+    pass
+
+class RegistroUsuarioForm(EmailUnicoMixin, UserCreationForm):
     first_name = forms.CharField(label="Nombre", widget=forms.TextInput(attrs={'class': 'form-control'}))
     last_name = forms.CharField(label="Apellido", widget=forms.TextInput(attrs={'class': 'form-control'}))
     email = forms.EmailField(label="Correo Electrónico", widget=forms.EmailInput(attrs={'class': 'form-control'}))
@@ -102,11 +97,10 @@ class RegistroUsuarioForm(UserCreationForm):
 class TrabajadorForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Filtro de empresas
-        self.fields['empresa'].queryset = Empresa.objects.filter(
-            Q(nombre__icontains='Samka') | Q(nombre__icontains='Maquehue')
-        )
-        self.fields['empresa'].empty_label = "Seleccione Empresa..."
+        # Empresas con personal: la lista sale del cache, la consulta solo se hace al validar
+        opciones = Empresa.opciones_rrhh()
+        self.fields['empresa'].queryset = Empresa.objects.filter(pk__in=[pk for pk, _ in opciones])
+        self.fields['empresa'].choices = [('', "Seleccione Empresa...")] + opciones
 
     class Meta:
         model = Trabajador
@@ -123,39 +117,11 @@ class TrabajadorForm(forms.ModelForm):
 
     # --- VALIDACIÓN DE RUT ---
     def clean_rut(self):
-        rut = self.cleaned_data.get('rut', '')
-        # 1. Limpieza inicial
-        rut_limpio = rut.replace('.', '').replace('-', '').upper().strip()
-        
-        if not rut_limpio or len(rut_limpio) < 2:
-            raise ValidationError("El RUT ingresado no es válido.")
-
-        # 2. Separar cuerpo y dígito verificador
-        cuerpo = rut_limpio[:-1]
-        dv = rut_limpio[-1]
-
-        # 3. Validar que el cuerpo sean números
-        if not cuerpo.isdigit():
-            raise ValidationError("El RUT contiene caracteres inválidos.")
-
-        # 4. Algoritmo Módulo 11
-        suma = 0
-        multiplo = 2
-        for c in reversed(cuerpo):
-            suma += int(c) * multiplo
-            multiplo += 1
-            if multiplo == 8: 
-                multiplo = 2
-        
-        resultado = 11 - (suma % 11)
-        dv_calculado = '0' if resultado == 11 else 'K' if resultado == 10 else str(resultado)
-
-        # 5. Comparación
-        if dv_calculado != dv:
-            raise ValidationError(f"RUT inválido. El dígito verificador no coincide.")
-
-        # 6. Devolver RUT formateado
-        return f"{int(cuerpo):,}".replace(',', '.') + "-" + dv
+        try:
+            # Se guarda en forma canónica ('12345678-9'); el formato con puntos es solo visual
+            return rut_util.validar(self.cleaned_data.get('rut', ''))
+        except rut_util.RutInvalido:
+            raise ValidationError("RUT inválido. Revise el número y el dígito verificador.")
     
 class LoteForm(forms.ModelForm):
     class Meta:
@@ -179,4 +145,84 @@ class SalidaStockForm(forms.Form):
         min_value=1,
         widget=forms.NumberInput(attrs={'class': 'form-control'}),
         label="Cantidad (Unidades)"
-    )
\ No newline at end of file
+    )
+    precio_total = forms.IntegerField(
+        min_value=0,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        label="Precio Total Venta ($)"
+    )
+
+
+class OperacionMasivaTrabajadoresForm(forms.Form):
+    """Selección (filtro y/o lista de RUT) + cambios a aplicar en bloque."""
+    ESTADOS = [('', 'Sin cambio'), ('ACTIVO', 'Activo'), ('FINIQUITADO', 'Finiquitado')]
+
+    # --- Selección ---
+    empresa = forms.TypedChoiceField(
+        required=False, coerce=int, empty_value=None,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    cargo = forms.ModelChoiceField(
+        queryset=Cargo.objects.all(), required=False, empty_label="Todos los cargos",
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    solo_activos = forms.BooleanField(required=False, initial=True,
+                                      widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}))
+    ruts = forms.CharField(
+        required=False, label="Lista de RUT",
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 4,
+                                     'placeholder': 'Uno por línea o separados por coma'}),
+    )
+
+    # --- Cambios ---
+    fecha_finiquito = forms.DateField(required=False,
+                                      widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    monto_finiquito = forms.IntegerField(required=False, min_value=0,
+                                         widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': '0'}))
+    estado = forms.ChoiceField(choices=ESTADOS, required=False,
+                               widget=forms.Select(attrs={'class': 'form-select'}))
+    cargo_nuevo = forms.ModelChoiceField(
+        queryset=Cargo.objects.all(), required=False, empty_label="Sin cambio",
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    firma = forms.CharField(required=False, widget=forms.HiddenInput())
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['empresa'].choices = [('', "Todas las empresas")] + Empresa.opciones_rrhh()
+
+    def clean_ruts(self):
+        texto = self.cleaned_data.get('ruts', '')
+        return [r.strip() for r in texto.replace(',', '\n').replace(';', '\n').splitlines() if r.strip()]
+
+    def clean(self):
+        datos = super().clean()
+        if not (datos.get('empresa') or datos.get('cargo') or datos.get('ruts')):
+            raise ValidationError("Indique al menos una empresa, un cargo o una lista de RUT.")
+        if not self.cambios():
+            raise ValidationError("Indique al menos un cambio a aplicar.")
+        return datos
+
+    def criterio(self):
+        datos = self.cleaned_data
+        return {
+            'empresa': datos.get('empresa'),
+            'cargo': datos['cargo'].pk if datos.get('cargo') else None,
+            'solo_activos': datos.get('solo_activos'),
+            'ruts': datos.get('ruts') or [],
+        }
+
+    def cambios(self):
+        datos = self.cleaned_data
+        cambios = {}
+        if datos.get('fecha_finiquito'):
+            cambios['fecha_finiquito'] = datos['fecha_finiquito']
+            # Un finiquito deja al trabajador como FINIQUITADO salvo que se indique otro estado
+            cambios['estado'] = datos.get('estado') or 'FINIQUITADO'
+        elif datos.get('estado'):
+            cambios['estado'] = datos['estado']
+        if datos.get('monto_finiquito') is not None:
+            cambios['monto_finiquito'] = datos['monto_finiquito']
+        if datos.get('cargo_nuevo'):
+            cambios['cargo'] = datos['cargo_nuevo'].pk
+        return cambios
@@ -1,14 +1,74 @@
+import json
 import os
-import joblib
-import pandas as pd
+import tempfile
+import threading
+import time
+
 from django.conf import settings
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.feature_extraction.text import TfidfTransformer
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.pipeline import Pipeline
-from .models import CajaChica  # <--- CAMBIO IMPORTANTE
+from django.db import close_old_connections
+# numpy, pandas y sklearn se importan dentro de las funciones que los usan:
+# cargarlos aquí le costaba segundos y cientos de MB a cada worker al arrancar.
+from . import almacen_ia
+from .models import CajaChica, CentroCosto, Clasificacion, Ingreso
+
+# Familias de modelos en el almacén versionado (core/almacen_ia.py)
+FAMILIA_CAJA = 'cajachica'
+# Segunda familia: descripción de egresos -> clasificación / centro de costo
+FAMILIA_INGRESOS = 'ingresos'
+
+LOCK_PATH = os.path.join(almacen_ia.DIRECTORIO, 'entrenamiento.lock')
+PENDIENTE_PATH = os.path.join(almacen_ia.DIRECTORIO, 'entrenamiento.pendiente')
+ESTADO_PATH = os.path.join(almacen_ia.DIRECTORIO, 'estado.json')
+
+# Segundos mínimos entre dos entrenamientos (las solicitudes intermedias se juntan en una)
+INTERVALO_MINIMO = getattr(settings, 'IA_INTERVALO_ENTRENAMIENTO', 300)
+# Bajo esta probabilidad la IA no elige un tipo (solo entrega las sugerencias)
+UMBRAL_CONFIANZA = getattr(settings, 'IA_UMBRAL_CONFIANZA', 0.5)
+MAX_TEXTOS_LOTE = 10000
+# Un lock más viejo que esto es de un proceso que murió a mitad de entrenamiento
+LOCK_EXPIRA = INTERVALO_MINIMO + 30 * 60
+# Con menos filas no se separa un conjunto de validación
+MIN_FILAS_VALIDACION = 20
+
+
+def _guardar_atomico(ruta, escribir):
+    """Escribe a un temporal y renombra: nadie lee un archivo a medio escribir."""
+    directorio = os.path.dirname(ruta) or '.'
+    os.makedirs(directorio, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            escribir(f)
+        os.replace(tmp, ruta)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _pipeline_texto():
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+    from sklearn.naive_bayes import MultinomialNB
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline([
+        ('vect', CountVectorizer()),
+        ('tfidf', TfidfTransformer()),
+        ('clf', MultinomialNB()),
+    ])
+
+
+def _metricas(X, y):
+    """Exactitud sobre un 20% reservado (el modelo final se entrena con todo)."""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    if len(X) < MIN_FILAS_VALIDACION or pd.Series(y).nunique() < 2:
+        return {}
+    X_ent, X_val, y_ent, y_val = train_test_split(X, y, test_size=0.2, random_state=0)
+    modelo = _pipeline_texto().fit(X_ent, y_ent)
+    return {'exactitud_validacion': round(float(modelo.score(X_val, y_val)), 4), 'filas_validacion': len(X_val)}
 
-MODEL_PATH = os.path.join(settings.BASE_DIR, 'ia_cajachica.pkl')
 
 def entrenar_modelo():
     """
@@ -16,6 +76,8 @@ def entrenar_modelo():
     Input: descripcion
     Output: tipo_documento (Boleta, Factura, Peaje, etc.)
     """
+    import pandas as pd
+
     # 1. Obtenemos los datos
     datos = CajaChica.objects.all().values('descripcion', 'tipo_documento')
     df = pd.DataFrame(list(datos))
@@ -28,27 +90,299 @@ def entrenar_modelo():
     y = df['tipo_documento']
 
     # 3. Pipeline de aprendizaje
-    text_clf = Pipeline([
-        ('vect', CountVectorizer()),
-        ('tfidf', TfidfTransformer()),
-        ('clf', MultinomialNB()),
-    ])
+    text_clf = _pipeline_texto()
 
     # 4. Entrenar
     text_clf.fit(X, y)
 
-    # 5. Guardar
-    joblib.dump(text_clf, MODEL_PATH)
-    
-    return True, f"IA entrenada con {len(df)} gastos de caja chica."
+    # 5. Guardar como versión nueva (las predicciones usan la anterior hasta que se promueve)
+    version = almacen_ia.guardar(FAMILIA_CAJA, text_clf, filas=len(df), metricas=_metricas(X, y))
+
+    return True, f"IA entrenada con {len(df)} gastos de caja chica ({version})."
+
+
+# Campos de Ingreso que la IA aprende a completar
+CAMPOS_INGRESO = ('clasificacion', 'centro_costo')
+
+
+def texto_ingreso(descripcion, detalle):
+    return f"{descripcion or ''} {detalle or ''}".strip()
+
+
+def entrenar_modelo_ingresos():
+    """
+    Entrena un modelo por campo (clasificación y centro de costo) con los egresos
+    clasificados por una persona. Los que completó la IA no se usan, para no
+    reaprender sus propios errores.
+    """
+    import pandas as pd
+
+    datos = Ingreso.objects.filter(clasificado_por_ia=False).values_list(
+        'descripcion_movimiento', 'detalle', 'clasificacion_id', 'centro_costo_id'
+    )
+    df = pd.DataFrame(list(datos), columns=['descripcion', 'detalle', 'clasificacion', 'centro_costo'])
+    if df.empty:
+        return False, "No hay egresos clasificados para aprender."
+    df['texto'] = [texto_ingreso(d, t) for d, t in zip(df['descripcion'], df['detalle'])]
+
+    modelos, metricas = {}, {}
+    for campo in CAMPOS_INGRESO:
+        etiquetados = df[df[campo].notna()]
+        # Con menos de 5 ejemplos o una sola clase no hay nada que aprender
+        if len(etiquetados) < 5 or etiquetados[campo].nunique() < 2:
+            continue
+        X, y = etiquetados['texto'], etiquetados[campo].astype(int)
+        modelos[campo] = _pipeline_texto().fit(X, y)
+        metricas[campo] = _metricas(X, y)
+
+    if not modelos:
+        return False, "Necesito al menos 5 egresos y 2 categorías distintas para aprender."
+
+    version = almacen_ia.guardar(FAMILIA_INGRESOS, modelos, filas=len(df), metricas=metricas)
+    return True, f"IA de egresos entrenada con {len(df)} registros ({', '.join(modelos)}, {version})."
+
+
+# =========================================================
+# COORDINACIÓN DE ENTRENAMIENTOS
+# =========================================================
+def _tomar_lock():
+    """Lock entre procesos: crear el archivo con O_EXCL es atómico (Linux y Windows)."""
+    for _ in range(2):
+        try:
+            fd = os.open(LOCK_PATH, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                vencido = time.time() - os.path.getmtime(LOCK_PATH) > LOCK_EXPIRA
+            except OSError:
+                continue  # lo soltaron entremedio
+            if not vencido:
+                return False
+            try:
+                os.remove(LOCK_PATH)
+            except OSError:
+                pass
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(f"{os.getpid()} {time.time()}")
+        return True
+    return False
+
+
+def _soltar_lock():
+    try:
+        os.remove(LOCK_PATH)
+    except OSError:
+        pass
+
+
+def _marcar_pendiente():
+    os.makedirs(os.path.dirname(PENDIENTE_PATH), exist_ok=True)
+    with open(PENDIENTE_PATH, 'w') as f:
+        f.write(str(time.time()))
+
+
+def _quitar_pendiente():
+    try:
+        os.remove(PENDIENTE_PATH)
+    except OSError:
+        pass
+
+
+def leer_estado():
+    """Estado del entrenamiento para el endpoint de consulta."""
+    estado = {}
+    try:
+        with open(ESTADO_PATH, encoding='utf-8') as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        pass
+    estado.update({
+        'en_curso': os.path.exists(LOCK_PATH),
+        'pendiente': os.path.exists(PENDIENTE_PATH),
+        'modelo_disponible': almacen_ia.version_actual(FAMILIA_CAJA) is not None,
+        'versiones': {f: almacen_ia.version_actual(f) for f in (FAMILIA_CAJA, FAMILIA_INGRESOS)},
+    })
+    return estado
+
+
+def _guardar_estado(**cambios):
+    estado = leer_estado()
+    for clave in ('en_curso', 'pendiente', 'modelo_disponible', 'versiones'):
+        estado.pop(clave, None)
+    estado.update(cambios)
+    contenido = json.dumps(estado, ensure_ascii=False).encode('utf-8')
+    _guardar_atomico(ESTADO_PATH, lambda f: f.write(contenido))
+
+
+def _ejecutar(espera=0):
+    """
+    Corre con el lock tomado. Entrena, y si mientras tanto llegaron más
+    solicitudes, vuelve a entrenar UNA vez más respetando el intervalo mínimo.
+    """
+    try:
+        while True:
+            if espera > 0:
+                time.sleep(espera)
+            _quitar_pendiente()
+            _guardar_estado(inicio=time.time())
+            try:
+                exito, mensaje = entrenar_modelo()
+            except Exception as e:
+                exito, mensaje = False, f"Error al entrenar: {e}"
+            try:
+                exito_ingresos, mensaje_ingresos = entrenar_modelo_ingresos()
+            except Exception as e:
+                exito_ingresos, mensaje_ingresos = False, f"Error al entrenar: {e}"
+            _guardar_estado(
+                ultimo_entrenamiento=time.time(), exito=exito, mensaje=mensaje,
+                exito_ingresos=exito_ingresos, mensaje_ingresos=mensaje_ingresos,
+            )
+            if not os.path.exists(PENDIENTE_PATH):
+                return exito, mensaje
+            espera = INTERVALO_MINIMO
+    finally:
+        _soltar_lock()
+
+
+def _en_segundo_plano(espera):
+    try:
+        _ejecutar(espera)
+    finally:
+        close_old_connections()
+
+
+def solicitar_entrenamiento(en_segundo_plano=True):
+    """
+    Pide un reentrenamiento sin lanzar uno por cada clic.
+
+    - Si ya hay uno corriendo, la solicitud queda pendiente y se atiende al terminar.
+    - Si el último fue hace menos de INTERVALO_MINIMO, se programa para cuando se cumpla
+      (en modo síncrono solo queda pendiente).
+    - Sin modelo todavía, se entrena de inmediato.
+
+    Devuelve el estado actual más 'resultado': entrenando / en_cola / programado / entrenado / error.
+    """
+    _marcar_pendiente()
+    if not _tomar_lock():
+        return {**leer_estado(), 'resultado': 'en_cola'}
+
+    estado = leer_estado()
+    espera = 0
+    if estado['modelo_disponible'] and estado.get('ultimo_entrenamiento'):
+        espera = max(0, INTERVALO_MINIMO - (time.time() - estado['ultimo_entrenamiento']))
+
+    if en_segundo_plano:
+        threading.Thread(target=_en_segundo_plano, args=(espera,), daemon=True).start()
+        return {**leer_estado(), 'resultado': 'programado' if espera else 'entrenando', 'espera': int(espera)}
+
+    if espera:
+        _soltar_lock()
+        return {**leer_estado(), 'resultado': 'programado', 'espera': int(espera)}
+
+    exito, mensaje = _ejecutar()
+    return {**leer_estado(), 'resultado': 'entrenado' if exito else 'error', 'mensaje': mensaje}
+
+
+# =========================================================
+# PREDICCIÓN
+# =========================================================
+def cargar_modelo(familia=FAMILIA_CAJA):
+    """Modelo en uso de la familia (memoria compartida entre workers vía mmap)."""
+    return almacen_ia.cargar(familia)
+
 
 def predecir_categoria(texto_descripcion):
-    if not os.path.exists(MODEL_PATH):
+    modelo = cargar_modelo()
+    if modelo is None:
         return None
 
     try:
-        modelo = joblib.load(MODEL_PATH)
         prediccion = modelo.predict([texto_descripcion])[0]
         return prediccion
     except:
-        return None
\ No newline at end of file
+        return None
+
+
+def sugerir_tipos(textos, k=3, umbral=None, modelo=None):
+    """
+    Clasifica muchas descripciones en UNA llamada vectorizada a predict_proba.
+
+    Devuelve None si aún no hay modelo; si no, una lista alineada con `textos`:
+    [{'tipo': str | None, 'confianza': float, 'sugerencias': [{'tipo', 'probabilidad'}]}]
+    `tipo` es None cuando la mejor probabilidad no alcanza el umbral (la IA se abstiene).
+    """
+    import numpy as np
+
+    modelo = modelo or cargar_modelo()
+    if modelo is None:
+        return None
+    if not len(textos):
+        return []
+    umbral = UMBRAL_CONFIANZA if umbral is None else umbral
+
+    textos = ['' if t is None else str(t) for t in textos]
+    probabilidades = modelo.predict_proba(textos)
+    clases = [str(c) for c in modelo.classes_]
+    k = max(1, min(int(k), len(clases)))
+
+    # Top-k por fila sin recorrer en Python: índices ordenados por probabilidad descendente
+    indices = np.argsort(-probabilidades, axis=1)[:, :k]
+    mejores = np.take_along_axis(probabilidades, indices, axis=1).round(4)
+
+    resultados = []
+    for fila_indices, fila_probs in zip(indices.tolist(), mejores.tolist()):
+        confianza = fila_probs[0]
+        resultados.append({
+            'tipo': clases[fila_indices[0]] if confianza >= umbral else None,
+            'confianza': confianza,
+            'sugerencias': [
+                {'tipo': clases[i], 'probabilidad': p} for i, p in zip(fila_indices, fila_probs)
+            ],
+        })
+    return resultados
+
+
+def clasificar_ingresos(ingresos, umbral=None):
+    """
+    Completa clasificación y centro de costo de los egresos que vienen sin ellos.
+
+    Trabaja sobre objetos Ingreso aún no guardados (etapa previa al bulk_create):
+    UNA llamada a predict_proba por campo para todo el lote. Marca
+    `clasificado_por_ia`, guarda la confianza de la clasificación y deja
+    `requiere_revision` en los que quedan bajo el umbral.
+
+    Devuelve cuántos egresos se completaron.
+    """
+    modelos = cargar_modelo(FAMILIA_INGRESOS)
+    if not modelos:
+        return 0
+    umbral = UMBRAL_CONFIANZA if umbral is None else umbral
+    catalogos = {'clasificacion': Clasificacion, 'centro_costo': CentroCosto}
+
+    completados = set()
+    for campo, modelo in modelos.items():
+        pendientes = [i for i in ingresos if getattr(i, f'{campo}_id') is None]
+        if not pendientes:
+            continue
+
+        # Solo sugerimos categorías que siguen existiendo
+        clases = [int(c) for c in modelo.classes_]
+        vigentes = set(catalogos[campo].objects.filter(id__in=clases).values_list('id', flat=True))
+
+        probabilidades = modelo.predict_proba(
+            [texto_ingreso(i.descripcion_movimiento, i.detalle) for i in pendientes]
+        )
+        mejores = probabilidades.argmax(axis=1)
+        confianzas = probabilidades.max(axis=1).round(4)
+
+        for ingreso, indice, confianza in zip(pendientes, mejores.tolist(), confianzas.tolist()):
+            if clases[indice] not in vigentes:
+                continue
+            setattr(ingreso, f'{campo}_id', clases[indice])
+            ingreso.clasificado_por_ia = True
+            if campo == 'clasificacion':
+                ingreso.confianza_ia = confianza
+            if confianza < umbral:
+                ingreso.requiere_revision = True
+            completados.add(id(ingreso))
+    return len(completados)
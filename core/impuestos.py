@@ -0,0 +1,89 @@
+# core/impuestos.py
+"""
+Motor de IVA.
+
+Los montos del sistema son totales brutos en pesos (sin decimales), así que el IVA
+se obtiene "desde adentro": neto = round(total / 1,19) e IVA = total - neto.
+Todo se calcula con enteros, sin floats: el mismo total siempre da el mismo IVA,
+sea fila a fila (save) o vectorizado (importaciones y recálculos masivos).
+
+No importa modelos: lo usan models.py, las vistas y los comandos. NumPy y pandas
+se cargan solo en la API vectorizada (models.py no debe arrastrarlos al arrancar).
+"""
+import unicodedata
+from decimal import Decimal
+
+TASA_IVA = 19  # %
+
+# Documentos afectos (tipo ya normalizado: mayúsculas, sin tildes, espacios simples)
+DOCUMENTOS_AFECTOS = ('FACTURA', 'BOLETA', 'NOTA DE DEBITO', 'NOTA DE CREDITO')
+# Si aparece alguna de estas marcas el documento es exento aunque diga "FACTURA"
+MARCAS_EXENTO = ('EXENTA', 'EXENTO', 'NO AFECTA')
+
+
+def normalizar_tipo(tipo):
+    """' Nota de Crédito ' -> 'NOTA DE CREDITO'"""
+    if tipo is None:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(tipo)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(texto.replace('_', ' ').upper().split())
+
+
+def es_afecto(tipo):
+    tipo = normalizar_tipo(tipo)
+    if any(marca in tipo for marca in MARCAS_EXENTO):
+        return False
+    return any(doc in tipo for doc in DOCUMENTOS_AFECTOS)
+
+
+def _a_entero(monto):
+    if monto is None or monto == '':
+        return 0
+    try:
+        return int(Decimal(str(monto)).to_integral_value())
+    except ArithmeticError:
+        return 0
+
+
+def iva_incluido(total):
+    """
+    IVA contenido en un total bruto (entero). El neto se redondea al peso más cercano;
+    con tasa 19% nunca hay empates (.5), así que no depende del modo de redondeo.
+    Los totales negativos (notas de crédito) dan IVA negativo.
+    """
+    total = _a_entero(total)
+    bruto = abs(total)
+    base = 100 + TASA_IVA
+    neto = (bruto * 200 + base) // (2 * base)  # round(bruto * 100 / base) en enteros
+    return (bruto - neto) if total >= 0 else -(bruto - neto)
+
+
+def calcular_iva(total, tipo_documento):
+    """API fila a fila (save / propiedades). Devuelve Decimal, como el campo `iva`."""
+    if not es_afecto(tipo_documento):
+        return Decimal(0)
+    return Decimal(iva_incluido(total))
+
+
+def calcular_iva_vectorizado(totales, tipos):
+    """
+    API vectorizada para cargas masivas y recálculos: recibe secuencias alineadas
+    (listas, Series o arrays) y devuelve un np.ndarray int64 con el IVA de cada fila.
+
+    Las reglas por tipo se evalúan una vez por tipo distinto (son pocos) y el
+    cálculo del neto se hace con aritmética entera de NumPy.
+    """
+    import numpy as np
+    import pandas as pd
+
+    totales = pd.to_numeric(pd.Series(list(totales), dtype=object), errors='coerce').fillna(0)
+    totales = totales.round().astype('int64').to_numpy()
+    tipos = pd.Series(list(tipos), dtype=object).fillna('').astype(str)
+
+    afecto = tipos.map({t: es_afecto(t) for t in tipos.unique()}).to_numpy(dtype=bool)
+
+    bruto = np.abs(totales)
+    base = 100 + TASA_IVA
+    neto = (bruto * 200 + base) // (2 * base)
+    iva = np.sign(totales) * (bruto - neto)
+    return np.where(afecto, iva, 0).astype('int64')
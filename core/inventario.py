@@ -0,0 +1,346 @@
+# core/inventario.py
+import datetime
+import io
+import math
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import CorteStock, CorteStockDetalle, Lote, MovimientoStock, Producto
+
+# Encabezados aceptados en la planilla -> campo interno
+COLUMNAS_LOTES = {
+    'CODIGO': 'codigo', 'SKU': 'codigo', 'CODIGO_SKU': 'codigo',
+    'NOMBRE': 'nombre', 'PRODUCTO': 'nombre',
+    'CATEGORIA': 'categoria',
+    'LOTE': 'numero_lote', 'NUMERO_LOTE': 'numero_lote', 'NRO_LOTE': 'numero_lote',
+    'VENCIMIENTO': 'fecha_vencimiento', 'FECHA_VENCIMIENTO': 'fecha_vencimiento',
+    'ELABORACION': 'fecha_elaboracion', 'FECHA_ELABORACION': 'fecha_elaboracion',
+    'CANTIDAD': 'cantidad', 'STOCK': 'cantidad',
+}
+
+
+class FilaInvalida(ValueError):
+    pass
+
+
+class StockInsuficiente(ValueError):
+    pass
+
+
+def _normalizar_encabezado(texto):
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return texto.strip().upper().replace(' ', '_').replace('.', '')
+
+
+def _texto(valor):
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        # Excel entrega los códigos numéricos como 123.0
+        valor = int(valor)
+    texto = str(valor).strip()
+    return '' if texto.lower() == 'nan' else texto
+
+
+def _fecha(valor, campo, obligatoria=True):
+    # valor != valor: NaN / NaT de la planilla (sin cargar pandas para la API JSON)
+    if valor is None or valor == '' or (not isinstance(valor, str) and valor != valor):
+        if obligatoria:
+            raise FilaInvalida(f"Falta {campo}.")
+        return None
+    if isinstance(valor, datetime.datetime):
+        return valor.date()
+    if isinstance(valor, datetime.date):
+        return valor
+    texto = str(valor).strip()
+    try:
+        fecha = parse_date(texto)
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        try:
+            fecha = datetime.datetime.strptime(texto, '%d/%m/%Y').date()
+        except ValueError:
+            raise FilaInvalida(f"{campo} inválida: '{texto}'.")
+    return fecha
+
+
+def _largo(texto, modelo, campo, etiqueta):
+    """Mismo max_length del modelo: en PostgreSQL un valor largo abortaría toda la carga."""
+    maximo = modelo._meta.get_field(campo).max_length
+    if len(texto) > maximo:
+        raise FilaInvalida(f"{etiqueta} supera {maximo} caracteres.")
+    return texto
+
+
+def _cantidad(valor):
+    try:
+        cantidad = int(float(valor))
+    except (TypeError, ValueError):
+        raise FilaInvalida(f"Cantidad inválida: '{valor}'.")
+    if cantidad < 0:
+        raise FilaInvalida("La cantidad no puede ser negativa.")
+    return cantidad
+
+
+def leer_planilla_lotes(archivo):
+    """Lee un .xlsx/.xls o .csv y devuelve una lista de dicts con los campos internos."""
+    import pandas as pd
+
+    nombre = getattr(archivo, 'name', '').lower()
+    if nombre.endswith('.csv'):
+        contenido = archivo.read()
+        try:
+            texto = contenido.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            texto = contenido.decode('latin-1')  # CSV exportado desde Excel en Windows
+        # Todo como texto (conserva ceros a la izquierda); separador , o ; autodetectado
+        df = pd.read_csv(io.StringIO(texto), dtype=str, sep=None, engine='python')
+    else:
+        df = pd.read_excel(archivo, engine='openpyxl')
+
+    columnas = {}
+    for col in df.columns:
+        campo = COLUMNAS_LOTES.get(_normalizar_encabezado(col))
+        if campo and campo not in columnas.values():
+            columnas[col] = campo
+    df = df[list(columnas)].rename(columns=columnas)
+    return df.to_dict('records')
+
+
+def ingresar_lotes_masivo(filas, crear_productos=True, usuario=None):
+    """
+    Carga muchos lotes de una vez.
+
+    1. Valida cada fila (los errores se reportan por fila, no abortan la carga).
+    2. Resuelve todos los productos con UN in_bulk por código.
+    3. Crea los productos desconocidos en UN bulk_create (categoría normalizada).
+    4. Inserta los lotes con bulk_create (y sus movimientos ENTRADA en el libro).
+
+    Devuelve {'creados', 'productos_creados', 'errores': [{'fila', 'error'}], 'lotes'}.
+    Las filas se numeran desde 1.
+    """
+    validas = []
+    errores = []
+
+    for numero, fila in enumerate(filas, start=1):
+        try:
+            if not isinstance(fila, dict):
+                raise FilaInvalida("La fila debe ser un objeto")
+            codigo = _largo(_texto(fila.get('codigo')), Producto, 'codigo', "El código")
+            if not codigo:
+                raise FilaInvalida("Falta el código del producto.")
+            numero_lote = _largo(_texto(fila.get('numero_lote')), Lote, 'numero_lote', "El número de lote")
+            if not numero_lote:
+                raise FilaInvalida("Falta el número de lote.")
+            validas.append({
+                'fila': numero,
+                'codigo': codigo,
+                'nombre': _largo(_texto(fila.get('nombre')), Producto, 'nombre', "El nombre"),
+                'categoria': _largo(_texto(fila.get('categoria')), Producto, 'categoria', "La categoría") or None,
+                'numero_lote': numero_lote,
+                'fecha_vencimiento': _fecha(fila.get('fecha_vencimiento'), 'fecha de vencimiento'),
+                'fecha_elaboracion': _fecha(fila.get('fecha_elaboracion'), 'fecha de elaboración', obligatoria=False),
+                'cantidad': _cantidad(fila.get('cantidad', 0)),
+            })
+        except FilaInvalida as e:
+            errores.append({'fila': numero, 'error': str(e)})
+
+    resultado = {'creados': 0, 'productos_creados': 0, 'errores': errores, 'lotes': []}
+    if not validas:
+        return resultado
+
+    codigos = {v['codigo'] for v in validas}
+
+    with transaction.atomic():
+        productos = Producto.objects.in_bulk(codigos, field_name='codigo')
+
+        # Productos nuevos: uno por código (el primer nombre/categoría que aparezca)
+        nuevos = {}
+        for v in validas:
+            if v['codigo'] in productos or v['codigo'] in nuevos:
+                continue
+            if crear_productos and v['nombre']:
+                nuevos[v['codigo']] = Producto(
+                    codigo=v['codigo'],
+                    nombre=v['nombre'],
+                    categoria=Producto.normalizar_categoria(v['categoria']),
+                )
+
+        if nuevos:
+            Producto.objects.bulk_create(nuevos.values(), ignore_conflicts=True)
+            # Releemos para tener los ID (y por si otro proceso creó alguno en paralelo):
+            # se cuentan los que existen de verdad, no los que intentamos insertar
+            creados = Producto.objects.in_bulk(list(nuevos), field_name='codigo')
+            productos.update(creados)
+            resultado['productos_creados'] = len(creados)
+
+        lotes = []
+        for v in validas:
+            producto = productos.get(v['codigo'])
+            if producto is None:
+                errores.append({'fila': v['fila'], 'error': f"Producto '{v['codigo']}' no existe (indique nombre para crearlo)."})
+                continue
+            lotes.append(Lote(
+                producto=producto,
+                numero_lote=v['numero_lote'],
+                fecha_vencimiento=v['fecha_vencimiento'],
+                fecha_elaboracion=v['fecha_elaboracion'],
+                cantidad=v['cantidad'],
+            ))
+
+        Lote.objects.bulk_create(lotes, batch_size=500)
+        MovimientoStock.objects.bulk_create(
+            [_movimiento(lote, 'ENTRADA', lote.cantidad, usuario, 'Carga masiva') for lote in lotes],
+            batch_size=500,
+        )
+
+    errores.sort(key=lambda e: e['fila'])
+    resultado['creados'] = len(lotes)
+    resultado['lotes'] = lotes
+    return resultado
+
+
+# =========================================================
+# LIBRO DE MOVIMIENTOS Y CORTES DE STOCK
+# =========================================================
+# Margen para que un corte no quede "antes" de transacciones aún abiertas
+MARGEN_CORTE = datetime.timedelta(minutes=5)
+
+
+def _movimiento(lote, tipo, cantidad, usuario=None, referencia='', producto=None):
+    if usuario is not None and not getattr(usuario, 'is_authenticated', False):
+        usuario = None
+    producto = producto or lote.producto
+    return MovimientoStock(
+        tipo=tipo,
+        producto=producto,
+        codigo_producto=producto.codigo,
+        nombre_producto=producto.nombre,
+        lote=lote,
+        numero_lote=lote.numero_lote,
+        cantidad=cantidad,
+        usuario=usuario,
+        referencia=referencia[:255],
+    )
+
+
+def registrar_entrada(lote, usuario=None, referencia='Ingreso de lote'):
+    movimiento = _movimiento(lote, 'ENTRADA', lote.cantidad, usuario, referencia)
+    movimiento.save()
+    return movimiento
+
+
+def registrar_ajuste(lote, cantidad_anterior, usuario=None, referencia='Ajuste manual'):
+    """Registra la diferencia entre la cantidad anterior y la actual del lote (si la hay)."""
+    diferencia = (lote.cantidad or 0) - (cantidad_anterior or 0)
+    if not diferencia:
+        return None
+    movimiento = _movimiento(lote, 'AJUSTE', diferencia, usuario, referencia)
+    movimiento.save()
+    return movimiento
+
+
+def registrar_baja(lote, usuario=None, referencia='Baja de lote'):
+    """Saca del libro el stock que tenía un lote que se va a eliminar."""
+    if not lote.cantidad:
+        return None
+    movimiento = _movimiento(lote, 'AJUSTE', -lote.cantidad, usuario, referencia)
+    movimiento.save()
+    return movimiento
+
+
+def descontar_fifo(producto, cantidad, usuario=None, referencia=''):
+    """
+    Descuenta `cantidad` del producto consumiendo primero los lotes que vencen antes.
+    Registra una VENTA por lote tocado y borra los lotes que quedan en cero
+    (el historial queda en el libro). Debe llamarse dentro de transaction.atomic().
+
+    El stock se revisa con los lotes ya bloqueados (SELECT ... FOR UPDATE): dos ventas
+    simultáneas no pueden pasar ambas la revisión. Sin stock suficiente lanza
+    StockInsuficiente y no descuenta nada.
+    """
+    lotes = list(Lote.objects.select_for_update().filter(producto=producto).order_by('fecha_vencimiento', 'id'))
+    disponible = sum(lote.cantidad for lote in lotes)
+    if cantidad > disponible:
+        raise StockInsuficiente(f"Stock insuficiente. Tienes {disponible}, intentas vender {cantidad}.")
+    pendiente = cantidad
+    movimientos, agotados, actualizados = [], [], []
+
+    for lote in lotes:
+        if pendiente <= 0:
+            break
+        usado = min(lote.cantidad, pendiente)
+        if usado <= 0:
+            continue
+        pendiente -= usado
+        movimientos.append(_movimiento(lote, 'VENTA', -usado, usuario, referencia, producto))
+        lote.cantidad -= usado
+        (agotados if lote.cantidad == 0 else actualizados).append(lote)
+
+    MovimientoStock.objects.bulk_create(movimientos)
+    if actualizados:
+        Lote.objects.bulk_update(actualizados, ['cantidad'])
+    if agotados:
+        Lote.objects.filter(id__in=[l.id for l in agotados]).delete()
+    return movimientos
+
+
+def _limite(fecha):
+    """Fecha -> fin de ese día (zona local); datetime -> se usa tal cual."""
+    if fecha is None:
+        return timezone.now()
+    if isinstance(fecha, datetime.datetime):
+        return fecha if timezone.is_aware(fecha) else timezone.make_aware(fecha)
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.max))
+
+
+def stock_en_fecha(fecha=None, productos=None):
+    """
+    Stock por producto en un instante: {producto_id: cantidad}.
+
+    Parte del corte más cercano anterior a la fecha y suma solo los movimientos
+    posteriores a ese corte (no recorre todo el historial).
+    """
+    limite = _limite(fecha)
+    corte = CorteStock.objects.filter(fecha__lte=limite).order_by('-fecha').first()
+
+    saldos = {}
+    movimientos = MovimientoStock.objects.filter(fecha__lte=limite)
+    if corte:
+        detalles = corte.detalles.all()
+        if productos is not None:
+            detalles = detalles.filter(producto__in=productos)
+        saldos = dict(detalles.values_list('producto_id', 'cantidad'))
+        movimientos = movimientos.filter(fecha__gt=corte.fecha)
+
+    if productos is not None:
+        movimientos = movimientos.filter(producto__in=productos)
+    # Movimientos de productos borrados (producto NULL) ya no suman a ningún stock
+    deltas = movimientos.filter(producto__isnull=False).order_by().values('producto_id').annotate(total=Sum('cantidad'))
+    for d in deltas:
+        saldos[d['producto_id']] = saldos.get(d['producto_id'], 0) + d['total']
+
+    return {producto_id: cantidad for producto_id, cantidad in saldos.items() if cantidad}
+
+
+@transaction.atomic
+def crear_corte(fecha=None):
+    """Guarda un corte con el stock de cada producto (incremental desde el corte anterior)."""
+    fecha = _limite(fecha) if fecha else timezone.now() - MARGEN_CORTE
+    existente = CorteStock.objects.filter(fecha=fecha).first()
+    if existente:
+        return existente
+
+    # Se calcula ANTES de crear el corte, para partir del corte anterior
+    saldos = stock_en_fecha(fecha)
+    corte = CorteStock.objects.create(fecha=fecha)
+    CorteStockDetalle.objects.bulk_create([
+        CorteStockDetalle(corte=corte, producto_id=producto_id, cantidad=cantidad)
+        for producto_id, cantidad in saldos.items()
+    ], batch_size=1000)
+    return corte
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Archiva años cerrados: Ingreso, Movimiento y CajaChica del año pasan a Parquet "
+        "(core/archivo.py), se verifican filas y montos y se borran de las tablas vivas. "
+        "En PostgreSQL bloquea la escritura en esas tablas mientras corre: programarlo "
+        "fuera de horario. Sin años, lista lo archivado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('anios', nargs='*', type=int, metavar='ANIO')
+
+    def handle(self, *args, **options):
+        for anio in options['anios']:
+            try:
+                meta = archivo.archivar_anio(anio)
+            except archivo.ArchivoError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f"Año {anio} archivado en {archivo.DIRECTORIO}"))
+            self._resumen(meta)
+
+        if not options['anios']:
+            anios = archivo.anios_archivados()
+            if not anios:
+                self.stdout.write(f"No hay años archivados en {archivo.DIRECTORIO}.")
+            for anio in anios:
+                self.stdout.write(f"Año {anio}:")
+                self._resumen(archivo.metadatos(anio))
+
+    def _resumen(self, meta):
+        for nombre, tabla in meta['tablas'].items():
+            self.stdout.write(
+                f"  {nombre:<12} {tabla['filas']:>9} filas | monto {tabla['suma']:>15,} | "
+                f"{tabla['bytes'] / 1024:>8.1f} KB"
+            )
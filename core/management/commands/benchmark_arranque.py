@@ -0,0 +1,130 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Lo que importa un worker de gunicorn al arrancar (wsgi -> urls -> vistas) y sus piezas
+MODULOS = (
+    'core.models',
+    'core.forms',
+    'core.views.inicio',
+    'core.views.finanzas',
+    'core.views.caja',
+    'core.views.rrhh',
+    'core.views.inventario',
+    'core.views.ia',
+    'core.views.export',
+    'core.views',
+    'sistema.urls',
+    'sistema.wsgi',
+)
+
+# Paquetes cuyo __init__ reexporta todos sus submódulos: importar core.views.caja
+# correría core/views/__init__.py y con él todas las vistas. Sus submódulos se miden
+# con el paquete vacío, así cada fila muestra lo que cuesta ese módulo y lo que importa.
+PAQUETES_AISLADOS = ('core.views',)
+
+# Librerías que no deberían cargarse solo por importar las vistas
+PESADAS = ('pandas', 'numpy', 'openpyxl', 'sklearn', 'joblib', 'scipy', 'weasyprint', 'reportlab')
+
+# Se ejecuta en un intérprete nuevo por medición: así cada módulo se mide en frío
+SONDA = r'''
+import importlib, importlib.util, json, os, sys, time
+
+def rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+inicio = time.perf_counter()
+import django
+django.setup()
+setup_s = time.perf_counter() - inicio
+modulo, paquete = sys.argv[1], sys.argv[3]
+if paquete:
+    # El paquete sin ejecutar su __init__: solo define __path__ para hallar el submódulo
+    sys.modules[paquete] = importlib.util.module_from_spec(importlib.util.find_spec(paquete))
+rss_base = rss()
+previos = set(sys.modules)
+
+inicio = time.perf_counter()
+if modulo != '-':
+    importlib.import_module(modulo)
+print(json.dumps({
+    'setup_s': setup_s,
+    'import_s': time.perf_counter() - inicio,
+    'rss_base': rss_base,
+    'rss': rss(),
+    'nuevos': len(set(sys.modules) - previos),
+    'pesadas': sorted(p for p in sys.argv[2].split(',') if p in sys.modules),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque en frío: tiempo de django.setup() y, por módulo, tiempo de "
+        "importación, RSS agregado y qué librerías pesadas quedan cargadas. Cada "
+        "medición corre en un proceso Python nuevo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modulos', default=','.join(MODULOS),
+                            help='Módulos a medir, separados por coma.')
+        parser.add_argument('--repeticiones', type=int, default=3,
+                            help='Procesos por módulo; se informa la mediana (por defecto 3).')
+        parser.add_argument('--json', action='store_true',
+                            help='Entrega el resultado como JSON (para comparar entre versiones).')
+
+    def _medir(self, modulo):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        paquete = modulo.rpartition('.')[0]
+        proceso = subprocess.run(
+            [sys.executable, '-c', SONDA, modulo, ','.join(PESADAS),
+             paquete if paquete in PAQUETES_AISLADOS else ''],
+            capture_output=True, text=True, env=env, cwd=str(settings.BASE_DIR),
+        )
+        if proceso.returncode != 0:
+            raise CommandError(f"No se pudo importar {modulo}:\n{proceso.stderr.strip()}")
+        return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        modulos = [m.strip() for m in options['modulos'].split(',') if m.strip()]
+        repeticiones = max(1, options['repeticiones'])
+
+        resultados = []
+        for modulo in ['-'] + modulos:
+            medidas = [self._medir(modulo) for _ in range(repeticiones)]
+            clave = 'setup_s' if modulo == '-' else 'import_s'
+            resultados.append({
+                'modulo': 'django.setup()' if modulo == '-' else modulo,
+                'ms': round(statistics.median(m[clave] for m in medidas) * 1000, 1),
+                'rss_mb': round(statistics.median(
+                    (m['rss_base'] if modulo == '-' else m['rss'] - m['rss_base']) for m in medidas
+                ) / 2 ** 20, 1),
+                'modulos_nuevos': medidas[-1]['nuevos'],
+                'pesadas': medidas[-1]['pesadas'],
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados, indent=2))
+            return
+
+        self.stdout.write(f"{'módulo':<24} | {'ms':>8} | {'RSS MB':>7} | {'módulos':>7} | pesadas cargadas")
+        for fila in resultados:
+            self.stdout.write(
+                f"{fila['modulo']:<24} | {fila['ms']:>8.1f} | {fila['rss_mb']:>7.1f} | "
+                f"{fila['modulos_nuevos']:>7} | {', '.join(fila['pesadas']) or '-'}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Mediana de {repeticiones} procesos por módulo. django.setup() indica RSS total; "
+            f"los módulos, lo que agregan sobre él (los de {', '.join(PAQUETES_AISLADOS)} sin el "
+            f"__init__ del paquete, que importa todas las vistas)."
+        ))
@@ -0,0 +1,63 @@
+import datetime
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import conciliacion
+from core.models import Conciliacion, Ingreso, Movimiento
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la conciliación bancaria con N movimientos contra N ingresos sintéticos "
+        "(la mitad con N° de documento, algunos pagos agrupados y montos repetidos). "
+        "Corre dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=100_000)
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def _datos(self, filas, azar):
+        inicio = datetime.date(2030, 1, 1)
+        movimientos, ingresos = [], []
+        for i in range(filas):
+            fecha = inicio + datetime.timedelta(days=azar.randrange(365))
+            monto = azar.randrange(1, 500) * 1000  # montos repetidos: la fecha desempata
+            doc = str(100_000 + i) if i % 2 else None
+            movimientos.append(Movimiento(fecha=fecha, descripcion='bench', tipo='EGRESO', monto=monto, n_documento=doc))
+            if i % 10 == 0:  # pago de dos facturas con el mismo documento
+                mitad = monto // 2
+                for parte in (mitad, monto - mitad):
+                    ingresos.append(Ingreso(fecha=fecha, n_documento=f'F{i}', monto_transferencia=parte, iva=0))
+            else:
+                desfase = datetime.timedelta(days=azar.randint(-2, 2))
+                ingresos.append(Ingreso(fecha=fecha + desfase, n_documento=doc and f'N° 00{doc}',
+                                        monto_transferencia=monto, iva=0))
+        return movimientos, ingresos[:filas]
+
+    def handle(self, *args, **options):
+        filas = max(1, options['filas'])
+        movimientos, ingresos = self._datos(filas, random.Random(options['semilla']))
+        with transaction.atomic():
+            Conciliacion.objects.all().delete()
+            Movimiento.objects.bulk_create(movimientos, batch_size=5000)
+            Ingreso.objects.bulk_create(ingresos, batch_size=5000)
+            self.stdout.write(f"{len(movimientos)} movimientos x {len(ingresos)} ingresos")
+
+            resultado = conciliacion.conciliar()
+            for regla, cantidad in resultado['nuevas'].items():
+                self.stdout.write(f"  {regla:<12} {cantidad:>9}")
+            self.stdout.write(f"  pendientes   {resultado['pendientes']}")
+            self.stdout.write(self.style.SUCCESS(f"Conciliación completa: {resultado['segundos']} s"))
+
+            # Incremental: llega una importación chica y solo se cruza lo pendiente
+            nuevos = [Movimiento(fecha=datetime.date(2030, 6, 1), descripcion='bench', tipo='EGRESO', monto=999_001)]
+            Movimiento.objects.bulk_create(nuevos)
+            Ingreso.objects.create(fecha=datetime.date(2030, 6, 2), monto_transferencia=999_001)
+            resultado = conciliacion.conciliar()
+            self.stdout.write(self.style.SUCCESS(
+                f"Después de importar 1 + 1 filas: {sum(resultado['nuevas'].values())} nuevas en {resultado['segundos']} s"
+            ))
+            transaction.set_rollback(True)
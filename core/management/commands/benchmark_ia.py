@@ -0,0 +1,85 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+
+from core.ia import cargar_modelo, sugerir_tipos
+
+PALABRAS = {
+    'PEAJE': ['peaje', 'autopista', 'ruta', 'tag', 'costanera', 'pórtico'],
+    'BOLETA': ['almuerzo', 'café', 'colación', 'supermercado', 'farmacia', 'taxi'],
+    'FACTURA': ['notebook', 'tóner', 'impresora', 'repuesto', 'servicio', 'mantención'],
+    'VALE': ['propina', 'estacionamiento', 'fotocopias', 'encomienda', 'vale', 'recibo'],
+}
+
+
+def _texto_aleatorio(rng):
+    tipo = rng.choice(list(PALABRAS))
+    return tipo, ' '.join(rng.choices(PALABRAS[tipo], k=3))
+
+
+def _modelo_sintetico(rng, n=2000):
+    datos = [_texto_aleatorio(rng) for _ in range(n)]
+    modelo = Pipeline([
+        ('vect', CountVectorizer()),
+        ('tfidf', TfidfTransformer()),
+        ('clf', MultinomialNB()),
+    ])
+    modelo.fit([t for _, t in datos], [tipo for tipo, _ in datos])
+    return modelo
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia y rendimiento de la clasificación de caja chica por lotes "
+        "(sugerir_tipos) versus una llamada por texto. Usa el modelo entrenado o, "
+        "si no existe, uno sintético en memoria."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='1,10,100,1000,10000',
+                            help='Tamaños de lote separados por coma.')
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--max-uno-a-uno', type=int, default=1000,
+                            help='Sobre este tamaño no se mide la versión texto a texto (es muy lenta).')
+        parser.add_argument('--sintetico', action='store_true',
+                            help='Ignora el modelo entrenado y usa uno sintético.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        modelo = None if options['sintetico'] else cargar_modelo()
+        if modelo is None:
+            self.stdout.write("Usando modelo sintético (no hay modelo entrenado o se pidió --sintetico).")
+            modelo = _modelo_sintetico(rng)
+
+        tamanos = [int(t) for t in options['tamanos'].split(',') if t.strip()]
+        repeticiones = max(1, options['repeticiones'])
+
+        self.stdout.write(f"{'lote':>7} | {'p50 lote (ms)':>13} | {'textos/s':>10} | {'p50 1x1 (ms)':>12} | {'aceleración':>11}")
+        for tamano in tamanos:
+            textos = [_texto_aleatorio(rng)[1] for _ in range(tamano)]
+            sugerir_tipos(textos[:1], modelo=modelo)  # calentamiento
+
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                sugerir_tipos(textos, modelo=modelo)
+                tiempos.append(time.perf_counter() - inicio)
+            p50 = statistics.median(tiempos)
+
+            columna_1x1, aceleracion = '-', '-'
+            if tamano <= options['max_uno_a_uno']:
+                inicio = time.perf_counter()
+                for texto in textos:
+                    sugerir_tipos([texto], modelo=modelo)
+                uno_a_uno = time.perf_counter() - inicio
+                columna_1x1 = f"{uno_a_uno * 1000:.1f}"
+                aceleracion = f"{uno_a_uno / p50:.1f}x"
+
+            self.stdout.write(
+                f"{tamano:>7} | {p50 * 1000:>13.2f} | {tamano / p50:>10.0f} | {columna_1x1:>12} | {aceleracion:>11}"
+            )
@@ -0,0 +1,98 @@
+import statistics
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from core.backends import LOGIN_MAX_FALLOS_CUENTA, buscar_usuario, reiniciar_intentos, usuarios_por_email
+from core.rut import calcular_dv, formatear
+
+CLAVE = 'clave-benchmark-123'
+IP = '198.51.100.7'  # rango de documentación (RFC 5737): no choca con IPs reales
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia del login (core.backends.EmailBackend): búsqueda por correo y por "
+        "RUT, contraseña incorrecta, usuario inexistente e intento bloqueado por el límite. "
+        "Crea usuarios de relleno dentro de una transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=5000,
+                            help='Usuarios de relleno en auth_user (por defecto 5000).')
+        parser.add_argument('--repeticiones', type=int, default=10)
+        parser.add_argument('--explicar', action='store_true',
+                            help='Muestra el plan de la consulta por correo (debe usar auth_user_email_ci_uniq).')
+
+    def _medir(self, repeticiones, funcion):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        return statistics.median(tiempos), tiempos[int(len(tiempos) * 0.95) - 1 if len(tiempos) > 1 else 0]
+
+    def handle(self, *args, **options):
+        repeticiones = max(1, options['repeticiones'])
+        request = RequestFactory().post('/login/', REMOTE_ADDR=IP)
+        cuerpo = 76543210
+        rut = f"{cuerpo}-{calcular_dv(cuerpo)}"
+
+        with transaction.atomic():
+            hash_relleno = make_password(CLAVE)  # un solo hash para todo el relleno
+            User.objects.bulk_create([
+                User(username=f"bench{i}", email=f"bench{i}@benchmark.local", password=hash_relleno)
+                for i in range(options['usuarios'])
+            ], batch_size=1000)
+            User.objects.create_user(username=rut, email='Usuario.Login@Benchmark.local', password=CLAVE)
+
+            def intento(identificador, clave):
+                def ejecutar():
+                    reiniciar_intentos(request, identificador)
+                    authenticate(request, username=identificador, password=clave)
+                return ejecutar
+
+            escenarios = [
+                ('correo (otras mayúsculas)', intento('usuario.login@BENCHMARK.local', CLAVE)),
+                ('RUT con puntos', intento(formatear(rut), CLAVE)),
+                ('contraseña incorrecta', intento(rut, 'incorrecta')),
+                ('usuario inexistente', intento('nadie@benchmark.local', CLAVE)),
+            ]
+
+            self.stdout.write(f"{'escenario':<28} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'consultas':>9}")
+            for nombre, funcion in escenarios:
+                funcion()  # calentamiento
+                with CaptureQueriesContext(connection) as consultas:
+                    funcion()
+                p50, p95 = self._medir(repeticiones, funcion)
+                self.stdout.write(f"{nombre:<28} | {p50:>9.2f} | {p95:>9.2f} | {len(consultas):>9}")
+
+            # Bloqueado: se agota el límite de la cuenta y se mide el intento siguiente
+            reiniciar_intentos(request, rut)
+            for _ in range(LOGIN_MAX_FALLOS_CUENTA):
+                authenticate(request, username=rut, password='incorrecta')
+            with CaptureQueriesContext(connection) as consultas:
+                authenticate(request, username=rut, password=CLAVE)
+            p50, p95 = self._medir(repeticiones, lambda: authenticate(request, username=rut, password=CLAVE))
+            self.stdout.write(f"{'bloqueado (sin hasher)':<28} | {p50:>9.2f} | {p95:>9.2f} | {len(consultas):>9}")
+            reiniciar_intentos(request, rut)
+
+            p50, p95 = self._medir(repeticiones * 10, lambda: buscar_usuario('usuario.login@benchmark.local'))
+            self.stdout.write(f"{'solo búsqueda por correo':<28} | {p50:>9.2f} | {p95:>9.2f} | {1:>9}")
+
+            if options['explicar']:
+                self.stdout.write(usuarios_por_email('usuario.login@benchmark.local').explain())
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['usuarios']} usuarios de relleno, {repeticiones} repeticiones. "
+            f"Nada quedó guardado (la transacción se revirtió)."
+        ))
@@ -0,0 +1,89 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import sesion as sesion_util
+
+MIDDLEWARE_CONTEXTO = 'core.sesion.ContextoUsuarioMiddleware'
+
+# (nombre, motor de sesión, con grupos en la sesión)
+ESCENARIOS = (
+    ('antes: db + grupos por consulta', 'db', False),
+    ('db', 'db', True),
+    ('cached_db', 'cached_db', True),
+    ('signed_cookies', 'signed_cookies', True),
+)
+PAGINAS = ('dashboard', 'lista_ingresos', 'finanzas_dashboard', 'dashboard_rrhh', 'inventario_dashboard')
+
+
+class Command(BaseCommand):
+    help = (
+        "Consultas y tiempo por petición autenticada según el motor de sesión, con y sin "
+        "grupos en la sesión (core/sesion.py). Usa un usuario temporal de los grupos "
+        "Finanzas, RRHH y Bodega dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--paginas', default=','.join(PAGINAS),
+                            help='Nombres de URL separados por coma.')
+
+    def _medir(self, cliente, url, repeticiones):
+        cliente.get(url)  # calentamiento: la primera petición puede refrescar la sesión
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = cliente.get(url)
+        # Se cuentan ya: cada petición nueva vacía connection.queries (request_started)
+        sql = [q['sql'] for q in consultas.captured_queries]
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            cliente.get(url)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        sesion = sum(1 for q in sql if 'django_session' in q)
+        grupos = sum(1 for q in sql if 'auth_group' in q)
+        return respuesta.status_code, len(sql), sesion, grupos, statistics.median(tiempos)
+
+    def handle(self, *args, **options):
+        repeticiones = max(1, options['repeticiones'])
+        paginas = [p.strip() for p in options['paginas'].split(',') if p.strip()]
+
+        if not sesion_util.cache_compartido():
+            self.stdout.write(self.style.WARNING(
+                "Cache por proceso (sin REDIS_URL): los grupos no se guardan en la sesión "
+                "y se consultan en las páginas que los usan (core/sesion.py)."
+            ))
+        self.stdout.write(
+            f"{'escenario':<32} | {'página':<20} | {'HTTP':>4} | {'consultas':>9} | "
+            f"{'sesión':>6} | {'grupos':>6} | {'p50 (ms)':>8}"
+        )
+        with transaction.atomic():
+            user = User.objects.create_user(username='benchmark-sesion', password=None)
+            for nombre in ('Finanzas', 'RRHH', 'Bodega'):
+                user.groups.add(Group.objects.get_or_create(name=nombre)[0])
+
+            for escenario, motor, con_contexto in ESCENARIOS:
+                middleware = [m for m in settings.MIDDLEWARE if con_contexto or m != MIDDLEWARE_CONTEXTO]
+                with override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{motor}',
+                                       MIDDLEWARE=middleware, ALLOWED_HOSTS=['*']):
+                    cliente = Client()
+                    cliente.force_login(user)
+                    for pagina in paginas:
+                        http, total, sesion, grupos, p50 = self._medir(cliente, reverse(pagina), repeticiones)
+                        self.stdout.write(
+                            f"{escenario:<32} | {pagina:<20} | {http:>4} | {total:>9} | "
+                            f"{sesion:>6} | {grupos:>6} | {p50:>8.1f}"
+                        )
+                    cliente.logout()
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Mediana de {repeticiones} peticiones por página (después de una de calentamiento). "
+            f"Nada quedó guardado."
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import conciliacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Concilia los Movimientos bancarios pendientes contra los Ingresos pendientes "
+        "(core/conciliacion.py): por monto y N° de documento, por monto y fecha cercana, "
+        "y grupos de ingresos con el mismo documento. Solo toca lo que no está conciliado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tolerancia', type=int, default=conciliacion.TOLERANCIA_DIAS,
+                            help=f'Días de diferencia aceptados (por defecto {conciliacion.TOLERANCIA_DIAS}).')
+
+    def handle(self, *args, **options):
+        if options['tolerancia'] < 0:
+            raise CommandError("La tolerancia no puede ser negativa.")
+        resultado = conciliacion.conciliar(tolerancia=options['tolerancia'])
+        for regla, cantidad in resultado['nuevas'].items():
+            self.stdout.write(f"  {regla:<12} {cantidad:>9} ingresos conciliados")
+        pendientes = resultado['pendientes']
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo en {resultado['segundos']} s. Pendientes: {pendientes['movimientos']} movimientos, "
+            f"{pendientes['ingresos']} ingresos."
+        ))
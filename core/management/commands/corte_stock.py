@@ -0,0 +1,23 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from core.inventario import crear_corte
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda un corte (snapshot) del stock por producto. Las consultas de stock a una "
+        "fecha parten del corte más cercano. Programar p.ej. cada noche: "
+        "30 23 * * * python manage.py corte_stock"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', type=datetime.date.fromisoformat, default=None,
+                            help='Corte al cierre de este día YYYY-MM-DD (por defecto: ahora).')
+
+    def handle(self, *args, **options):
+        corte = crear_corte(options['fecha'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{corte} con {corte.detalles.count()} productos."
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import duplicados
+
+
+class Command(BaseCommand):
+    help = (
+        "Busca Ingresos posiblemente duplicados (core/duplicados.py): misma empresa y monto, "
+        "fechas cercanas y descripción parecida. Sin opciones recorre toda la tabla; con "
+        "--desde-id solo las filas nuevas. Los pares quedan en el admin para revisar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde-id', type=int,
+                            help='Solo Ingresos con id mayor a este (modo incremental).')
+        parser.add_argument('--ventana', type=int, default=duplicados.VENTANA_DIAS,
+                            help=f'Días de diferencia (por defecto {duplicados.VENTANA_DIAS}).')
+        parser.add_argument('--umbral', type=float, default=duplicados.UMBRAL,
+                            help=f'Similitud mínima de 0 a 1 (por defecto {duplicados.UMBRAL}).')
+
+    def handle(self, *args, **options):
+        if options['ventana'] < 0 or not 0 < options['umbral'] <= 1:
+            raise CommandError("La ventana no puede ser negativa y el umbral va de 0 a 1.")
+        resultado = duplicados.buscar(desde_id=options['desde_id'], ventana=options['ventana'],
+                                      umbral=options['umbral'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['filas']} filas revisadas, {resultado['candidatos']} pares comparados, "
+            f"{resultado['nuevos']} posibles duplicados nuevos ({resultado['segundos']} s)."
+        ))
@@ -0,0 +1,36 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from core.alertas import DIAS_AVISO, despachar_alertas
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía por correo los lotes vencidos / por vencer a los usuarios suscritos "
+        "(Perfil.recibir_alertas_stock). Pensado para ejecutarse desde cron, p.ej.: "
+        "0 7 * * * python manage.py enviar_alertas_vencimiento"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=DIAS_AVISO,
+                            help='Ventana de aviso en días (por defecto 30).')
+        parser.add_argument('--fecha', type=datetime.date.fromisoformat, default=None,
+                            help='Fecha de referencia YYYY-MM-DD (por defecto hoy).')
+        parser.add_argument('--reenviar', action='store_true',
+                            help='Incluye lotes ya notificados (no deduplica).')
+
+    def handle(self, *args, **options):
+        resumen = despachar_alertas(
+            hoy=options['fecha'],
+            dias=options['dias'],
+            deduplicar=not options['reenviar'],
+        )
+        if not resumen['lotes']:
+            self.stdout.write("Sin lotes nuevos en riesgo. No se enviaron correos.")
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumen['lotes']} lotes informados ({resumen['vencidos']} vencidos, "
+            f"{resumen['por_vencer']} por vencer) en {resumen['correos']} correos."
+        ))
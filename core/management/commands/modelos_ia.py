@@ -0,0 +1,100 @@
+import joblib
+from django.core.management.base import BaseCommand, CommandError
+
+from core import almacen_ia
+from core.ia import FAMILIA_CAJA, FAMILIA_INGRESOS
+
+
+class Command(BaseCommand):
+    help = (
+        "Administra las versiones de los modelos de IA (core/almacen_ia.py). Ej.:\n"
+        "  python manage.py modelos_ia listar\n"
+        "  python manage.py modelos_ia promover cajachica v0003\n"
+        "  python manage.py modelos_ia rollback cajachica\n"
+        "  python manage.py modelos_ia importar cajachica ia_cajachica.pkl"
+    )
+
+    def add_arguments(self, parser):
+        acciones = parser.add_subparsers(dest='accion', required=True)
+
+        listar = acciones.add_parser('listar', help='Versiones guardadas (la actual marcada con *).')
+        listar.add_argument('familia', nargs='?')
+
+        promover = acciones.add_parser('promover', help='Deja en uso una versión (verifica su sha256).')
+        promover.add_argument('familia')
+        promover.add_argument('version')
+
+        rollback = acciones.add_parser('rollback', help='Vuelve a la versión anterior a la actual.')
+        rollback.add_argument('familia')
+
+        verificar = acciones.add_parser('verificar', help='Comprueba la integridad de todas las versiones.')
+        verificar.add_argument('familia', nargs='?')
+
+        importar = acciones.add_parser('importar', help='Agrega un .pkl antiguo como versión nueva.')
+        importar.add_argument('familia', choices=[FAMILIA_CAJA, FAMILIA_INGRESOS])
+        importar.add_argument('archivo')
+        importar.add_argument('--no-promover', action='store_true')
+
+        limpiar = acciones.add_parser('limpiar', help='Borra versiones antiguas (nunca la actual).')
+        limpiar.add_argument('familia')
+        limpiar.add_argument('--conservar', type=int, default=almacen_ia.MAX_VERSIONES)
+
+    def handle(self, *args, **options):
+        try:
+            getattr(self, f"_{options['accion']}")(options)
+        except almacen_ia.ModeloInvalido as e:
+            raise CommandError(str(e))
+
+    def _familias(self, options):
+        return [options['familia']] if options.get('familia') else almacen_ia.familias()
+
+    def _listar(self, options):
+        familias = self._familias(options)
+        if not familias:
+            self.stdout.write("No hay modelos guardados todavía.")
+        for familia in familias:
+            self.stdout.write(self.style.MIGRATE_HEADING(familia))
+            for meta in almacen_ia.listar(familia):
+                marca = '*' if meta['actual'] else ' '
+                metricas = ', '.join(f"{k}={v}" for k, v in sorted(meta.get('metricas', {}).items()))
+                self.stdout.write(
+                    f" {marca} {meta['version']}  {meta['fecha']}  filas={meta.get('filas')}  "
+                    f"sklearn={meta.get('sklearn')}  {meta.get('bytes', 0) // 1024} KB  {metricas}"
+                )
+
+    def _promover(self, options):
+        version = almacen_ia.promover(options['familia'], options['version'])
+        self.stdout.write(self.style.SUCCESS(f"{options['familia']}: {version} en uso."))
+
+    def _rollback(self, options):
+        version = almacen_ia.rollback(options['familia'])
+        self.stdout.write(self.style.SUCCESS(f"{options['familia']}: de vuelta en {version}."))
+
+    def _verificar(self, options):
+        errores = 0
+        for familia in self._familias(options):
+            for version in almacen_ia.versiones(familia):
+                try:
+                    almacen_ia.verificar(familia, version)
+                    self.stdout.write(f"{familia} {version}: OK")
+                except almacen_ia.ModeloInvalido as e:
+                    errores += 1
+                    self.stdout.write(self.style.ERROR(f"{familia} {version}: {e}"))
+        if errores:
+            raise CommandError(f"{errores} versiones con problemas.")
+
+    def _importar(self, options):
+        try:
+            modelo = joblib.load(options['archivo'])
+        except Exception as e:
+            raise CommandError(f"No se pudo leer '{options['archivo']}': {e}")
+        version = almacen_ia.guardar(
+            options['familia'], modelo,
+            promover_version=not options['no_promover'],
+            extra={'origen': options['archivo']},
+        )
+        self.stdout.write(self.style.SUCCESS(f"{options['familia']}: importado como {version}."))
+
+    def _limpiar(self, options):
+        borradas = almacen_ia.limpiar(options['familia'], options['conservar'])
+        self.stdout.write(f"Versiones borradas: {', '.join(borradas) or 'ninguna'}.")
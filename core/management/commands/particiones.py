@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import particiones
+from core.models import Movimiento
+from core.services import DashboardService
+
+
+class Command(BaseCommand):
+    help = (
+        "Particiones anuales de core_ingreso y core_movimiento (PostgreSQL): crea las del "
+        "año en curso y siguientes, separa años viejos (DETACH, sin mover datos) y lista las "
+        "existentes. Programar p.ej. en diciembre: 0 3 1 12 * python manage.py particiones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anio', type=int, default=None,
+                            help='Crear desde este año (por defecto el actual).')
+        parser.add_argument('--separar', type=int, action='append', default=[], metavar='ANIO',
+                            help='Separa ese año de ambas tablas; se puede repetir.')
+        parser.add_argument('--explicar', type=int, default=None, metavar='ANIO',
+                            help='Muestra el plan de las consultas del dashboard filtradas por ese año.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        connection = connections[using]
+        if not particiones.soporta_particiones(connection):
+            self.stdout.write(self.style.WARNING(
+                f"El motor '{connection.vendor}' no particiona: las tablas son normales, nada que hacer."
+            ))
+        else:
+            for nombre in particiones.asegurar_particiones(options['anio'], using=using):
+                self.stdout.write(f"Creada {nombre}")
+            for anio in options['separar']:
+                separadas = particiones.separar_particion(anio, using=using)
+                if not separadas:
+                    raise CommandError(f"No hay particiones adjuntas del año {anio}.")
+                for nombre in separadas:
+                    self.stdout.write(f"Separada {nombre} (queda como tabla suelta)")
+
+            for tabla in particiones.TABLAS:
+                self.stdout.write(f"\n{tabla}")
+                for nombre, limites, filas in particiones.particiones(tabla, using=using):
+                    self.stdout.write(f"  {nombre:<28} {limites:<58} ~{filas} filas")
+
+        anio = options['explicar']
+        if anio:
+            desde, hasta = particiones.rango_periodo(anio)
+            self.stdout.write(f"\nDashboardService(anio={anio}):")
+            self.stdout.write(DashboardService(anio=anio).queryset.using(using).explain())
+            self.stdout.write(f"\nfinanzas_dashboard anio={anio}:")
+            self.stdout.write(Movimiento.objects.using(using).filter(fecha__gte=desde, fecha__lt=hasta).explain())
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.impuestos import calcular_iva_vectorizado
+from core.models import Ingreso
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el IVA guardado de los Ingresos con el motor de core/impuestos.py. "
+        "Recorre la tabla por tramos de id (sin OFFSET) y solo actualiza las filas que cambian."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tramo', type=int, default=5000,
+                            help='Filas leídas por consulta (por defecto 5000).')
+        parser.add_argument('--desde-id', type=int, default=0,
+                            help='Retoma desde este id (útil si se interrumpió).')
+        parser.add_argument('--simular', action='store_true',
+                            help='Solo cuenta las diferencias, no escribe.')
+
+    def handle(self, *args, **options):
+        tramo = max(100, options['tramo'])
+        ultimo_id = options['desde_id']
+        revisadas = cambiadas = 0
+        inicio = time.perf_counter()
+
+        while True:
+            filas = list(
+                Ingreso.objects.filter(id__gt=ultimo_id)
+                               .order_by('id')
+                               .values_list('id', 'monto_transferencia', 'tipo_documento', 'iva')[:tramo]
+            )
+            if not filas:
+                break
+            ids, montos, tipos, ivas_actuales = zip(*filas)
+            ivas = calcular_iva_vectorizado(montos, tipos).tolist()
+
+            cambios = [
+                Ingreso(id=pk, iva=nuevo)
+                for pk, actual, nuevo in zip(ids, ivas_actuales, ivas)
+                if int(actual or 0) != nuevo
+            ]
+            if cambios and not options['simular']:
+                with transaction.atomic():
+                    Ingreso.objects.bulk_update(cambios, ['iva'], batch_size=1000)
+                    transaction.on_commit(Ingreso.invalidar_cubos)
+
+            revisadas += len(filas)
+            cambiadas += len(cambios)
+            ultimo_id = ids[-1]
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  hasta id {ultimo_id}: {revisadas} revisadas, {cambiadas} con diferencias")
+
+        accion = 'tendrían diferencias' if options['simular'] else 'actualizadas'
+        self.stdout.write(self.style.SUCCESS(
+            f"{revisadas} filas revisadas, {cambiadas} {accion} en {time.perf_counter() - inicio:.1f}s."
+        ))
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_cajachica_fecha_modificacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfil',
+            name='recibir_alertas_stock',
+            field=models.BooleanField(default=False, verbose_name='Recibir alertas de vencimiento'),
+        ),
+        migrations.CreateModel(
+            name='AlertaVencimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(max_length=20)),
+                ('fecha_envio', models.DateTimeField(auto_now_add=True)),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas', to='core.lote')),
+            ],
+            options={
+                'verbose_name': 'Alerta de Vencimiento',
+                'verbose_name_plural': 'Alertas de Vencimiento',
+                'constraints': [models.UniqueConstraint(fields=('lote', 'estado'), name='alerta_unica_por_lote_estado')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_alertavencimiento_perfil_recibir_alertas_stock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['fecha_vencimiento', 'producto'], name='lote_venc_producto_idx'),
+        ),
+    ]
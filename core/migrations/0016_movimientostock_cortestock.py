@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-19 11:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_lote_venc_producto_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorteStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(unique=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Corte de Stock',
+                'verbose_name_plural': 'Cortes de Stock',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CorteStockDetalle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField()),
+                ('corte', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalles', to='core.cortestock')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('corte', 'producto'), name='corte_stock_producto_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tipo', models.CharField(choices=[('ENTRADA', 'Ingreso de Lote'), ('VENTA', 'Venta / Salida'), ('AJUSTE', 'Ajuste')], max_length=10)),
+                ('numero_lote', models.CharField(blank=True, max_length=50)),
+                ('cantidad', models.IntegerField()),
+                ('referencia', models.CharField(blank=True, max_length=255)),
+                ('lote', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='core.lote')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_stock', to='core.producto')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha', 'producto'], name='movstock_fecha_producto_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-19 11:45
+
+from django.db import migrations
+
+
+def crear_saldo_inicial(apps, schema_editor):
+    """Un AJUSTE por cada lote existente, para que el libro parta cuadrado con el stock actual."""
+    Lote = apps.get_model('core', 'Lote')
+    MovimientoStock = apps.get_model('core', 'MovimientoStock')
+
+    lotes = Lote.objects.exclude(cantidad=0).values_list('id', 'producto_id', 'numero_lote', 'cantidad')
+    pendientes = []
+    for lote_id, producto_id, numero_lote, cantidad in lotes.iterator(chunk_size=2000):
+        pendientes.append(MovimientoStock(
+            tipo='AJUSTE',
+            producto_id=producto_id,
+            lote_id=lote_id,
+            numero_lote=numero_lote,
+            cantidad=cantidad,
+            referencia='Saldo inicial',
+        ))
+        if len(pendientes) >= 2000:
+            MovimientoStock.objects.bulk_create(pendientes)
+            pendientes = []
+    if pendientes:
+        MovimientoStock.objects.bulk_create(pendientes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_movimientostock_cortestock'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_saldo_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_saldo_inicial_stock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cajachica',
+            index=models.Index(fields=['-fecha', '-id'], name='cajachica_fecha_id_idx'),
+        ),
+    ]
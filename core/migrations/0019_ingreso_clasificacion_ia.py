@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-19 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_cajachica_fecha_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingreso',
+            name='clasificado_por_ia',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='ingreso',
+            name='confianza_ia',
+            field=models.FloatField(blank=True, null=True, verbose_name='Confianza IA'),
+        ),
+        migrations.AddField(
+            model_name='ingreso',
+            name='requiere_revision',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_ingreso_clasificacion_ia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trabajador',
+            index=models.Index(fields=['empresa', 'fecha_finiquito'], name='trabajador_empresa_finiq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trabajador',
+            index=models.Index(fields=['empresa', 'nombre'], name='trabajador_empresa_nombre_idx'),
+        ),
+    ]
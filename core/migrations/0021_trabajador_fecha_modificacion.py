@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-19 10:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_trabajador_indices_empresa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajador',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
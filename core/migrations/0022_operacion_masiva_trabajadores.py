@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-19 10:31
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_trabajador_fecha_modificacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperacionMasivaTrabajadores',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('accion', models.CharField(choices=[('FINIQUITO', 'Finiquito masivo'), ('EDICION', 'Edición masiva')], max_length=10)),
+                ('criterio', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('cambios', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('detalle', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Operación Masiva de Trabajadores',
+                'verbose_name_plural': 'Operaciones Masivas de Trabajadores',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
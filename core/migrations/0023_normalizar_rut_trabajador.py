@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-19 10:44
+
+from django.db import migrations
+
+TRAMO = 2000
+
+# Copia de la regla de core/rut.py a la fecha de esta migración: si rut.py cambia,
+# lo que hizo (y hace) esta migración no cambia con él.
+PESOS = (2, 3, 4, 5, 6, 7)
+_DV = ('', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'K', '0')
+MAX_DIGITOS = 9
+
+
+def normalizar(rut):
+    """'12.345.678-5' / '123456785' / 123456785.0 -> '12345678-5'; inválido -> None."""
+    if isinstance(rut, float) and rut.is_integer():
+        rut = int(rut)
+    limpio = ''.join(c for c in str(rut or '').upper() if c.isdigit() or c == 'K')
+    cuerpo, dv = limpio[:-1].lstrip('0'), limpio[-1:]
+    if not cuerpo.isdigit() or len(cuerpo) > MAX_DIGITOS:
+        return None
+    suma = sum(int(c) * PESOS[i % 6] for i, c in enumerate(reversed(cuerpo)))
+    return f"{cuerpo}-{dv}" if _DV[11 - suma % 11] == dv else None
+
+
+def normalizar_ruts(apps, schema_editor):
+    """
+    Lleva Trabajador.rut a la forma canónica ('12345678-9') por tramos de id.
+    Los RUT inválidos quedan como estaban. Si dos filas caen en el mismo RUT
+    canónico la migración se detiene sin tocar nada y lista los ids: se corrige
+    (o se une) el trabajador repetido desde el admin y se vuelve a correr migrate.
+    """
+    Trabajador = apps.get_model('core', 'Trabajador')
+
+    # 1. Solo lectura: qué cambia y con quién chocaría
+    cambios = {}
+    por_canonico = {}
+    ultimo_id = 0
+    while True:
+        filas = list(Trabajador.objects.filter(id__gt=ultimo_id).order_by('id').values_list('id', 'rut')[:TRAMO])
+        if not filas:
+            break
+        ultimo_id = filas[-1][0]
+        for pk, rut in filas:
+            canonico = normalizar(rut)
+            if canonico is None:
+                continue
+            por_canonico.setdefault(canonico, []).append(pk)
+            if canonico != rut:
+                cambios[pk] = canonico
+
+    repetidos = {rut: ids for rut, ids in por_canonico.items() if len(ids) > 1}
+    if repetidos:
+        detalle = '\n'.join(f"    {rut}: ids {ids}" for rut, ids in sorted(repetidos.items()))
+        raise RuntimeError(
+            "Hay trabajadores con el mismo RUT escrito de distinta forma. Corrija o una "
+            f"esos registros desde el admin y vuelva a ejecutar migrate:\n{detalle}"
+        )
+
+    # 2. Escritura por tramos
+    pendientes = [Trabajador(id=pk, rut=rut) for pk, rut in cambios.items()]
+    for inicio in range(0, len(pendientes), TRAMO):
+        Trabajador.objects.bulk_update(pendientes[inicio:inicio + TRAMO], ['rut'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_operacion_masiva_trabajadores'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_ruts, migrations.RunPython.noop),
+    ]
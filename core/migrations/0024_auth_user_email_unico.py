@@ -0,0 +1,88 @@
+# Generated by Django 6.0 on 2026-10-19 11:20
+
+import re
+
+from django.db import migrations
+
+# Copia de core/rut.py a la fecha de esta migración (así no cambia si rut.py cambia)
+_FORMA_RUT = re.compile(r'\s*[\d.]+-[\dkK]\s*')
+PESOS = (2, 3, 4, 5, 6, 7)
+_DV = ('', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'K', '0')
+MAX_DIGITOS = 9
+
+
+def rut_canonico(username):
+    """Username escrito como RUT válido ('12.345.678-5') -> '12345678-5'; si no, None."""
+    if not username or not _FORMA_RUT.fullmatch(username):
+        return None
+    limpio = ''.join(c for c in username.upper() if c.isdigit() or c == 'K')
+    cuerpo, dv = limpio[:-1].lstrip('0'), limpio[-1:]
+    if not cuerpo.isdigit() or len(cuerpo) > MAX_DIGITOS:
+        return None
+    suma = sum(int(c) * PESOS[i % 6] for i, c in enumerate(reversed(cuerpo)))
+    return f"{cuerpo}-{dv}" if _DV[11 - suma % 11] == dv else None
+
+
+def normalizar_usuarios(apps, schema_editor):
+    """
+    Deja auth_user listo para el índice único de correo:
+    - usernames con forma de RUT -> forma canónica (si no choca con otro usuario)
+    - correos sin espacios.
+    Si dos usuarios comparten correo (sin distinguir mayúsculas) o su username es
+    el mismo RUT escrito de otra forma, la migración se detiene sin tocar nada y
+    lista los ids: un administrador decide qué cuenta queda con cada dato y vuelve
+    a correr migrate. Aquí no se borra ningún correo.
+    """
+    User = apps.get_model('auth', 'User')
+    usuarios = list(User.objects.order_by('id').only('id', 'username', 'email'))
+
+    por_correo = {}
+    for u in usuarios:
+        u.email = (u.email or '').strip()
+        if u.email:
+            por_correo.setdefault(u.email.lower(), []).append(u.id)
+    repetidos = {correo: ids for correo, ids in por_correo.items() if len(ids) > 1}
+    if repetidos:
+        detalle = '\n'.join(f"    {correo}: ids {ids}" for correo, ids in sorted(repetidos.items()))
+        raise RuntimeError(
+            "Hay usuarios que comparten correo (sin distinguir mayúsculas). Corrija o vacíe "
+            f"esos correos desde el admin y vuelva a ejecutar migrate:\n{detalle}"
+        )
+
+    por_rut = {}
+    for u in usuarios:
+        canonico = rut_canonico(u.username) or u.username
+        por_rut.setdefault(canonico, []).append(u.id)
+    choques = {rut: ids for rut, ids in por_rut.items() if len(ids) > 1}
+    if choques:
+        detalle = '\n'.join(f"    {rut}: ids {ids}" for rut, ids in sorted(choques.items()))
+        raise RuntimeError(
+            "Hay usuarios cuyo username es el mismo RUT escrito de distinta forma. Cambie "
+            f"uno de ellos desde el admin y vuelva a ejecutar migrate:\n{detalle}"
+        )
+
+    for u in usuarios:
+        u.username = rut_canonico(u.username) or u.username
+    User.objects.bulk_update(usuarios, ['username', 'email'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0023_normalizar_rut_trabajador'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_usuarios, migrations.RunPython.noop),
+        # auth.User no es de esta app: el índice va en SQL (Postgres y SQLite aceptan
+        # índices por expresión). El login busca por LOWER(email), la primera columna.
+        # La segunda vale 0 para todo correo no vacío (así LOWER(email) no se repite) y el
+        # id para los vacíos, que pueden ser muchos. No se usa un índice parcial
+        # (WHERE email <> ''): SQLite no lo elige cuando el filtro llega como parámetro.
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX auth_user_email_ci_uniq "
+            "ON auth_user (LOWER(email), (CASE WHEN email = '' THEN id ELSE 0 END))",
+            "DROP INDEX IF EXISTS auth_user_email_ci_uniq",
+        ),
+    ]
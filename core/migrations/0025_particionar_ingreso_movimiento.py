@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-19 12:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+from core import particiones
+
+MODELOS = ('Ingreso', 'Movimiento')
+
+
+def particionar_tablas(apps, schema_editor):
+    # Solo PostgreSQL; con otros motores las tablas quedan como están (ver core/particiones.py)
+    for nombre in MODELOS:
+        particiones.particionar(schema_editor, apps.get_model('core', nombre))
+
+
+def desparticionar_tablas(apps, schema_editor):
+    for nombre in MODELOS:
+        particiones.desparticionar(schema_editor, apps.get_model('core', nombre))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_auth_user_email_unico'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar_tablas, desparticionar_tablas),
+        # Después de particionar: el índice se declara en la tabla madre y Postgres lo crea en cada año
+        migrations.AlterField(
+            model_name='movimiento',
+            name='fecha',
+            field=models.DateField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
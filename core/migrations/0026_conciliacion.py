@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_particionar_ingreso_movimiento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conciliacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('regla', models.CharField(choices=[('DOCUMENTO', 'Monto y N° de documento'), ('MONTO_FECHA', 'Monto y fecha cercana'), ('AGRUPADO', 'Varios ingresos, un movimiento')], max_length=20)),
+                ('diferencia_dias', models.PositiveIntegerField(default=0, verbose_name='Diferencia (días)')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('ingreso', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='conciliacion', to='core.ingreso')),
+                ('movimiento', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='conciliaciones', to='core.movimiento')),
+            ],
+            options={
+                'verbose_name': 'Conciliación Bancaria',
+                'verbose_name_plural': 'Conciliaciones Bancarias',
+            },
+        ),
+    ]
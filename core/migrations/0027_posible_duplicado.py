@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-19 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_conciliacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PosibleDuplicado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similitud', models.FloatField()),
+                ('diferencia_dias', models.PositiveIntegerField(default=0, verbose_name='Diferencia (días)')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente de revisión'), ('DUPLICADO', 'Duplicado confirmado'), ('DESCARTADO', 'No es duplicado')], db_index=True, default='PENDIENTE', max_length=20)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('duplicado', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.ingreso')),
+                ('ingreso', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='posibles_duplicados', to='core.ingreso')),
+            ],
+            options={
+                'verbose_name': 'Posible Duplicado',
+                'verbose_name_plural': 'Posibles Duplicados',
+                'ordering': ['-similitud'],
+                'constraints': [models.UniqueConstraint(fields=('ingreso', 'duplicado'), name='posible_duplicado_par_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-19 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copiar_producto(apps, schema_editor):
+    """Código y nombre del producto en los movimientos existentes (sobreviven a su borrado)."""
+    MovimientoStock = apps.get_model('core', 'MovimientoStock')
+    Producto = apps.get_model('core', 'Producto')
+    producto = Producto.objects.filter(pk=models.OuterRef('producto_id'))
+    MovimientoStock.objects.update(
+        codigo_producto=models.Subquery(producto.values('codigo')[:1]),
+        nombre_producto=models.Subquery(producto.values('nombre')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_posible_duplicado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimientostock',
+            name='codigo_producto',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='movimientostock',
+            name='nombre_producto',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='movimientostock',
+            name='producto',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='core.producto'),
+        ),
+        migrations.RunPython(copiar_producto, migrations.RunPython.noop),
+    ]
@@ -1,18 +1,59 @@
-from django.db import models
+from django.db import models, transaction
 import calendar
-from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+import datetime
+import uuid
+from django.contrib.auth.models import Group, User
+from django.db.models.functions import Cast, Coalesce, Round
+from django.core.cache import cache
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.fields.files import FieldFile
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
+from . import impuestos, particiones, rut as rut_util, sesion
+
 # --- TABLAS AUXILIARES (CATÁLOGOS) ---
 
 class Empresa(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
 
+    CACHE_OPCIONES_RRHH = 'empresas:opciones_rrhh'
+
     def __str__(self):
         return self.nombre
 
+    @classmethod
+    def opciones_rrhh(cls):
+        """
+        [(id, nombre)] de las empresas con personal para los formularios de RRHH:
+        las que tienen trabajadores más las de RRHH_EMPRESAS_IDS (para cargar el
+        primero). Se cachea: las señales de más abajo lo invalidan.
+        """
+        opciones = cache.get(cls.CACHE_OPCIONES_RRHH)
+        if opciones is None:
+            con_personal = models.Exists(Trabajador.objects.filter(empresa_id=models.OuterRef('pk')))
+            opciones = list(
+                cls.objects.filter(con_personal | models.Q(pk__in=getattr(settings, 'RRHH_EMPRESAS_IDS', [])))
+                           .order_by('nombre').values_list('id', 'nombre')
+            )
+            cache.set(cls.CACHE_OPCIONES_RRHH, opciones, None)
+        return opciones
+
+# Catálogos con nombre (Empresa, CentroCosto, Clasificacion, Cargo): [(id, nombre)] cacheado
+# para los filtros del admin; las señales de más abajo lo invalidan
+CACHE_OPCIONES_CATALOGO = 'catalogo:{}:opciones'
+
+def opciones_catalogo(modelo):
+    clave = CACHE_OPCIONES_CATALOGO.format(modelo._meta.label_lower)
+    opciones = cache.get(clave)
+    if opciones is None:
+        opciones = list(modelo.objects.order_by('nombre').values_list('id', 'nombre'))
+        cache.set(clave, opciones, None)
+    return opciones
+
 class CentroCosto(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     codigo = models.CharField(max_length=20, blank=True, null=True)
@@ -52,32 +93,33 @@ class Ingreso(models.Model):
     centro_costo = models.ForeignKey(CentroCosto, on_delete=models.PROTECT, null=True)
     empresa = models.ForeignKey(Empresa, on_delete=models.PROTECT, null=True)
 
+    # Clasificación automática al importar (ver core/ia.py)
+    clasificado_por_ia = models.BooleanField(default=False)
+    confianza_ia = models.FloatField(null=True, blank=True, verbose_name="Confianza IA")
+    requiere_revision = models.BooleanField(default=False, db_index=True)
+
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    # Versión de los cubos del pivot (core/pivot.py): la renuevan las señales de más
+    # abajo y las cargas masivas (bulk_create / bulk_update no disparan señales),
+    # siempre con transaction.on_commit: antes del commit un pivot concurrente armaría
+    # el cubo con los datos viejos bajo la versión nueva
+    CACHE_VERSION_CUBOS = 'ingresos:version_cubos'
+
+    @classmethod
+    def invalidar_cubos(cls):
+        cache.set(cls.CACHE_VERSION_CUBOS, uuid.uuid4().hex, None)
     
-    def save(self, *args, **kwargs):
+    def calcular_iva(self):
         """
-        AUTOMATIZACIÓN DE IVA:
-        Calcula el 19% automáticamente si es Factura o Boleta.
-        Fórmula: Neto = Total / 1.19 | IVA = Total - Neto
+        AUTOMATIZACIÓN DE IVA (ver core/impuestos.py):
+        19% incluido en el total si es Factura, Boleta o Nota de Débito/Crédito no exenta.
+        Las cargas masivas usan calcular_iva_vectorizado, ya que bulk_create no llama a save().
         """
-        documentos_con_iva = ['FACTURA', 'BOLETA', 'NOTA DE DEBITO', 'NOTA DE CRÉDITO']
-        
-        # Convertimos a mayúsculas y aseguramos que sea string
-        tipo = str(self.tipo_documento).upper() if self.tipo_documento else ''
-        
-        # Verificamos si el tipo de documento implica IVA y si hay monto
-        if any(doc in tipo for doc in documentos_con_iva) and self.monto_transferencia:
-            try:
-                # Convertimos a float para cálculo matemático seguro
-                monto_total = float(self.monto_transferencia)
-                monto_neto = int(monto_total / 1.19)
-                self.iva = monto_total - monto_neto
-            except ValueError:
-                self.iva = 0
-        else:
-            # Si es Recibo, Voucher, etc., asumimos que es exento
-            self.iva = 0
+        self.iva = impuestos.calcular_iva(self.monto_transferencia, self.tipo_documento)
 
+    def save(self, *args, **kwargs):
+        self.calcular_iva()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -95,6 +137,30 @@ class Egreso(models.Model):
     def __str__(self):
         return f"Egreso {self.n_documento} - ${self.monto_transferencia}"
     
+class CajaChicaQuerySet(models.QuerySet):
+    TIPOS_CON_IVA = ('BOLETA', 'FACTURA')
+
+    def con_iva(self):
+        """
+        Anota `iva` (IVA recuperable) calculado en SQL: monto * 19 / 119 redondeado,
+        solo para boletas y facturas. Da lo mismo que impuestos.iva_incluido y
+        permite sumarlo junto al monto en un aggregate.
+        """
+        return self.annotate(
+            iva=models.Case(
+                models.When(
+                    tipo_documento__in=self.TIPOS_CON_IVA,
+                    then=Round(
+                        Cast('monto', models.FloatField()) * impuestos.TASA_IVA / (100 + impuestos.TASA_IVA),
+                        output_field=models.DecimalField(max_digits=12, decimal_places=0),
+                    ),
+                ),
+                default=models.Value(0),
+                output_field=models.DecimalField(max_digits=12, decimal_places=0),
+            )
+        )
+
+
 class CajaChica(models.Model):
     TIPOS_DOCUMENTO = [
         ('FACTURA', 'Factura'),
@@ -112,42 +178,100 @@ class CajaChica(models.Model):
     tipo_documento = models.CharField(max_length=20, choices=TIPOS_DOCUMENTO, default='BOLETA')
 
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Versión de datos para invalidar los PDFs cacheados (ver core/reportes)
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+
+    objects = CajaChicaQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "Caja Chica"
+        indexes = [
+            # Listado paginado por cursor: ORDER BY fecha DESC, id DESC
+            models.Index(fields=['-fecha', '-id'], name='cajachica_fecha_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.fecha} - ${self.monto} - {self.responsable}"
     
     @property
     def iva_recuperable(self):
-        tipo = str(self.tipo_documento).upper()
-        if tipo in ['BOLETA', 'FACTURA']:
-            try:
-                monto_float = float(self.monto)
-                neto = monto_float / 1.19
-                iva = monto_float - neto
-                return int(round(iva))
-            except:
-                return 0
-        return 0
+        # Si viene de CajaChica.objects.con_iva() usamos el valor calculado en SQL
+        if getattr(self, 'iva', None) is not None:
+            return int(self.iva)
+        if self.tipo_documento not in CajaChicaQuerySet.TIPOS_CON_IVA:
+            return 0
+        return impuestos.iva_incluido(self.monto)
     
 
+class TrabajadorQuerySet(models.QuerySet):
+
+    def con_antiguedad(self, hoy=None):
+        """
+        Anota `antiguedad` (intervalo calculado en SQL): desde fecha_contrato hasta
+        fecha_finiquito, o hasta `hoy` si sigue activo. Permite ordenar y agrupar
+        por antigüedad sin cargar las filas (ver core/rrhh.py).
+        """
+        hoy = hoy or datetime.date.today()
+        return self.annotate(
+            antiguedad=models.ExpressionWrapper(
+                Coalesce('fecha_finiquito', models.Value(hoy, output_field=models.DateField()))
+                - models.F('fecha_contrato'),
+                output_field=models.DurationField()
+            )
+        )
+
+    def resumen_por_empresa(self):
+        """
+        Dotación activa / finiquitada de cada empresa en UNA consulta agrupada por
+        empresa_id (el nombre viaja en la misma fila solo para mostrarlo).
+        """
+        return self.order_by().values('empresa_id', 'empresa__nombre').annotate(
+            activos=models.Count('id', filter=models.Q(fecha_finiquito__isnull=True)),
+            finiquitados=models.Count('id', filter=models.Q(fecha_finiquito__isnull=False)),
+        ).order_by('empresa__nombre')
+
+
 class Trabajador(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
     nombre = models.CharField(max_length=200)
-    rut = models.CharField(max_length=20, unique=True)
+    rut = models.CharField(max_length=20, unique=True)  # forma canónica, ver core/rut.py
     cargo = models.ForeignKey(Cargo, on_delete=models.PROTECT, null=True)
     estado = models.CharField(max_length=50, default='ACTIVO')
     fecha_contrato = models.DateField(null=True, blank=True)
     fecha_finiquito = models.DateField(null=True, blank=True)
     monto_finiquito = models.DecimalField(max_digits=12, decimal_places=0, default=0)
     fecha_carga = models.DateTimeField(auto_now_add=True)
+    # Versión de datos para invalidar las analíticas cacheadas (ver core/rrhh.py)
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+
+    objects = TrabajadorQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # KPIs por empresa (activos / finiquitados) sin leer la tabla completa
+            models.Index(fields=['empresa', 'fecha_finiquito'], name='trabajador_empresa_finiq_idx'),
+            # Listado paginado: ORDER BY empresa, nombre
+            models.Index(fields=['empresa', 'nombre'], name='trabajador_empresa_nombre_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Siempre en forma canónica ('12345678-9'): así el índice único detecta duplicados
+        self.rut = rut_util.normalizar(self.rut) or str(self.rut).strip().upper()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         cargo_nombre = self.cargo.nombre if self.cargo else "Sin Cargo"
         return f"{self.nombre} ({cargo_nombre}) - {self.estado}"
     
+    @property
+    def dias_servicio(self):
+        # Si viene de Trabajador.objects.con_antiguedad() usamos el valor calculado en SQL
+        if getattr(self, 'antiguedad', None) is not None:
+            return self.antiguedad.days
+        if not self.fecha_contrato:
+            return None
+        return ((self.fecha_finiquito or datetime.date.today()) - self.fecha_contrato).days
+
     @property
     def tiempo_servicio(self):
         if self.fecha_contrato and self.fecha_finiquito:
@@ -186,27 +310,161 @@ class Trabajador(models.Model):
             return ", ".join(partes)
         return "-"
     
+class OperacionMasivaTrabajadores(models.Model):
+    """
+    Auditoría de finiquitos / ediciones masivas (ver core/rrhh.py).
+    `detalle` guarda los valores anteriores de cada trabajador tocado.
+    """
+    ACCION_CHOICES = [
+        ('FINIQUITO', 'Finiquito masivo'),
+        ('EDICION', 'Edición masiva'),
+    ]
+
+    fecha = models.DateTimeField(auto_now_add=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    accion = models.CharField(max_length=10, choices=ACCION_CHOICES)
+    criterio = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    cambios = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    cantidad = models.IntegerField(default=0)
+    detalle = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        verbose_name = "Operación Masiva de Trabajadores"
+        verbose_name_plural = "Operaciones Masivas de Trabajadores"
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y %H:%M} | {self.get_accion_display()} ({self.cantidad} trabajadores)"
+
 class Perfil(models.Model):
+    """
+    Se crea recién cuando alguien lo necesita (Perfil.para(user)), no al crear el
+    usuario ni en cada login. save() solo escribe los campos que cambiaron desde
+    que se leyó de la base; si no cambió nada no hace UPDATE.
+    """
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     imagen = models.ImageField(default='default.jpg', upload_to='perfiles_pics')
     telefono = models.CharField(max_length=20, blank=True, null=True)
+    recibir_alertas_stock = models.BooleanField(default=False, verbose_name="Recibir alertas de vencimiento")
 
     def __str__(self):
         return f'{self.user.username} Perfil'
 
+    @classmethod
+    def para(cls, user):
+        """Perfil del usuario; si no tiene, se crea (get_or_create) y queda en user.perfil."""
+        try:
+            return user.perfil
+        except cls.DoesNotExist:
+            perfil, _ = cls.objects.get_or_create(user=user)
+            perfil.user = user
+            return perfil
+
+    # --- Campos modificados (dirty tracking) ---
+    def _valores(self):
+        valores = {}
+        for campo in self._meta.concrete_fields:
+            if campo.primary_key or campo.attname not in self.__dict__:
+                continue  # los campos diferidos no se leen (sería una consulta)
+            valor = campo.value_from_object(self)
+            valores[campo.attname] = valor.name if isinstance(valor, FieldFile) else valor
+        return valores
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._originales = instancia._valores()
+        return instancia
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._originales = self._valores()
+
+    def campos_modificados(self):
+        originales = getattr(self, '_originales', {})
+        return [campo for campo, valor in self._valores().items()
+                if campo not in originales or originales[campo] != valor]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and hasattr(self, '_originales') \
+                and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            modificados = self.campos_modificados()
+            if not modificados:
+                return
+            kwargs['update_fields'] = modificados
+        super().save(*args, **kwargs)
+        self._originales = self._valores()
+
 # --- SEÑALES ---
 
-@receiver(post_save, sender=User)
-def crear_perfil(sender, instance, created, **kwargs):
+@receiver(pre_save, sender=User)
+def normalizar_credenciales(sender, instance, **kwargs):
+    """
+    Usuarios con RUT: username en forma canónica ('12345678-9'), que es como lo busca
+    core.backends. El correo se guarda sin espacios (el índice único compara en minúsculas).
+    """
+    if rut_util.parece_rut(instance.username):
+        instance.username = rut_util.normalizar(instance.username)
+    if instance.email:
+        instance.email = instance.email.strip()
+
+@receiver(user_logged_in)
+def contexto_al_iniciar_sesion(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        sesion.guardar_en_sesion(request, user)
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_contexto_por_grupos(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            sesion.invalidar(instance.pk)
+    elif action == 'pre_clear':
+        # grupo.user_set.clear(): los usuarios afectados solo se conocen antes de borrar
+        for user_id in instance.user_set.values_list('pk', flat=True):
+            sesion.invalidar(user_id)
+    elif action in ('post_add', 'post_remove'):
+        for user_id in pk_set:
+            sesion.invalidar(user_id)
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidar_contexto_por_grupo(sender, instance, created=False, **kwargs):
+    # Borrar o renombrar un grupo no dispara m2m_changed; los usuarios se leen antes
+    # de que desaparezcan las filas y se invalidan al confirmar
     if created:
-        Perfil.objects.create(user=instance)
-
-@receiver(post_save, sender=User)
-def guardar_perfil(sender, instance, **kwargs):
-    try:
-        instance.perfil.save()
-    except Exception:
-        Perfil.objects.create(user=instance)
+        return
+    usuarios = list(instance.user_set.values_list('pk', flat=True))
+
+    def invalidar():
+        for user_id in usuarios:
+            sesion.invalidar(user_id)
+    transaction.on_commit(invalidar)
+
+@receiver([post_save, post_delete], sender=Empresa)
+@receiver([post_save, post_delete], sender=Trabajador)
+def invalidar_opciones_empresa(sender, **kwargs):
+    cache.delete(Empresa.CACHE_OPCIONES_RRHH)
+
+@receiver([post_save, post_delete], sender=Empresa)
+@receiver([post_save, post_delete], sender=CentroCosto)
+@receiver([post_save, post_delete], sender=Clasificacion)
+@receiver([post_save, post_delete], sender=Cargo)
+def invalidar_opciones_catalogo(sender, **kwargs):
+    cache.delete(CACHE_OPCIONES_CATALOGO.format(sender._meta.label_lower))
+
+@receiver([post_save, post_delete], sender=Ingreso)
+@receiver([post_save, post_delete], sender=Empresa)
+@receiver([post_save, post_delete], sender=CentroCosto)
+@receiver([post_save, post_delete], sender=Clasificacion)
+def invalidar_cubos_ingresos(sender, **kwargs):
+    # Los cubos guardan también los nombres de empresa / centro / clasificación
+    transaction.on_commit(Ingreso.invalidar_cubos)
+
+@receiver(post_migrate)
+def asegurar_particiones_anuales(sender, using='default', **kwargs):
+    # Cada migrate (deploy) deja creadas las particiones del año en curso y del siguiente
+    if sender.name == 'core':
+        particiones.asegurar_particiones(using=using)
 
 class Movimiento(models.Model):
     TIPO_CHOICES = [
@@ -214,7 +472,7 @@ class Movimiento(models.Model):
         ('EGRESO', 'Egreso'),
     ]
 
-    fecha = models.DateField(default=timezone.now)
+    fecha = models.DateField(default=timezone.now, db_index=True)
     tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
     descripcion = models.CharField(max_length=255, verbose_name="Descripción")
     monto = models.IntegerField()
@@ -231,19 +489,91 @@ class Movimiento(models.Model):
 
     def __str__(self):
         return f"{self.fecha} | {self.descripcion} (${self.monto})"
+
+
+class Conciliacion(models.Model):
+    """
+    Un Ingreso (hoja de egresos) conciliado con el Movimiento bancario que lo pagó
+    (ver core/conciliacion.py). Varios ingresos pueden ir a un mismo movimiento
+    (una transferencia que paga varias facturas); cada ingreso, a uno solo.
+    Sin llaves foráneas en la base: en PostgreSQL Ingreso y Movimiento están
+    particionadas por año y su llave es (id, fecha) (ver core/particiones.py).
+    """
+    REGLAS = [
+        ('DOCUMENTO', 'Monto y N° de documento'),
+        ('MONTO_FECHA', 'Monto y fecha cercana'),
+        ('AGRUPADO', 'Varios ingresos, un movimiento'),
+    ]
+
+    movimiento = models.ForeignKey(Movimiento, on_delete=models.CASCADE, related_name='conciliaciones', db_constraint=False)
+    ingreso = models.OneToOneField(Ingreso, on_delete=models.CASCADE, related_name='conciliacion', db_constraint=False)
+    regla = models.CharField(max_length=20, choices=REGLAS)
+    diferencia_dias = models.PositiveIntegerField(default=0, verbose_name="Diferencia (días)")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Conciliación Bancaria"
+        verbose_name_plural = "Conciliaciones Bancarias"
+
+    def __str__(self):
+        return f"Movimiento {self.movimiento_id} <- Ingreso {self.ingreso_id} ({self.regla})"
+
+
+class PosibleDuplicado(models.Model):
+    """
+    Par de Ingresos de la misma empresa, monto y fecha cercana con descripción
+    parecida (ver core/duplicados.py), para revisar. `ingreso` es siempre el de
+    menor id. Sin llaves foráneas en la base, igual que Conciliacion.
+    """
+    ESTADOS = [
+        ('PENDIENTE', 'Pendiente de revisión'),
+        ('DUPLICADO', 'Duplicado confirmado'),
+        ('DESCARTADO', 'No es duplicado'),
+    ]
+
+    ingreso = models.ForeignKey(Ingreso, on_delete=models.CASCADE, related_name='posibles_duplicados', db_constraint=False)
+    duplicado = models.ForeignKey(Ingreso, on_delete=models.CASCADE, related_name='+', db_constraint=False)
+    similitud = models.FloatField()
+    diferencia_dias = models.PositiveIntegerField(default=0, verbose_name="Diferencia (días)")
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='PENDIENTE', db_index=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Posible Duplicado"
+        verbose_name_plural = "Posibles Duplicados"
+        ordering = ['-similitud']
+        constraints = [
+            models.UniqueConstraint(fields=['ingreso', 'duplicado'], name='posible_duplicado_par_unico'),
+        ]
+
+    def __str__(self):
+        return f"Ingreso {self.ingreso_id} ~ {self.duplicado_id} ({self.similitud:.0%})"
     
 # --- GESTIÓN DE INVENTARIO Y VENCIMIENTOS ---
 
+class ProductoQuerySet(models.QuerySet):
+
+    def con_stock(self):
+        """Anota `stock` (suma de sus lotes) en la misma consulta: listados sin una consulta por producto."""
+        return self.annotate(stock=Coalesce(models.Sum('lote__cantidad'), 0))
+
+
 class Producto(models.Model):
     codigo = models.CharField(max_length=50, unique=True, verbose_name="Código SKU")
     nombre = models.CharField(max_length=200)
     categoria = models.CharField(max_length=100, blank=True, null=True)
     stock_minimo = models.IntegerField(default=10, verbose_name="Alerta Stock Bajo")
+
+    objects = ProductoQuerySet.as_manager()
     
+    @staticmethod
+    def normalizar_categoria(categoria):
+        """Categoría en "Title Case". También la usan las cargas masivas (bulk_create no llama a save)."""
+        return categoria.title().strip() if categoria else categoria
+
     def save(self, *args, **kwargs):
         # Si tiene categoría, la convertimos a "Title Case"
-        if self.categoria:
-            self.categoria = self.categoria.title().strip() 
+        self.categoria = self.normalizar_categoria(self.categoria)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -251,30 +581,186 @@ class Producto(models.Model):
 
     @property
     def stock_total(self):
+        # Si viene de Producto.objects.con_stock() usamos el valor calculado en SQL
+        if getattr(self, 'stock', None) is not None:
+            return self.stock
         return self.lote_set.aggregate(total=models.Sum('cantidad'))['total'] or 0
 
+DIAS_ALERTA_VENCIMIENTO = 30
+
+class LoteQuerySet(models.QuerySet):
+    """
+    Semáforo de vencimiento calculado en la base de datos.
+    Todos los consumidores (dashboards, CSV, alertas) usan estos métodos,
+    así la ventana de 30 días vive en un solo lugar.
+    """
+
+    def _limites(self, hoy=None, dias=DIAS_ALERTA_VENCIMIENTO):
+        hoy = hoy or datetime.date.today()
+        return hoy, hoy + datetime.timedelta(days=dias)
+
+    def con_estado(self, hoy=None, dias=DIAS_ALERTA_VENCIMIENTO):
+        """Anota `vence_en` (intervalo hasta el vencimiento) y `semaforo` (VENCIDO / POR_VENCER / OK)."""
+        hoy, limite = self._limites(hoy, dias)
+        return self.annotate(
+            vence_en=models.ExpressionWrapper(
+                models.F('fecha_vencimiento') - models.Value(hoy, output_field=models.DateField()),
+                output_field=models.DurationField()
+            ),
+            semaforo=models.Case(
+                models.When(fecha_vencimiento__lt=hoy, then=models.Value('VENCIDO')),
+                models.When(fecha_vencimiento__lte=limite, then=models.Value('POR_VENCER')),
+                default=models.Value('OK'),
+                output_field=models.CharField(),
+            ),
+        )
+
+    def en_estado(self, estado, hoy=None, dias=DIAS_ALERTA_VENCIMIENTO):
+        """Filtra por semáforo usando rangos de fecha (aprovecha el índice de fecha_vencimiento)."""
+        hoy, limite = self._limites(hoy, dias)
+        estado = (estado or '').upper()
+        if estado == 'VENCIDO':
+            return self.filter(fecha_vencimiento__lt=hoy)
+        if estado == 'POR_VENCER':
+            return self.filter(fecha_vencimiento__gte=hoy, fecha_vencimiento__lte=limite)
+        if estado == 'OK':
+            return self.filter(fecha_vencimiento__gt=limite)
+        return self
+
+    def _conteos(self, hoy=None, dias=DIAS_ALERTA_VENCIMIENTO):
+        hoy, limite = self._limites(hoy, dias)
+        return {
+            'vencidos': models.Count('id', filter=models.Q(fecha_vencimiento__lt=hoy)),
+            'por_vencer': models.Count('id', filter=models.Q(fecha_vencimiento__gte=hoy, fecha_vencimiento__lte=limite)),
+            'ok': models.Count('id', filter=models.Q(fecha_vencimiento__gt=limite)),
+            'total_stock': models.Sum('cantidad'),
+        }
+
+    def resumen_estados(self, hoy=None, dias=DIAS_ALERTA_VENCIMIENTO):
+        """Totales del semáforo en UNA consulta: {'vencidos', 'por_vencer', 'ok', 'total_stock'}"""
+        return self.order_by().aggregate(**self._conteos(hoy, dias))
+
+    def resumen_por_categoria(self, hoy=None, dias=DIAS_ALERTA_VENCIMIENTO):
+        """Semáforo y stock por categoría en UNA consulta agrupada."""
+        return self.order_by().values('producto__categoria')\
+                   .annotate(**self._conteos(hoy, dias))\
+                   .order_by('-total_stock')
+
+
 class Lote(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
     numero_lote = models.CharField(max_length=50)
     fecha_elaboracion = models.DateField(blank=True, null=True)
     fecha_vencimiento = models.DateField()
     cantidad = models.IntegerField(default=0)
+
+    objects = LoteQuerySet.as_manager()
     
     class Meta:
         ordering = ['fecha_vencimiento']
+        indexes = [
+            models.Index(fields=['fecha_vencimiento', 'producto'], name='lote_venc_producto_idx'),
+        ]
 
     def __str__(self):
         return f"{self.producto.nombre} - Lote {self.numero_lote}"
 
     @property
     def dias_para_vencer(self):
-        from datetime import date
-        delta = self.fecha_vencimiento - date.today()
+        # Si viene de Lote.objects.con_estado() usamos el valor calculado en SQL
+        if getattr(self, 'vence_en', None) is not None:
+            return self.vence_en.days
+        delta = self.fecha_vencimiento - datetime.date.today()
         return delta.days
     
     @property
     def estado_vencimiento(self):
+        if getattr(self, 'semaforo', None):
+            return self.semaforo
         dias = self.dias_para_vencer
         if dias < 0: return 'VENCIDO'
-        if dias <= 30: return 'POR_VENCER'
-        return 'OK'
\ No newline at end of file
+        if dias <= DIAS_ALERTA_VENCIMIENTO: return 'POR_VENCER'
+        return 'OK'
+
+class MovimientoStock(models.Model):
+    """
+    Libro de movimientos de inventario (solo inserción).
+    cantidad > 0 entra stock, cantidad < 0 sale stock.
+    """
+    TIPO_CHOICES = [
+        ('ENTRADA', 'Ingreso de Lote'),
+        ('VENTA', 'Venta / Salida'),
+        ('AJUSTE', 'Ajuste'),
+    ]
+
+    fecha = models.DateTimeField(default=timezone.now)
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    # El producto puede borrarse (admin) y el lote al agotarse: guardamos también
+    # código, nombre y número de lote para que el historial se siga leyendo
+    producto = models.ForeignKey(Producto, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='movimientos_stock')
+    codigo_producto = models.CharField(max_length=50, blank=True)
+    nombre_producto = models.CharField(max_length=200, blank=True)
+    lote = models.ForeignKey(Lote, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos')
+    numero_lote = models.CharField(max_length=50, blank=True)
+    cantidad = models.IntegerField()
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    referencia = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = "Movimiento de Stock"
+        verbose_name_plural = "Movimientos de Stock"
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['fecha', 'producto'], name='movstock_fecha_producto_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Los movimientos de stock no se modifican: registre un AJUSTE.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Los movimientos de stock no se eliminan: registre un AJUSTE.")
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y %H:%M} | {self.tipo} {self.cantidad:+d} {self.producto_id}"
+
+class CorteStock(models.Model):
+    """Foto periódica del stock por producto (ver `manage.py corte_stock`)."""
+    fecha = models.DateTimeField(unique=True)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Corte de Stock"
+        verbose_name_plural = "Cortes de Stock"
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"Corte {self.fecha:%d/%m/%Y %H:%M}"
+
+class CorteStockDetalle(models.Model):
+    corte = models.ForeignKey(CorteStock, on_delete=models.CASCADE, related_name='detalles')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    cantidad = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['corte', 'producto'], name='corte_stock_producto_unico'),
+        ]
+
+class AlertaVencimiento(models.Model):
+    """Registro de avisos ya enviados: un lote se notifica una vez por estado."""
+    lote = models.ForeignKey(Lote, on_delete=models.CASCADE, related_name='alertas')
+    estado = models.CharField(max_length=20)  # VENCIDO | POR_VENCER
+    fecha_envio = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Alerta de Vencimiento"
+        verbose_name_plural = "Alertas de Vencimiento"
+        constraints = [
+            models.UniqueConstraint(fields=['lote', 'estado'], name='alerta_unica_por_lote_estado'),
+        ]
+
+    def __str__(self):
+        return f"Lote {self.lote_id} - {self.estado} ({self.fecha_envio:%d/%m/%Y})"
@@ -0,0 +1,245 @@
+# core/particiones.py
+"""
+Particiones anuales de Ingreso y Movimiento (solo PostgreSQL).
+
+core_ingreso y core_movimiento quedan particionadas por rango de `fecha`: una
+partición por año (core_ingreso_2025 guarda 2025-01-01 <= fecha < 2026-01-01)
+más core_ingreso_default para las fechas de años sin partición. Llave primaria,
+índices y llaves foráneas se declaran en la tabla madre y Postgres los crea en
+cada partición, también en las que se agreguen después.
+
+- Consultas: filtrar por rango de fecha (rango_periodo) deja que Postgres
+  descarte las particiones de los otros años (partition pruning).
+- Año siguiente: asegurar_particiones() lo crea en cada migrate (post_migrate)
+  y con `manage.py particiones`; conviene programarlo también en diciembre.
+- Años viejos: separar_particion() los saca de la tabla madre sin mover datos
+  (DETACH PARTITION); quedan como tabla suelta para archivar o borrar.
+
+Postgres exige que la llave primaria incluya la columna de partición: en la base
+es (id, fecha). Para Django el pk sigue siendo id, único porque sale de una secuencia.
+
+Con otros motores (SQLite de los tests) nada de esto se aplica: las tablas siguen
+siendo normales y las consultas son las mismas.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+TABLAS = ('core_ingreso', 'core_movimiento')
+COLUMNA = 'fecha'
+ANIOS_ADELANTE = getattr(settings, 'PARTICIONES_ANIOS_ADELANTE', 1)
+
+
+def rango_periodo(anio, mes=None):
+    """
+    (desde, hasta) del año o del mes, con `hasta` excluido: fecha__gte=desde,
+    fecha__lt=hasta. A diferencia de fecha__month (EXTRACT), el rango usa el
+    índice de fecha y permite descartar particiones. None si anio/mes no son válidos.
+    """
+    try:
+        anio = int(anio)
+        mes = int(mes) if mes else None
+        if mes:
+            return datetime.date(anio, mes, 1), datetime.date(anio + mes // 12, mes % 12 + 1, 1)
+        return datetime.date(anio, 1, 1), datetime.date(anio + 1, 1, 1)
+    except (TypeError, ValueError):
+        return None
+
+
+def soporta_particiones(connection):
+    return connection.vendor == 'postgresql'
+
+
+def nombre_particion(tabla, anio):
+    return f'{tabla}_{anio}'
+
+
+def _limites_sql(anio):
+    desde, hasta = rango_periodo(anio)
+    return f"FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}')"
+
+
+def _es_particionada(cursor, tabla):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [tabla])
+    fila = cursor.fetchone()
+    return bool(fila) and fila[0] == 'p'
+
+
+def _existe(cursor, tabla):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [tabla])
+    return cursor.fetchone()[0]
+
+
+# =========================================================
+# MANTENCIÓN (año siguiente, separar años viejos)
+# =========================================================
+def _crear_particion(cursor, tabla, anio):
+    """
+    Agrega la partición del año si falta. Se arma como tabla suelta y luego se
+    adjunta: así se le pasan las filas de ese año que hubieran caído en la
+    partición por defecto (ATTACH rechaza el año si quedan filas suyas ahí).
+    """
+    nombre = nombre_particion(tabla, anio)
+    if _existe(cursor, nombre):
+        return False
+    desde, hasta = (d.isoformat() for d in rango_periodo(anio))
+    condicion = f"{COLUMNA} >= '{desde}' AND {COLUMNA} < '{hasta}'"
+    defecto = f'{tabla}_default'
+
+    cursor.execute(f'CREATE TABLE "{nombre}" (LIKE "{tabla}" INCLUDING DEFAULTS)')
+    # Con el CHECK equivalente al rango, ATTACH no recorre la tabla para validarla
+    cursor.execute(f'ALTER TABLE "{nombre}" ADD CONSTRAINT "{nombre}_rango" CHECK ({condicion})')
+    if _existe(cursor, defecto):
+        cursor.execute(
+            f'WITH movidas AS (DELETE FROM "{defecto}" WHERE {condicion} RETURNING *) '
+            f'INSERT INTO "{nombre}" SELECT * FROM movidas'
+        )
+    cursor.execute(f'ALTER TABLE "{tabla}" ATTACH PARTITION "{nombre}" FOR VALUES {_limites_sql(anio)}')
+    cursor.execute(f'ALTER TABLE "{nombre}" DROP CONSTRAINT "{nombre}_rango"')
+    return True
+
+
+def asegurar_particiones(anio=None, using='default'):
+    """
+    Particiones del año `anio` (por defecto el actual) y de los ANIOS_ADELANTE
+    siguientes en ambas tablas. Devuelve los nombres de las que creó.
+    """
+    connection = connections[using]
+    if not soporta_particiones(connection):
+        return []
+    anio = int(anio or timezone.localdate().year)
+    creadas = []
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for tabla in TABLAS:
+            if not _es_particionada(cursor, tabla):
+                continue
+            for a in range(anio, anio + ANIOS_ADELANTE + 1):
+                if _crear_particion(cursor, tabla, a):
+                    creadas.append(nombre_particion(tabla, a))
+    return creadas
+
+
+def separar_particion(anio, using='default'):
+    """
+    Saca el año de ambas tablas con DETACH PARTITION: solo cambia el catálogo,
+    no copia ni borra filas. Las tablas sueltas (core_ingreso_2019, ...) siguen
+    en la base hasta que se archiven o borren. Devuelve sus nombres.
+    """
+    connection = connections[using]
+    if not soporta_particiones(connection):
+        return []
+    separadas = []
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for tabla in TABLAS:
+            nombre = nombre_particion(tabla, int(anio))
+            cursor.execute(
+                "SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%s) AND inhparent = to_regclass(%s)",
+                [nombre, tabla],
+            )
+            if cursor.fetchone():
+                cursor.execute(f'ALTER TABLE "{tabla}" DETACH PARTITION "{nombre}"')
+                separadas.append(nombre)
+    return separadas
+
+
+def eliminar_particion(anio, using='default'):
+    """Separa el año y borra las tablas sueltas (DROP: no recorre filas). Para años ya archivados."""
+    eliminadas = separar_particion(anio, using=using)
+    if eliminadas:
+        with connections[using].cursor() as cursor:
+            for nombre in eliminadas:
+                cursor.execute(f'DROP TABLE "{nombre}"')
+    return eliminadas
+
+
+def particiones(tabla, using='default'):
+    """[(nombre, límites, filas estimadas)] de las particiones de la tabla."""
+    connection = connections[using]
+    if not soporta_particiones(connection):
+        return []
+    with connection.cursor() as cursor:
+        if not _es_particionada(cursor, tabla):
+            return []
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), GREATEST(c.reltuples, 0)::bigint "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+            [tabla],
+        )
+        return cursor.fetchall()
+
+
+# =========================================================
+# MIGRACIÓN (tabla normal <-> tabla particionada)
+# =========================================================
+def _restricciones_modelo(schema_editor, model):
+    """Índices y llaves foráneas del modelo, con los mismos nombres que les da Django."""
+    for sql in schema_editor._model_indexes_sql(model):
+        schema_editor.execute(sql)
+    for field in model._meta.local_fields:
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+
+
+def particionar(schema_editor, model):
+    """
+    Convierte la tabla del modelo en tabla particionada por año, con sus datos.
+    Crea una partición por cada año con filas, el año en curso, los siguientes
+    y la partición por defecto. En otros motores no hace nada.
+    """
+    connection = schema_editor.connection
+    if not soporta_particiones(connection):
+        return
+    tabla = model._meta.db_table
+    anterior = f'{tabla}_sin_particion'
+    secuencia = f'{tabla}_id_seq'
+    with connection.cursor() as cursor:
+        if _es_particionada(cursor, tabla):
+            return
+        cursor.execute(f'SELECT DISTINCT EXTRACT(YEAR FROM {COLUMNA})::int FROM "{tabla}"')
+        anios = {fila[0] for fila in cursor.fetchall()}
+    actual = timezone.localdate().year
+    anios.update(range(actual, actual + ANIOS_ADELANTE + 1))
+
+    schema_editor.execute(f'ALTER TABLE "{tabla}" RENAME TO "{anterior}"')
+    # Sin INCLUDING INDEXES: la llave primaria (id) no sirve en una tabla particionada
+    schema_editor.execute(f'CREATE TABLE "{tabla}" (LIKE "{anterior}" INCLUDING DEFAULTS) PARTITION BY RANGE ({COLUMNA})')
+    for anio in sorted(anios):
+        schema_editor.execute(
+            f'CREATE TABLE "{nombre_particion(tabla, anio)}" PARTITION OF "{tabla}" FOR VALUES {_limites_sql(anio)}'
+        )
+    schema_editor.execute(f'CREATE TABLE "{tabla}_default" PARTITION OF "{tabla}" DEFAULT')
+    schema_editor.execute(f'INSERT INTO "{tabla}" SELECT * FROM "{anterior}"')
+    # Con la tabla anterior se va su secuencia (identity); la nueva parte del id más alto
+    schema_editor.execute(f'DROP TABLE "{anterior}"')
+    schema_editor.execute(f'CREATE SEQUENCE "{secuencia}" OWNED BY "{tabla}".id')
+    schema_editor.execute(f"ALTER TABLE \"{tabla}\" ALTER COLUMN id SET DEFAULT nextval('\"{secuencia}\"')")
+    schema_editor.execute(f"SELECT setval('\"{secuencia}\"', COALESCE((SELECT MAX(id) FROM \"{tabla}\"), 0) + 1, false)")
+    schema_editor.execute(f'ALTER TABLE "{tabla}" ADD CONSTRAINT "{tabla}_pkey" PRIMARY KEY (id, {COLUMNA})')
+    _restricciones_modelo(schema_editor, model)
+
+
+def desparticionar(schema_editor, model):
+    """Vuelve a una tabla normal con las filas de las particiones adjuntas (las separadas no se tocan)."""
+    connection = schema_editor.connection
+    if not soporta_particiones(connection):
+        return
+    tabla = model._meta.db_table
+    plana = f'{tabla}_plana'
+    with connection.cursor() as cursor:
+        if not _es_particionada(cursor, tabla):
+            return
+
+    # Sin INCLUDING DEFAULTS: el default de id depende de la secuencia que se borra con la tabla madre
+    schema_editor.execute(f'CREATE TABLE "{plana}" (LIKE "{tabla}")')
+    schema_editor.execute(f'INSERT INTO "{plana}" SELECT * FROM "{tabla}"')
+    schema_editor.execute(f'DROP TABLE "{tabla}"')
+    schema_editor.execute(f'ALTER TABLE "{plana}" RENAME TO "{tabla}"')
+    schema_editor.execute(f'ALTER TABLE "{tabla}" ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('\"{tabla}\"', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM \"{tabla}\""
+    )
+    schema_editor.execute(f'ALTER TABLE "{tabla}" ADD CONSTRAINT "{tabla}_pkey" PRIMARY KEY (id)')
+    _restricciones_modelo(schema_editor, model)
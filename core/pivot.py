@@ -0,0 +1,281 @@
+# core/pivot.py
+"""
+Pivot / OLAP sobre Ingreso (gastos) con cubos cacheados.
+
+Una consulta pide:
+- dimensiones: empresa, centro_costo, clasificacion, tipo_documento y granos de
+  tiempo (dia, mes, trimestre, anio), repartidas en filas y columnas
+- medidas: sum / count / avg de monto_transferencia e iva ('iva:avg')
+- filtros: los mismos del listado de ingresos (services.filtros_ingresos)
+
+El GROUP BY va a SQL y el resultado queda como "cubo" en el cache de Django: por
+celda, cantidad de filas y sumas de monto e IVA (el promedio sale de suma / cantidad,
+así se puede volver a agregar). Una consulta nueva primero busca un cubo cacheado
+más fino con los mismos filtros de fondo y lo resuelve con pandas sin ir a la base:
+- roll-up: menos dimensiones o un grano de tiempo más grueso (mes -> trimestre -> año)
+- corte (slice): empresa / centro / clasificación fijos, si el cubo tiene esa
+  dimensión; un rango de fechas más corto, si calza con el grano del cubo.
+
+Filtros de fondo (texto, revisión, montos) no se pueden aplicar sobre un cubo:
+son parte de su clave. La clave incluye la versión de Ingreso.CACHE_VERSION_CUBOS,
+que cambia con cualquier alta, edición o baja, así que no hay cubos viejos.
+pandas se importa al armar el primer cubo.
+"""
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncQuarter, TruncYear
+
+from .models import Ingreso
+from .services import filtrar_ingresos
+
+CACHE_SEGUNDOS = getattr(settings, 'PIVOT_CACHE_SEGUNDOS', 600)
+MAX_CUBOS = getattr(settings, 'PIVOT_MAX_CUBOS', 20)  # cubos recordados por combinación de filtros de fondo
+
+# Dimensión -> (columna de agrupación, columna con el nombre que se muestra)
+DIMENSIONES = {
+    'empresa': ('empresa_id', 'empresa__nombre'),
+    'centro_costo': ('centro_costo_id', 'centro_costo__nombre'),
+    'clasificacion': ('clasificacion_id', 'clasificacion__nombre'),
+    'tipo_documento': ('tipo_documento', 'tipo_documento'),
+}
+# Del más fino al más grueso: un cubo por mes responde trimestres y años
+GRANOS = {'dia': TruncDay, 'mes': TruncMonth, 'trimestre': TruncQuarter, 'anio': TruncYear}
+ORDEN_GRANOS = list(GRANOS)
+# Campo -> columna del cubo con su suma
+CAMPOS = {'monto_transferencia': 'suma_monto', 'iva': 'suma_iva'}
+AGREGACIONES = ('sum', 'count', 'avg')
+CELDA = ['n', 'suma_monto', 'suma_iva']
+# Filtro del listado -> dimensión que corta
+CORTES = {'empresa': 'empresa', 'centro': 'centro_costo', 'clasificacion': 'clasificacion'}
+SIN_DATO = 'Sin asignar'
+
+
+class ConsultaInvalida(ValueError):
+    pass
+
+
+# =========================================================
+# CONSULTA
+# =========================================================
+def preparar_consulta(filas, columnas=(), medidas=('monto_transferencia:sum',), filtros=None):
+    """Valida y normaliza. filtros: dict de services.filtros_ingresos."""
+    filas, columnas, medidas = list(filas), list(columnas), list(medidas) or ['monto_transferencia:sum']
+    dimensiones = filas + columnas
+    for dim in dimensiones:
+        if dim not in DIMENSIONES and dim not in GRANOS:
+            raise ConsultaInvalida(f"Dimensión desconocida: {dim}. Use {', '.join([*DIMENSIONES, *GRANOS])}.")
+    if len(set(dimensiones)) != len(dimensiones):
+        raise ConsultaInvalida("Una dimensión no puede repetirse.")
+    if columnas and not filas:
+        raise ConsultaInvalida("Indique al menos una dimensión en filas.")
+    for medida in medidas:
+        campo, _, agregacion = medida.partition(':')
+        if campo not in CAMPOS or agregacion not in AGREGACIONES:
+            raise ConsultaInvalida(f"Medida desconocida: {medida}. Use campo:sum|count|avg con {', '.join(CAMPOS)}.")
+
+    filtros = dict(filtros or {})
+    cortes = {dim: filtros.pop(nombre) for nombre, dim in CORTES.items() if filtros.get(nombre)}
+    desde, hasta = filtros.pop('fecha_inicio', None), filtros.pop('fecha_fin', None)
+    fondo = {k: v for k, v in filtros.items() if v not in (None, '', False)}
+    granos = [d for d in dimensiones if d in GRANOS]
+    return {
+        'filas': filas,
+        'columnas': columnas,
+        'medidas': medidas,
+        'atributos': [d for d in dimensiones if d in DIMENSIONES],
+        'granos': granos,
+        'grano': min(granos, key=ORDEN_GRANOS.index) if granos else None,
+        'cortes': cortes,
+        'desde': desde,
+        'hasta': hasta,
+        'fondo': fondo,
+    }
+
+
+def _clave(*partes):
+    texto = json.dumps(partes, sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def _clave_indice(consulta):
+    return f"pivot:indice:{_clave(consulta['fondo'], cache.get(Ingreso.CACHE_VERSION_CUBOS))}"
+
+
+# =========================================================
+# CUBOS
+# =========================================================
+def _columnas_dimension(dim):
+    return list(dict.fromkeys(DIMENSIONES[dim]))
+
+
+def truncar(fecha, grano):
+    if grano == 'dia':
+        return fecha
+    if grano == 'mes':
+        return fecha.replace(day=1)
+    if grano == 'trimestre':
+        return datetime.date(fecha.year, (fecha.month - 1) // 3 * 3 + 1, 1)
+    return datetime.date(fecha.year, 1, 1)
+
+
+def _calza(desde, hasta, grano):
+    """¿El rango empieza y termina justo en bordes de período del grano?"""
+    if grano is None:
+        return False
+    return ((desde is None or truncar(desde, grano) == desde)
+            and (hasta is None or truncar(hasta + datetime.timedelta(days=1), grano) == hasta + datetime.timedelta(days=1)))
+
+
+def _cubre(cubo, consulta):
+    """¿El cubo cacheado responde la consulta sin ir a la base?"""
+    if cubo['grano'] is not None and consulta['grano'] is not None:
+        if ORDEN_GRANOS.index(cubo['grano']) > ORDEN_GRANOS.index(consulta['grano']):
+            return False
+    elif consulta['grano'] is not None:
+        return False
+    for dim, valor in cubo['cortes'].items():
+        if consulta['cortes'].get(dim) != valor:
+            return False
+    atributos = set(consulta['atributos']) | {d for d in consulta['cortes'] if d not in cubo['cortes']}
+    if not atributos <= set(cubo['atributos']):
+        return False
+    if (cubo['desde'], cubo['hasta']) == (consulta['desde'], consulta['hasta']):
+        return True
+    dentro = ((cubo['desde'] is None or (consulta['desde'] and consulta['desde'] >= cubo['desde']))
+              and (cubo['hasta'] is None or (consulta['hasta'] and consulta['hasta'] <= cubo['hasta'])))
+    return dentro and _calza(consulta['desde'], consulta['hasta'], cubo['grano'])
+
+
+def _calcular_cubo(consulta):
+    """Un GROUP BY en SQL con los filtros completos de la consulta."""
+    import pandas as pd
+
+    filtros = {**consulta['fondo'], 'fecha_inicio': consulta['desde'], 'fecha_fin': consulta['hasta']}
+    filtros.update({nombre: consulta['cortes'][dim] for nombre, dim in CORTES.items() if dim in consulta['cortes']})
+    ingresos = filtrar_ingresos(filtros).order_by()
+
+    columnas = [c for dim in consulta['atributos'] for c in _columnas_dimension(dim)]
+    if consulta['grano']:
+        ingresos = ingresos.annotate(**{consulta['grano']: GRANOS[consulta['grano']]('fecha')})
+        columnas.append(consulta['grano'])
+    medidas = {'n': Count('id'), 'suma_monto': Sum('monto_transferencia'), 'suma_iva': Sum('iva')}
+    if columnas:
+        registros = list(ingresos.values(*columnas).annotate(**medidas))
+    else:
+        registros = [ingresos.aggregate(**medidas)]
+
+    df = pd.DataFrame.from_records(registros, columns=columnas + CELDA)
+    df[CELDA] = df[CELDA].fillna(0).astype('int64')
+    return df
+
+
+def obtener_cubo(consulta):
+    """(DataFrame, cubo, desde_cache): un cubo cacheado que cubre la consulta o uno nuevo desde SQL."""
+    clave_indice = _clave_indice(consulta)
+    indice = cache.get(clave_indice) or []
+    for cubo in indice:
+        if _cubre(cubo, consulta):
+            df = cache.get(cubo['clave'])
+            if df is not None:
+                return df, cubo, True
+
+    cubo = {
+        'clave': f"pivot:cubo:{_clave(clave_indice, consulta['atributos'], consulta['grano'], consulta['cortes'], consulta['desde'], consulta['hasta'])}",
+        'atributos': consulta['atributos'],
+        'grano': consulta['grano'],
+        'cortes': consulta['cortes'],
+        'desde': consulta['desde'],
+        'hasta': consulta['hasta'],
+    }
+    df = _calcular_cubo(consulta)
+    cache.set(cubo['clave'], df, CACHE_SEGUNDOS)
+    # Los cubos expulsados del cache se olvidan; los más nuevos quedan primero
+    indice = [c for c in indice if c['clave'] != cubo['clave'] and c['clave'] in cache][:MAX_CUBOS - 1]
+    cache.set(clave_indice, [cubo] + indice, CACHE_SEGUNDOS)
+    return df, cubo, False
+
+
+def resolver(df, cubo, consulta):
+    """Corte y roll-up del cubo en pandas: una fila por combinación de las dimensiones pedidas."""
+    for dim, valor in consulta['cortes'].items():
+        if dim not in cubo['cortes']:
+            df = df[df[DIMENSIONES[dim][0]] == valor]
+    if (consulta['desde'], consulta['hasta']) != (cubo['desde'], cubo['hasta']):
+        if consulta['desde']:
+            df = df[df[cubo['grano']] >= truncar(consulta['desde'], cubo['grano'])]
+        if consulta['hasta']:
+            df = df[df[cubo['grano']] <= truncar(consulta['hasta'], cubo['grano'])]
+
+    claves = [c for dim in consulta['atributos'] for c in _columnas_dimension(dim)]
+    for grano in consulta['granos']:
+        if grano != cubo['grano']:
+            df = df.assign(**{grano: df[cubo['grano']].map(lambda fecha, g=grano: truncar(fecha, g))})
+        claves.append(grano)
+    if claves:
+        df = df.groupby(claves, dropna=False)[CELDA].sum().reset_index()
+    else:
+        df = df[CELDA].sum().to_frame().T
+
+    resultado = df[[]].copy()
+    for dim in consulta['filas'] + consulta['columnas']:
+        if dim in GRANOS:
+            resultado[dim] = df[dim].map(lambda fecha, g=dim: etiqueta_periodo(fecha, g))
+        else:
+            resultado[dim] = df[DIMENSIONES[dim][1]].fillna(SIN_DATO)
+    for medida in consulta['medidas']:
+        campo, _, agregacion = medida.partition(':')
+        if agregacion == 'count':
+            resultado[medida] = df['n']
+        elif agregacion == 'sum':
+            resultado[medida] = df[CAMPOS[campo]]
+        else:
+            resultado[medida] = (df[CAMPOS[campo]] / df['n'].where(df['n'] > 0)).round(0).fillna(0).astype('int64')
+    dimensiones = consulta['filas'] + consulta['columnas']
+    return resultado.sort_values(dimensiones).reset_index(drop=True) if dimensiones else resultado
+
+
+def etiqueta_periodo(fecha, grano):
+    if grano == 'anio':
+        return str(fecha.year)
+    if grano == 'trimestre':
+        return f"{fecha.year}-T{(fecha.month - 1) // 3 + 1}"
+    if grano == 'mes':
+        return fecha.strftime('%Y-%m')
+    return fecha.isoformat()
+
+
+# =========================================================
+# SALIDA
+# =========================================================
+def tabla(resultado, consulta):
+    """
+    Tabla cruzada: una fila por combinación de `filas` y una columna por medida y
+    valor de `columnas`. Sin columnas es la misma lista larga.
+    -> (encabezados, filas)
+    """
+    if not consulta['columnas']:
+        return list(resultado.columns), resultado.values.tolist()
+
+    cruzada = resultado.pivot(index=consulta['filas'], columns=consulta['columnas'], values=consulta['medidas'])
+    cruzada = cruzada.fillna(0).astype('int64')
+    encabezados = list(consulta['filas']) + [
+        ' | '.join(str(parte) for parte in (columna if isinstance(columna, tuple) else (columna,)))
+        for columna in cruzada.columns
+    ]
+    filas = [
+        list(indice if isinstance(indice, tuple) else (indice,)) + valores
+        for indice, valores in zip(cruzada.index, cruzada.values.tolist())
+    ]
+    return encabezados, filas
+
+
+def pivotear(filas, columnas=(), medidas=('monto_transferencia:sum',), filtros=None):
+    """-> (consulta, resultado DataFrame, origen 'cache' | 'sql')."""
+    consulta = preparar_consulta(filas, columnas, medidas, filtros)
+    df, cubo, desde_cache = obtener_cubo(consulta)
+    return consulta, resolver(df, cubo, consulta), 'cache' if desde_cache else 'sql'
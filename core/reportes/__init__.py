@@ -0,0 +1,6 @@
+# core/reportes
+# Subsistema de reportes PDF.
+#
+# - motor.py: renderizado puro (WeasyPrint / reportlab), sin dependencias de Django,
+#   para poder ejecutarse dentro de un pool de procesos.
+# - caja_chica.py: filtros, caché en disco y orquestación del reporte de rendición.
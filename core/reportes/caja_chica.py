@@ -0,0 +1,437 @@
+# core/reportes/caja_chica.py
+import datetime
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_date
+
+from ..models import CajaChica
+from .motor import renderizar_pdf
+
+FILAS_POR_PAGINA = 30
+CACHE_DIR = getattr(settings, 'REPORTES_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'reportes'))
+MAX_ARCHIVOS_CACHE = getattr(settings, 'REPORTES_MAX_ARCHIVOS', 200)
+PDF_WORKERS = getattr(settings, 'REPORTES_PDF_WORKERS', 2)
+PDF_TIMEOUT = getattr(settings, 'REPORTES_PDF_TIMEOUT', 120)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# =========================================================
+# FILTROS
+# =========================================================
+def filtros_desde_request(params):
+    """Lee fecha_inicio / fecha_fin / responsable / tipo desde request.GET (valores inválidos se ignoran)."""
+    def _fecha(valor):
+        try:
+            return parse_date(valor) if valor else None
+        except ValueError:
+            return None
+
+    tipo = (params.get('tipo') or '').strip().upper()
+    return {
+        'fecha_inicio': _fecha(params.get('fecha_inicio')),
+        'fecha_fin': _fecha(params.get('fecha_fin')),
+        'responsable': (params.get('responsable') or '').strip(),
+        'tipo': tipo if tipo in dict(CajaChica.TIPOS_DOCUMENTO) else '',
+    }
+
+
+def filtrar_gastos(filtros):
+    gastos = CajaChica.objects.all()
+    if filtros.get('fecha_inicio'):
+        gastos = gastos.filter(fecha__gte=filtros['fecha_inicio'])
+    if filtros.get('fecha_fin'):
+        gastos = gastos.filter(fecha__lte=filtros['fecha_fin'])
+    if filtros.get('responsable'):
+        gastos = gastos.filter(responsable__icontains=filtros['responsable'])
+    if filtros.get('tipo'):
+        gastos = gastos.filter(tipo_documento=filtros['tipo'])
+    return gastos
+
+
+def describir_filtros(filtros):
+    partes = []
+    if filtros.get('fecha_inicio'):
+        partes.append(f"desde {filtros['fecha_inicio'].strftime('%d/%m/%Y')}")
+    if filtros.get('fecha_fin'):
+        partes.append(f"hasta {filtros['fecha_fin'].strftime('%d/%m/%Y')}")
+    if filtros.get('responsable'):
+        partes.append(f"responsable: {filtros['responsable']}")
+    if filtros.get('tipo'):
+        partes.append(f"tipo: {filtros['tipo']}")
+    return ", ".join(partes)
+
+
+# =========================================================
+# LISTADO (PAGINACIÓN POR CURSOR)
+# =========================================================
+def _leer_cursor(valor):
+    """'2025-03-01_154' -> (date, id). Un cursor mal formado se ignora."""
+    try:
+        fecha, pk = (valor or '').split('_', 1)
+        fecha = parse_date(fecha)
+        return (fecha, int(pk)) if fecha else None
+    except ValueError:
+        return None
+
+
+def _cursor(gasto):
+    return f"{gasto.fecha.isoformat()}_{gasto.pk}"
+
+
+def pagina_cursor(gastos, despues=None, antes=None, por_pagina=25):
+    """
+    Página del listado ordenada por (fecha, id) descendente.
+
+    En vez de OFFSET se filtra a partir del último registro visto, así la
+    página 500 cuesta lo mismo que la primera (usa cajachica_fecha_id_idx).
+    `despues` avanza hacia gastos más antiguos y `antes` retrocede.
+
+    Devuelve {'gastos', 'siguiente', 'anterior'} con los cursores o None.
+    """
+    despues, antes = _leer_cursor(despues), _leer_cursor(antes)
+
+    if antes:
+        fecha, pk = antes
+        bloque = list(
+            gastos.filter(Q(fecha__gt=fecha) | Q(fecha=fecha, id__gt=pk))
+                  .order_by('fecha', 'id')[:por_pagina + 1]
+        )
+        hay_mas = len(bloque) > por_pagina
+        filas = bloque[:por_pagina][::-1]
+        anterior = _cursor(filas[0]) if hay_mas and filas else None
+        siguiente = _cursor(filas[-1]) if filas else None
+    else:
+        if despues:
+            fecha, pk = despues
+            gastos = gastos.filter(Q(fecha__lt=fecha) | Q(fecha=fecha, id__lt=pk))
+        bloque = list(gastos.order_by('-fecha', '-id')[:por_pagina + 1])
+        hay_mas = len(bloque) > por_pagina
+        filas = bloque[:por_pagina]
+        siguiente = _cursor(filas[-1]) if hay_mas else None
+        anterior = _cursor(filas[0]) if despues and filas else None
+
+    return {'gastos': filas, 'siguiente': siguiente, 'anterior': anterior}
+
+
+def totales_gastos(gastos):
+    """Registros, monto e IVA recuperable del filtro en UNA consulta (requiere .con_iva())."""
+    totales = gastos.aggregate(registros=Count('id'), total_monto=Sum('monto'), total_iva=Sum('iva'))
+    return {
+        'registros': totales['registros'],
+        'total_monto': int(totales['total_monto'] or 0),
+        'total_iva': int(totales['total_iva'] or 0),
+    }
+
+
+def gastos_por_mes(gastos):
+    """(labels, data) del gráfico mensual, sobre el mismo filtro del listado."""
+    resumen = (
+        gastos.order_by()
+              .annotate(mes=TruncMonth('fecha'))
+              .values('mes')
+              .annotate(total=Sum('monto'))
+              .order_by('mes')
+    )
+    labels, data = [], []
+    for registro in resumen:
+        if registro['mes']:
+            labels.append(registro['mes'].strftime('%Y-%m'))
+            data.append(int(registro['total'] or 0))
+    return labels, data
+
+
+# =========================================================
+# CACHÉ EN DISCO
+# =========================================================
+def version_datos(gastos):
+    """
+    Huella de los datos filtrados en UNA consulta agregada.
+    Cambia si se crea, borra o edita cualquier gasto del rango.
+    """
+    huella = gastos.aggregate(
+        registros=Count('id'),
+        max_id=Max('id'),
+        total=Sum('monto'),
+        modificado=Max('fecha_modificacion'),
+    )
+    return {k: str(v) if v is not None else None for k, v in huella.items()}
+
+
+def clave_cache(filtros, version, usuario_id=None):
+    payload = json.dumps(
+        {'filtros': filtros, 'version': version, 'usuario': usuario_id},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _ruta_cache(clave, usuario_id, extension='pdf'):
+    """El dueño va en el nombre: con la clave de otro usuario no se llega a su archivo."""
+    return os.path.join(CACHE_DIR, f"caja_chica_{usuario_id or 0}_{clave}.{extension}")
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+def _guardar_atomico(ruta, contenido):
+    """Escribe a un temporal y renombra: ningún lector ve un PDF a medio escribir."""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contenido)
+        os.replace(tmp, ruta)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def limpiar_cache(max_archivos=MAX_ARCHIVOS_CACHE):
+    """Deja solo los `max_archivos` PDFs (y avisos de error) más recientes."""
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    archivos = [
+        os.path.join(CACHE_DIR, nombre)
+        for nombre in os.listdir(CACHE_DIR) if nombre.endswith(('.pdf', '.error'))
+    ]
+    archivos.sort(key=os.path.getmtime, reverse=True)
+    borrados = 0
+    for ruta in archivos[max_archivos:]:
+        try:
+            os.remove(ruta)
+            borrados += 1
+        except OSError:
+            pass
+    return borrados
+
+
+# =========================================================
+# POOL DE PROCESOS
+# =========================================================
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        return _pool
+
+
+def _reiniciar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _enviar_al_pool(html_string, datos, base_url):
+    """Encarga el render y devuelve el Future. Si el pool murió, se recrea una vez."""
+    for intento in range(2):
+        try:
+            return _obtener_pool().submit(renderizar_pdf, html_string, datos, base_url)
+        except BrokenProcessPool:
+            _reiniciar_pool()
+            if intento:
+                raise
+
+
+def _renderizar_en_pool(html_string, datos, base_url):
+    """Renderiza fuera del hilo del request. Si el pool murió, se recrea una vez."""
+    for intento in range(2):
+        try:
+            futuro = _obtener_pool().submit(renderizar_pdf, html_string, datos, base_url)
+            return futuro.result(timeout=PDF_TIMEOUT)
+        except BrokenProcessPool:
+            _reiniciar_pool()
+            if intento:
+                raise
+
+
+# =========================================================
+# REPORTE
+# =========================================================
+def paginar(filas, por_pagina=FILAS_POR_PAGINA):
+    """Agrupa las filas en páginas con subtotal y total acumulado (transporte)."""
+    paginas = []
+    acumulado = 0
+    for inicio in range(0, len(filas), por_pagina):
+        bloque = filas[inicio:inicio + por_pagina]
+        subtotal = sum(int(g['monto'] or 0) for g in bloque)
+        paginas.append({
+            'numero': len(paginas) + 1,
+            'gastos': bloque,
+            'subtotal': subtotal,
+            'transporte': acumulado,
+            'acumulado': acumulado + subtotal,
+        })
+        acumulado += subtotal
+    return paginas
+
+
+def _preparar(filtros, usuario):
+    """(gastos, clave, usuario_id): la clave depende de los filtros, la versión de los datos y el usuario."""
+    gastos = filtrar_gastos(filtros)
+    usuario_id = getattr(usuario, 'pk', None)
+    return gastos, clave_cache(filtros, version_datos(gastos), usuario_id), usuario_id
+
+
+def _contenido(gastos, filtros, usuario):
+    """(html_string, datos) para renderizar_pdf: HTML del template y su respaldo plano."""
+    filas = list(
+        gastos.order_by('-fecha', '-id')
+              .values('fecha', 'responsable', 'tipo_documento', 'descripcion', 'monto')
+              .iterator(chunk_size=2000)
+    )
+    total_gasto = sum(int(g['monto'] or 0) for g in filas)
+    fecha_emision = datetime.datetime.now()
+    nombre_usuario = f"{getattr(usuario, 'first_name', '')} {getattr(usuario, 'last_name', '')}".strip()
+    texto_filtros = describir_filtros(filtros)
+
+    context = {
+        'paginas': paginar(filas),
+        'total_registros': len(filas),
+        'total_gasto': total_gasto,
+        'fecha_emision': fecha_emision,
+        'usuario': usuario,
+        'empresa_nombre': "SAMKA / MAQUEHUE",
+        'filtros_texto': texto_filtros,
+    }
+    html_string = render_to_string('core/pdf/reporte_caja.html', context)
+
+    # Versión plana (solo tipos básicos) para el respaldo con reportlab
+    datos = {
+        'titulo': 'Rendición de Caja Chica',
+        'empresa_nombre': context['empresa_nombre'],
+        'fecha_emision': fecha_emision.strftime('%d/%m/%Y %H:%M'),
+        'usuario': nombre_usuario or getattr(usuario, 'username', ''),
+        'filtros': texto_filtros,
+        'filas': [
+            (g['fecha'].strftime('%d/%m/%Y'), g['responsable'], g['tipo_documento'], g['descripcion'], int(g['monto'] or 0))
+            for g in filas
+        ],
+        'total': total_gasto,
+    }
+    return html_string, datos
+
+
+def obtener_pdf_caja_chica(filtros, usuario, base_url=None):
+    """
+    Devuelve (ruta_pdf, desde_cache) esperando el render (comandos y pruebas).
+    Si ya existe un PDF para estos filtros y esta versión de los datos, no se renderiza nada.
+    """
+    gastos, clave, usuario_id = _preparar(filtros, usuario)
+    ruta = _ruta_cache(clave, usuario_id)
+    if os.path.exists(ruta):
+        return ruta, True
+
+    html_string, datos = _contenido(gastos, filtros, usuario)
+    pdf, _motor = _renderizar_en_pool(html_string, datos, base_url)
+    _guardar_atomico(ruta, pdf)
+    limpiar_cache()
+    return ruta, False
+
+
+# =========================================================
+# TRABAJOS EN SEGUNDO PLANO
+# =========================================================
+# La vista no espera al pool: encarga el PDF y responde 202 con la clave como id
+# del trabajo. El estado vive en disco junto al PDF (lo ven todos los workers), con
+# el id del dueño en el nombre: estado_pdf() solo encuentra los trabajos del usuario.
+#   .pendiente  marca creada con O_EXCL (un render por clave); vence a los PDF_TIMEOUT
+#   .error      mensaje del render fallido
+#   .pdf        listo para descargar
+def _marcar_pendiente(clave, usuario_id):
+    """True si este proceso toma el trabajo; False si otro ya lo está renderizando."""
+    ruta = _ruta_cache(clave, usuario_id, 'pendiente')
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for _ in range(2):
+        try:
+            os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(ruta) < PDF_TIMEOUT:
+                    return False
+            except OSError:
+                pass
+            _borrar(ruta)  # marca vencida: el render anterior murió o se colgó
+    return False
+
+
+def _terminar(clave, usuario_id, futuro):
+    """Callback del Future (hilo del pool): deja el PDF o el error y quita la marca."""
+    try:
+        pdf, _motor = futuro.result()
+        _guardar_atomico(_ruta_cache(clave, usuario_id), pdf)
+        limpiar_cache()
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            _reiniciar_pool()
+        _guardar_atomico(_ruta_cache(clave, usuario_id, 'error'), str(e).encode('utf-8'))
+    finally:
+        _borrar(_ruta_cache(clave, usuario_id, 'pendiente'))
+
+
+def solicitar_pdf_caja_chica(filtros, usuario, base_url=None):
+    """
+    Devuelve (clave, listo) sin esperar el render.
+    listo=True si el PDF ya está en disco; si no, queda encargado al pool y la
+    clave sirve para consultar estado_pdf() con el mismo usuario.
+    """
+    gastos, clave, usuario_id = _preparar(filtros, usuario)
+    if os.path.exists(_ruta_cache(clave, usuario_id)):
+        return clave, True
+    if not _marcar_pendiente(clave, usuario_id):
+        return clave, False
+
+    _borrar(_ruta_cache(clave, usuario_id, 'error'))  # se reintenta lo que falló antes
+    try:
+        html_string, datos = _contenido(gastos, filtros, usuario)
+        futuro = _enviar_al_pool(html_string, datos, base_url)
+    except Exception:
+        _borrar(_ruta_cache(clave, usuario_id, 'pendiente'))
+        raise
+    futuro.add_done_callback(functools.partial(_terminar, clave, usuario_id))
+    return clave, False
+
+
+def estado_pdf(clave, usuario):
+    """
+    ('listo', ruta) | ('error', mensaje) | ('pendiente', None) | (None, None).
+    None: clave desconocida, de otro usuario o render vencido; hay que volver a pedir el reporte.
+    """
+    usuario_id = getattr(usuario, 'pk', None)
+    ruta = _ruta_cache(clave, usuario_id)
+    if os.path.exists(ruta):
+        return 'listo', ruta
+    try:
+        with open(_ruta_cache(clave, usuario_id, 'error'), encoding='utf-8') as f:
+            return 'error', f.read()
+    except OSError:
+        pass
+    pendiente = _ruta_cache(clave, usuario_id, 'pendiente')
+    try:
+        if time.time() - os.path.getmtime(pendiente) < PDF_TIMEOUT:
+            return 'pendiente', None
+    except OSError:
+        pass
+    return None, None
@@ -0,0 +1,103 @@
+# core/reportes/motor.py
+"""
+Motor de renderizado PDF.
+
+Este módulo NO importa Django: sus funciones se ejecutan dentro de los procesos
+del pool de reportes, que no tienen el proyecto configurado.
+"""
+
+
+def formato_pesos(valor):
+    """Mismo formato que el filtro `dinero_hibrido`: 1.000.000"""
+    return f"{int(valor or 0):,}".replace(",", ".")
+
+
+def renderizar_pdf(html_string, datos, base_url=None):
+    """
+    Genera el PDF y devuelve (bytes, motor_usado).
+
+    Usa WeasyPrint con el HTML ya renderizado. Si la librería no está
+    instalada (o falta GTK en Windows), cae a reportlab usando los datos planos.
+    """
+    try:
+        from weasyprint import HTML
+    except (ImportError, OSError):
+        return renderizar_reportlab(datos), 'reportlab'
+
+    return HTML(string=html_string, base_url=base_url).write_pdf(), 'weasyprint'
+
+
+def renderizar_reportlab(datos):
+    """
+    Versión reportlab de la rendición.
+    `datos` = {titulo, empresa_nombre, fecha_emision, usuario, filtros, filas, total}
+    donde cada fila es (fecha, responsable, tipo_documento, descripcion, monto).
+    """
+    import io
+
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, Spacer, TableStyle
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4,
+        leftMargin=2 * cm, rightMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm,
+        title=datos.get('titulo', 'Rendición de Caja Chica'),
+    )
+    estilos = getSampleStyleSheet()
+    celda = estilos['BodyText']
+    celda.fontSize = 8
+    celda.leading = 10
+
+    elementos = [
+        Paragraph(datos.get('titulo', 'Rendición de Caja Chica').upper(), estilos['Title']),
+        Paragraph(datos.get('empresa_nombre', ''), estilos['Normal']),
+        Paragraph(
+            f"Fecha de Emisión: {datos.get('fecha_emision', '')} | Generado por: {datos.get('usuario', '')}",
+            estilos['Normal']
+        ),
+    ]
+    if datos.get('filtros'):
+        elementos.append(Paragraph(f"Filtros: {datos['filtros']}", estilos['Normal']))
+    elementos.append(Spacer(1, 0.5 * cm))
+
+    tabla = [['Fecha', 'Responsable', 'Tipo Doc.', 'Descripción / Detalle', 'Monto']]
+    for fecha, responsable, tipo, descripcion, monto in datos.get('filas', []):
+        tabla.append([
+            fecha,
+            Paragraph(str(responsable or '').title(), celda),
+            tipo or '',
+            Paragraph(str(descripcion or ''), celda),
+            f"${formato_pesos(monto)}",
+        ])
+    if len(tabla) == 1:
+        tabla.append(['', '', '', 'No hay movimientos registrados.', ''])
+
+    # LongTable + repeatRows: la cabecera se repite en cada página
+    t = LongTable(tabla, colWidths=[2.3 * cm, 3.4 * cm, 2.3 * cm, 6.5 * cm, 2.5 * cm], repeatRows=1)
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f2f2f2')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('LINEBELOW', (0, 0), (-1, 0), 1.5, colors.HexColor('#dddddd')),
+        ('LINEBELOW', (0, 1), (-1, -1), 0.5, colors.HexColor('#eeeeee')),
+        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    elementos.append(t)
+    elementos.append(Spacer(1, 0.5 * cm))
+    elementos.append(Paragraph(f"<b>TOTAL RENDICIÓN: ${formato_pesos(datos.get('total'))}</b>", estilos['Heading3']))
+
+    def _pie_pagina(canvas, documento):
+        canvas.saveState()
+        canvas.setFont('Helvetica', 8)
+        canvas.setFillColor(colors.HexColor('#666666'))
+        canvas.drawRightString(A4[0] - 2 * cm, 1.2 * cm, f"Pág {documento.page}")
+        canvas.restoreState()
+
+    doc.build(elementos, onFirstPage=_pie_pagina, onLaterPages=_pie_pagina)
+    return buffer.getvalue()
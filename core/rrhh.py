@@ -0,0 +1,346 @@
+# core/rrhh.py
+"""
+Analítica de dotación (RRHH) calculada en la base de datos.
+
+- Antigüedad: Trabajador.objects.con_antiguedad() la anota como intervalo en SQL;
+  aquí se agrupa por tramos (0-1 año, 1-3 años, ...) con un CASE.
+- Dotación mensual: altas y bajas agrupadas por mes (dos consultas) sobre un
+  calendario generado con pandas (se importa al primer uso); la dotación al cierre de cada mes es la
+  dotación inicial más el acumulado de altas menos bajas.
+- Rotación: dotación inicial/final, altas y bajas por empresa y cargo en UNA
+  consulta con conteos condicionales.
+- Operaciones masivas: finiquito / edición de muchos trabajadores con un solo
+  bulk_update dentro de una transacción, con vista previa y auditoría.
+
+Los resultados se guardan en el cache de Django con una clave que incluye la
+huella de los datos (version_datos), así que cualquier alta, edición o baja
+de un trabajador invalida el cache sin tener que borrarlo a mano.
+"""
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import rut as rut_util
+from .models import OperacionMasivaTrabajadores, Trabajador
+
+CACHE_SEGUNDOS = getattr(settings, 'RRHH_CACHE_SEGUNDOS', 600)
+
+# (desde, hasta) en años; hasta=None es "o más". Un año = 365,25 días.
+TRAMOS_ANTIGUEDAD = [
+    (0, 1, '0-1 año'),
+    (1, 3, '1-3 años'),
+    (3, 5, '3-5 años'),
+    (5, 10, '5-10 años'),
+    (10, None, '10+ años'),
+]
+
+# Dimensiones permitidas para la rotación -> (campo id, campo nombre)
+DIMENSIONES = {
+    'empresa': ('empresa_id', 'empresa__nombre'),
+    'cargo': ('cargo_id', 'cargo__nombre'),
+}
+
+
+def _anios(n):
+    return datetime.timedelta(days=round(365.25 * n))
+
+
+def _trabajadores(trabajadores):
+    # Sin fecha de contrato no hay antigüedad ni alta que contar
+    qs = Trabajador.objects.all() if trabajadores is None else trabajadores
+    return qs.filter(fecha_contrato__isnull=False)
+
+
+# =========================================================
+# CACHE
+# =========================================================
+def version_datos(trabajadores=None):
+    """Huella de los trabajadores en UNA consulta agregada (cambia con cualquier alta, edición o baja)."""
+    qs = Trabajador.objects.all() if trabajadores is None else trabajadores
+    huella = qs.aggregate(registros=Count('id'), max_id=Max('id'), modificado=Max('fecha_modificacion'))
+    return {k: str(v) if v is not None else None for k, v in huella.items()}
+
+
+def _cacheado(nombre, parametros, trabajadores, calcular):
+    filtro = str(trabajadores.query) if trabajadores is not None else None
+    payload = json.dumps(
+        {'parametros': parametros, 'filtro': filtro, 'version': version_datos(trabajadores)},
+        sort_keys=True, default=str
+    )
+    clave = f"rrhh:{nombre}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+    resultado = cache.get(clave)
+    if resultado is None:
+        resultado = calcular()
+        cache.set(clave, resultado, CACHE_SEGUNDOS)
+    return resultado
+
+
+# =========================================================
+# ANTIGÜEDAD
+# =========================================================
+def tramo_antiguedad():
+    """Expresión CASE que clasifica la anotación `antiguedad` en los TRAMOS_ANTIGUEDAD."""
+    return models.Case(
+        *[
+            models.When(antiguedad__lt=_anios(hasta), then=models.Value(etiqueta))
+            for _, hasta, etiqueta in TRAMOS_ANTIGUEDAD if hasta is not None
+        ],
+        default=models.Value(TRAMOS_ANTIGUEDAD[-1][2]),
+        output_field=models.CharField(),
+    )
+
+
+def distribucion_antiguedad(hoy=None, trabajadores=None, solo_activos=True, usar_cache=True):
+    """
+    [{'tramo': '0-1 año', 'activos': n, 'finiquitados': n, 'total': n}, ...] en el orden
+    de TRAMOS_ANTIGUEDAD (incluye tramos vacíos). Una consulta agrupada.
+    """
+    hoy = hoy or datetime.date.today()
+
+    def calcular():
+        qs = _trabajadores(trabajadores)
+        if solo_activos:
+            qs = qs.filter(fecha_finiquito__isnull=True)
+        filas = qs.con_antiguedad(hoy).order_by()\
+                  .annotate(tramo=tramo_antiguedad())\
+                  .values('tramo')\
+                  .annotate(
+                      activos=Count('id', filter=Q(fecha_finiquito__isnull=True)),
+                      finiquitados=Count('id', filter=Q(fecha_finiquito__isnull=False)),
+                  )
+        por_tramo = {f['tramo']: f for f in filas}
+        resultado = []
+        for _, _, etiqueta in TRAMOS_ANTIGUEDAD:
+            fila = por_tramo.get(etiqueta, {'activos': 0, 'finiquitados': 0})
+            resultado.append({
+                'tramo': etiqueta,
+                'activos': fila['activos'],
+                'finiquitados': fila['finiquitados'],
+                'total': fila['activos'] + fila['finiquitados'],
+            })
+        return resultado
+
+    if not usar_cache:
+        return calcular()
+    return _cacheado('antiguedad', {'hoy': hoy, 'solo_activos': solo_activos}, trabajadores, calcular)
+
+
+# =========================================================
+# DOTACIÓN MENSUAL
+# =========================================================
+def dotacion_mensual(desde, hasta, trabajadores=None, usar_cache=True):
+    """
+    Serie mensual entre `desde` y `hasta` (inclusive, se toman los meses completos):
+    [{'mes': date(1er día), 'altas': n, 'bajas': n, 'dotacion': n al cierre del mes}, ...]
+
+    Un trabajador cuenta en la dotación al cierre del mes si fue contratado hasta el
+    último día del mes y no tiene finiquito en ese mes o antes. Tres consultas:
+    dotación inicial, altas por mes y bajas por mes.
+    """
+    import pandas as pd
+
+    inicio = desde.replace(day=1)
+    fin = (pd.Timestamp(hasta) + pd.offsets.MonthEnd(0)).date()
+
+    def calcular():
+        qs = _trabajadores(trabajadores).order_by()
+        dotacion_inicial = qs.filter(fecha_contrato__lt=inicio)\
+                             .filter(Q(fecha_finiquito__isnull=True) | Q(fecha_finiquito__gte=inicio))\
+                             .count()
+        altas = {
+            f['mes']: f['total'] for f in
+            qs.filter(fecha_contrato__gte=inicio, fecha_contrato__lte=fin)
+              .annotate(mes=TruncMonth('fecha_contrato')).values('mes').annotate(total=Count('id'))
+        }
+        bajas = {
+            f['mes']: f['total'] for f in
+            qs.filter(fecha_finiquito__gte=inicio, fecha_finiquito__lte=fin)
+              .annotate(mes=TruncMonth('fecha_finiquito')).values('mes').annotate(total=Count('id'))
+        }
+
+        calendario = pd.DataFrame({'mes': pd.date_range(inicio, fin, freq='MS').date})
+        calendario['altas'] = calendario['mes'].map(altas).fillna(0).astype(int)
+        calendario['bajas'] = calendario['mes'].map(bajas).fillna(0).astype(int)
+        calendario['dotacion'] = dotacion_inicial + (calendario['altas'] - calendario['bajas']).cumsum()
+        return [
+            {'mes': fila.mes, 'altas': int(fila.altas), 'bajas': int(fila.bajas), 'dotacion': int(fila.dotacion)}
+            for fila in calendario.itertuples(index=False)
+        ]
+
+    if not usar_cache:
+        return calcular()
+    return _cacheado('dotacion', {'desde': inicio, 'hasta': fin}, trabajadores, calcular)
+
+
+# =========================================================
+# ROTACIÓN
+# =========================================================
+def rotacion(desde, hasta, por=('empresa', 'cargo'), trabajadores=None, usar_cache=True):
+    """
+    Rotación del período por las dimensiones de `por` ('empresa' y/o 'cargo'):
+    dotación inicial y final, altas, bajas y tasa = bajas / dotación promedio * 100.
+    Una consulta agrupada con conteos condicionales.
+    """
+    desconocidas = set(por) - set(DIMENSIONES)
+    if desconocidas:
+        raise ValueError(f"Dimensiones no soportadas: {', '.join(sorted(desconocidas))}.")
+    campos = [campo for dimension in por for campo in DIMENSIONES[dimension]]
+
+    def activo_en(dia):
+        return Q(fecha_contrato__lte=dia) & (Q(fecha_finiquito__isnull=True) | Q(fecha_finiquito__gt=dia))
+
+    def calcular():
+        filas = _trabajadores(trabajadores).order_by().values(*campos).annotate(
+            dotacion_inicial=Count('id', filter=activo_en(desde)),
+            dotacion_final=Count('id', filter=activo_en(hasta)),
+            altas=Count('id', filter=Q(fecha_contrato__gt=desde, fecha_contrato__lte=hasta)),
+            bajas=Count('id', filter=Q(fecha_finiquito__gt=desde, fecha_finiquito__lte=hasta)),
+        ).order_by(*campos[1::2])
+
+        resultado = []
+        for fila in filas:
+            if not any(fila[k] for k in ('dotacion_inicial', 'dotacion_final', 'altas', 'bajas')):
+                continue
+            promedio = (fila['dotacion_inicial'] + fila['dotacion_final']) / 2
+            fila['tasa_rotacion'] = round(fila['bajas'] / promedio * 100, 1) if promedio else None
+            resultado.append(fila)
+        return resultado
+
+    if not usar_cache:
+        return calcular()
+    return _cacheado('rotacion', {'desde': desde, 'hasta': hasta, 'por': list(por)}, trabajadores, calcular)
+
+
+# =========================================================
+# OPERACIONES MASIVAS
+# =========================================================
+CAMPOS_MASIVOS = ('fecha_finiquito', 'monto_finiquito', 'estado', 'cargo')
+MAX_PREVISUALIZACION = 50
+
+
+class OperacionInvalida(ValueError):
+    pass
+
+
+def seleccionar_trabajadores(empresa_id=None, cargo_id=None, solo_activos=False, ruts=None):
+    """
+    Trabajadores a los que se aplicará la operación, por filtro y/o lista de RUT.
+    Devuelve (queryset, ruts_no_encontrados).
+    """
+    qs = Trabajador.objects.all()
+    if empresa_id:
+        qs = qs.filter(empresa_id=empresa_id)
+    if cargo_id:
+        qs = qs.filter(cargo_id=cargo_id)
+    if solo_activos:
+        qs = qs.filter(fecha_finiquito__isnull=True)
+
+    no_encontrados = []
+    if ruts:
+        # Los RUT se guardan en forma canónica: una búsqueda por el índice único
+        canonicos = {}
+        for texto in ruts:
+            canonico = rut_util.normalizar(texto)
+            if canonico is None:
+                no_encontrados.append(texto)
+            else:
+                canonicos.setdefault(canonico, texto)
+        qs = qs.filter(rut__in=list(canonicos))
+        encontrados = set(qs.values_list('rut', flat=True))
+        no_encontrados += [texto for canonico, texto in canonicos.items() if canonico not in encontrados]
+    return qs.order_by('empresa', 'nombre'), no_encontrados
+
+
+def _valor(trabajador, campo):
+    return getattr(trabajador, Trabajador._meta.get_field(campo).attname)
+
+
+def _normalizar_cambios(cambios):
+    cambios = {c: v for c, v in cambios.items() if c in CAMPOS_MASIVOS}
+    if not cambios:
+        raise OperacionInvalida("No se indicó ningún cambio.")
+    if 'cargo' in cambios and isinstance(cambios['cargo'], models.Model):
+        cambios['cargo'] = cambios['cargo'].pk
+    return cambios
+
+
+def firma_seleccion(ids):
+    """Huella de los ids elegidos: si cambia entre la vista previa y la confirmación, no se aplica."""
+    return hashlib.sha256(','.join(str(i) for i in sorted(ids)).encode('utf-8')).hexdigest()[:16]
+
+
+def previsualizar_masivo(trabajadores, cambios, limite=MAX_PREVISUALIZACION):
+    """
+    Qué pasaría sin escribir nada:
+    {'cantidad', 'firma', 'filas': [{'trabajador', 'antes', 'despues'}] (hasta `limite`),
+     'conflictos': [ruts con finiquito anterior al contrato]}
+    """
+    cambios = _normalizar_cambios(cambios)
+    # Toda la selección como tuplas livianas; objetos completos solo para las filas a mostrar
+    seleccion = list(trabajadores.values_list('id', 'rut', 'fecha_contrato'))
+    conflictos = []
+    if cambios.get('fecha_finiquito'):
+        conflictos = [
+            rut for _, rut, contrato in seleccion if contrato and contrato > cambios['fecha_finiquito']
+        ]
+    filas = [
+        {
+            'trabajador': t,
+            'antes': {c: _valor(t, c) for c in cambios},
+            'despues': cambios,
+        }
+        for t in trabajadores.select_related('empresa', 'cargo')[:limite]
+    ]
+    return {
+        'cantidad': len(seleccion),
+        'firma': firma_seleccion(pk for pk, _, _ in seleccion),
+        'filas': filas,
+        'conflictos': conflictos,
+    }
+
+
+def aplicar_masivo(trabajadores, cambios, usuario=None, criterio=None, firma=None):
+    """
+    Aplica `cambios` a todos los trabajadores en un bulk_update dentro de una
+    transacción (filas bloqueadas con SELECT ... FOR UPDATE) y deja la auditoría.
+    Si se entrega `firma` y la selección cambió desde la vista previa, no aplica nada.
+    """
+    cambios = _normalizar_cambios(cambios)
+    campos = list(cambios)
+
+    with transaction.atomic():
+        lista = list(trabajadores.select_for_update().only('id', 'rut', 'fecha_contrato', *campos))
+        if not lista:
+            raise OperacionInvalida("La selección no tiene trabajadores.")
+        if firma is not None and firma != firma_seleccion(t.id for t in lista):
+            raise OperacionInvalida("La selección cambió desde la vista previa; revísela de nuevo.")
+        if cambios.get('fecha_finiquito'):
+            conflictos = [t.rut for t in lista if t.fecha_contrato and t.fecha_contrato > cambios['fecha_finiquito']]
+            if conflictos:
+                raise OperacionInvalida(f"Finiquito anterior al contrato: {', '.join(conflictos[:10])}.")
+
+        ahora = timezone.now()
+        detalle = []
+        for t in lista:
+            detalle.append({'id': t.id, 'rut': t.rut, 'antes': {c: _valor(t, c) for c in campos}})
+            for campo, valor in cambios.items():
+                setattr(t, Trabajador._meta.get_field(campo).attname, valor)
+            # bulk_update no dispara auto_now: lo marcamos a mano para invalidar el cache
+            t.fecha_modificacion = ahora
+        Trabajador.objects.bulk_update(lista, campos + ['fecha_modificacion'], batch_size=500)
+
+        return OperacionMasivaTrabajadores.objects.create(
+            usuario=usuario,
+            accion='FINIQUITO' if cambios.get('fecha_finiquito') else 'EDICION',
+            criterio=criterio or {},
+            cambios=cambios,
+            cantidad=len(lista),
+            detalle=detalle,
+        )
@@ -0,0 +1,123 @@
+# core/rut.py
+"""
+RUT chileno: validación, forma canónica y formato de despliegue.
+
+Forma canónica (la que se guarda en la base y se usa para buscar):
+    cuerpo sin puntos ni ceros a la izquierda + '-' + dígito verificador en mayúscula
+    ' 12.345.678-k ' -> '12345678-K'
+
+Hay dos APIs con las mismas reglas:
+- normalizar(rut): un valor (formularios, login, save). Memoizada: el login y las
+  importaciones repiten mucho los mismos RUT.
+- normalizar_serie(serie): columna completa de un DataFrame, con el dígito
+  verificador calculado en NumPy (importaciones y migraciones). NumPy y pandas
+  se importan ahí adentro: formularios, login y save() no los necesitan.
+"""
+import math
+import re
+from functools import lru_cache
+
+# Pesos del módulo 11 para un cuerpo de 9 dígitos (de izquierda a derecha)
+PESOS = (4, 3, 2, 7, 6, 5, 4, 3, 2)
+MAX_DIGITOS = 9
+# 11 - (suma % 11) -> dígito verificador (índice 0 no se usa)
+_DV = ('', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'K', '0')
+
+
+# 'Tiene forma de RUT': dígitos (con o sin puntos), guion y dígito verificador
+_FORMA_RUT = re.compile(r'\s*[\d.]+-[\dkK]\s*')
+
+
+class RutInvalido(ValueError):
+    pass
+
+
+def _a_texto(valor):
+    """Excel entrega los RUT sin guion como 123456789.0"""
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor)
+
+
+def calcular_dv(cuerpo):
+    suma = 0
+    multiplo = 2
+    for c in reversed(str(int(cuerpo))):
+        suma += int(c) * multiplo
+        multiplo = 2 if multiplo == 7 else multiplo + 1
+    return _DV[11 - (suma % 11)]
+
+
+@lru_cache(maxsize=65536)
+def _normalizar(texto):
+    limpio = ''.join(c for c in texto.upper() if c.isdigit() or c == 'K')
+    cuerpo, dv = limpio[:-1].lstrip('0'), limpio[-1:]
+    if not cuerpo.isdigit() or len(cuerpo) > MAX_DIGITOS:
+        return None
+    return f"{cuerpo}-{dv}" if calcular_dv(cuerpo) == dv else None
+
+
+def normalizar(rut):
+    """Forma canónica '12345678-9', o None si el RUT no es válido."""
+    return _normalizar(_a_texto(rut))
+
+
+def es_valido(rut):
+    return normalizar(rut) is not None
+
+
+def parece_rut(texto):
+    """
+    True si el texto está escrito como RUT ('12.345.678-9', '12345678-k').
+    Para nombres de usuario: 'admin' o '2024' no se tocan aunque sus dígitos
+    pudieran formar un RUT válido.
+    """
+    return bool(texto) and _FORMA_RUT.fullmatch(str(texto)) is not None and es_valido(texto)
+
+
+def validar(rut):
+    """Como normalizar, pero lanza RutInvalido (para formularios)."""
+    canonico = normalizar(rut)
+    if canonico is None:
+        raise RutInvalido(f"RUT inválido: '{rut}'.")
+    return canonico
+
+
+def formatear(rut):
+    """'12345678-9' -> '12.345.678-9'. Si no es válido lo devuelve tal cual."""
+    canonico = normalizar(rut)
+    if canonico is None:
+        return rut
+    cuerpo, dv = canonico.split('-')
+    return f"{int(cuerpo):,}".replace(',', '.') + f"-{dv}"
+
+
+def normalizar_serie(serie):
+    """
+    Versión vectorizada de normalizar() para una columna completa.
+    Devuelve una Series alineada con la original: RUT canónico o None.
+    """
+    import numpy as np
+    import pandas as pd
+
+    serie = pd.Series(serie, dtype=object)
+    limpio = serie.map(_a_texto).str.upper().str.replace(r'[^0-9K]', '', regex=True)
+    cuerpo = limpio.str[:-1].str.lstrip('0')
+    dv = limpio.str[-1:]
+    forma_ok = cuerpo.str.fullmatch(r'\d{1,%d}' % MAX_DIGITOS).fillna(False).to_numpy(dtype=bool)
+
+    resultado = pd.Series([None] * len(serie), index=serie.index, dtype=object)
+    if not forma_ok.any():
+        return resultado
+
+    # Dígitos como matriz (n x 9) sin pasar por Python fila a fila
+    digitos = cuerpo[forma_ok].str.zfill(MAX_DIGITOS)
+    matriz = np.frombuffer(''.join(digitos).encode('ascii'), dtype=np.uint8).reshape(-1, MAX_DIGITOS) - ord('0')
+    dv_calculado = np.array(_DV)[11 - (matriz @ np.array(PESOS)) % 11]
+
+    validos = dv_calculado == dv[forma_ok].to_numpy(dtype=str)
+    indices = serie.index[forma_ok][validos]
+    resultado.loc[indices] = (cuerpo.loc[indices] + '-' + dv.loc[indices]).to_numpy()
+    return resultado
@@ -1,23 +1,105 @@
 # core/services.py
 import json
-from django.db.models import Sum, Avg
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q, Sum, Avg
 from django.db.models.functions import TruncDay, TruncMonth
+from django.utils.dateparse import parse_date
+from . import archivo
 from .models import Ingreso # <--- Verifica que esta línea exista
+from .particiones import rango_periodo
+
+
+def filtros_ingresos(params):
+    """Filtros del listado de ingresos desde request.GET (los valores inválidos se ignoran)."""
+    def _id(nombre):
+        valor = (params.get(nombre) or '').strip()
+        return int(valor) if valor.isdigit() else None
+
+    def _fecha(nombre):
+        try:
+            return parse_date(params.get(nombre) or '')
+        except ValueError:
+            return None
+
+    def _monto(nombre):
+        try:
+            valor = Decimal(params.get(nombre) or '')
+        except InvalidOperation:
+            return None
+        return valor if valor.is_finite() else None
+
+    return {
+        'q': (params.get('q') or '').strip(),
+        'empresa': _id('empresa'),
+        'centro': _id('centro'),
+        'clasificacion': _id('clasificacion'),
+        'revision': bool(params.get('revision')),
+        'fecha_inicio': _fecha('fecha_inicio'),
+        'fecha_fin': _fecha('fecha_fin'),
+        'min_costo': _monto('min_costo'),
+        'max_costo': _monto('max_costo'),
+    }
+
+
+def filtrar_ingresos(filtros, queryset=None):
+    ingresos = Ingreso.objects.all() if queryset is None else queryset
+    if filtros.get('q'):
+        q = filtros['q']
+        ingresos = ingresos.filter(
+            Q(descripcion_movimiento__icontains=q) |
+            Q(detalle__icontains=q) |
+            Q(empresa__nombre__icontains=q)
+        )
+    if filtros.get('empresa'):
+        ingresos = ingresos.filter(empresa_id=filtros['empresa'])
+    if filtros.get('centro'):
+        ingresos = ingresos.filter(centro_costo_id=filtros['centro'])
+    if filtros.get('clasificacion'):
+        ingresos = ingresos.filter(clasificacion_id=filtros['clasificacion'])
+    if filtros.get('revision'):
+        # Clasificados por la IA con baja confianza
+        ingresos = ingresos.filter(requiere_revision=True)
+    # Comparaciones directas sobre fecha: Postgres descarta las particiones fuera del rango
+    if filtros.get('fecha_inicio'):
+        ingresos = ingresos.filter(fecha__gte=filtros['fecha_inicio'])
+    if filtros.get('fecha_fin'):
+        ingresos = ingresos.filter(fecha__lte=filtros['fecha_fin'])
+    if filtros.get('min_costo') is not None:
+        ingresos = ingresos.filter(monto_transferencia__gte=filtros['min_costo'])
+    if filtros.get('max_costo') is not None:
+        ingresos = ingresos.filter(monto_transferencia__lte=filtros['max_costo'])
+    return ingresos
+
 
 class DashboardService:
     def __init__(self, anio=None, mes=None):
         self.anio = anio
         self.mes = mes
         self.queryset = Ingreso.objects.all().order_by('fecha')
+        self.archivado = None  # año archivado (core/archivo.py): DataFrame del archivo + filas vivas del rango
         self._aplicar_filtros()
 
     def _aplicar_filtros(self):
-        if self.anio:
-            self.queryset = self.queryset.filter(fecha__year=self.anio)
-        if self.mes:
+        # Rango de fechas (no __month): usa el índice y solo lee la partición del año
+        rango = rango_periodo(self.anio, self.mes) if self.anio else None
+        if rango:
+            self.queryset = self.queryset.filter(fecha__gte=rango[0], fecha__lt=rango[1])
+            if archivo.esta_archivado(self.anio):
+                self.archivado = archivo.leer('ingreso', *rango, con_vivos=True)
+                self.archivado['monto_transferencia'] = self.archivado['monto_transferencia'].fillna(0).astype('int64')
+        elif self.mes:
             self.queryset = self.queryset.filter(fecha__month=self.mes)
 
     def obtener_kpis(self):
+        if self.archivado is not None:
+            montos = self.archivado['monto_transferencia']
+            return {
+                'total_monto': int(montos.sum()),
+                'total_registros': len(montos),
+                'promedio_monto': int(montos.mean()) if len(montos) else 0,
+            }
+
         total_monto = self.queryset.aggregate(Sum('monto_transferencia'))['monto_transferencia__sum'] or 0
         total_registros = self.queryset.count()
         promedio = int(self.queryset.aggregate(Avg('monto_transferencia'))['monto_transferencia__avg'] or 0)
@@ -28,7 +110,30 @@ class DashboardService:
             'promedio_monto': promedio
         }
 
+    def _graficos_archivado(self):
+        import pandas as pd
+
+        df = self.archivado
+        por_empresa = df.groupby('empresa__nombre', dropna=False)['monto_transferencia'].sum().nlargest(10)
+        por_clasif = df.groupby('clasificacion__nombre', dropna=False)['monto_transferencia'].sum().sort_values(ascending=False)
+        periodo = pd.to_datetime(df['fecha'])
+        if not self.mes:
+            periodo = periodo.dt.to_period('M').dt.to_timestamp()
+        evolucion = df['monto_transferencia'].groupby(periodo).sum()
+        fmt = "%d/%m" if self.mes else "%b %Y"
+        return {
+            'labels_empresas': json.dumps([None if pd.isna(n) else n for n in por_empresa.index]),
+            'data_empresas': json.dumps([int(t) for t in por_empresa]),
+            'labels_clasificacion': json.dumps(["Sin Clasif." if pd.isna(n) else n for n in por_clasif.index]),
+            'data_clasificacion': json.dumps([int(t) for t in por_clasif]),
+            'labels_evolucion': json.dumps([p.strftime(fmt) for p in evolucion.index]),
+            'data_evolucion': json.dumps([int(t) for t in evolucion]),
+        }
+
     def obtener_datos_graficos(self):
+        if self.archivado is not None:
+            return self._graficos_archivado()
+
         # A. Por Empresa
         gastos_empresa = self.queryset.values('empresa__nombre').annotate(total=Sum('monto_transferencia')).order_by('-total')[:10]
         
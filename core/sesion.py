@@ -0,0 +1,95 @@
+# core/sesion.py
+"""
+Grupos del usuario guardados en la sesión.
+
+En cada petición autenticada Django ya lee la sesión y carga auth_user. Los grupos
+(es_finanzas / es_rrhh / es_bodega, has_group del menú) eran consultas extra,
+varias por página. Aquí se leen una vez, quedan en la sesión y el middleware los
+deja en request.user.grupos_sesion.
+
+Se vuelven a leer cuando:
+- pasan SESION_CONTEXTO_SEGUNDOS (red de seguridad)
+- cambia la versión del usuario en el cache: la renuevan las señales de models.py
+  al cambiar sus grupos (o al renombrar / borrar uno), así el cambio se ve en la
+  petición siguiente.
+
+La versión solo sirve si todos los workers ven el mismo cache. Con un cache por
+proceso (LocMemCache, el de por defecto sin REDIS_URL) los otros workers no se
+enterarían de que a alguien le quitaron un grupo: ahí el middleware no hace nada
+y grupos_de() consulta los grupos solo en las páginas que los usan.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+CLAVE_SESION = '_contexto_usuario'
+SEGUNDOS = getattr(settings, 'SESION_CONTEXTO_SEGUNDOS', 300)
+CACHES_POR_PROCESO = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_compartido():
+    return settings.CACHES['default']['BACKEND'] not in CACHES_POR_PROCESO
+
+
+def _clave_version(user_id):
+    return f'sesion:version:{user_id}'
+
+
+def invalidar(user_id):
+    """Las sesiones abiertas del usuario releen sus grupos en su próxima petición."""
+    cache.set(_clave_version(user_id), uuid.uuid4().hex, None)
+
+
+def cargar(user, version=None):
+    """Una consulta: nombres de los grupos."""
+    return {
+        'user_id': user.pk,
+        'version': version,
+        'cargado': time.time(),
+        'grupos': sorted(user.groups.values_list('name', flat=True)),
+    }
+
+
+def guardar_en_sesion(request, user):
+    """Al iniciar sesión: la sesión se escribe igual, así que el contexto viaja gratis."""
+    if not cache_compartido():
+        return
+    request.session[CLAVE_SESION] = cargar(user, cache.get(_clave_version(user.pk)))
+
+
+def contexto(request):
+    """Solo con cache compartido (el middleware no lo llama si no)."""
+    user = request.user
+    datos = request.session.get(CLAVE_SESION)
+    version = cache.get(_clave_version(user.pk))
+    if (not datos or datos.get('user_id') != user.pk or datos.get('version') != version
+            or time.time() - datos.get('cargado', 0) > SEGUNDOS):
+        datos = cargar(user, version)
+        request.session[CLAVE_SESION] = datos
+    return datos
+
+
+def grupos_de(user):
+    """Nombres de los grupos del usuario: de la sesión si pasó por el middleware; si no, una consulta."""
+    grupos = getattr(user, 'grupos_sesion', None)
+    if grupos is None:
+        grupos = user.grupos_sesion = frozenset(user.groups.values_list('name', flat=True))
+    return grupos
+
+
+class ContextoUsuarioMiddleware:
+    """Va después de AuthenticationMiddleware. Sin cache compartido no hace nada."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and cache_compartido():
+            user.grupos_sesion = frozenset(contexto(request)['grupos'])
+        return self.get_response(request)
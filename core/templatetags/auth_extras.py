@@ -1,5 +1,6 @@
 from django import template
-from django.contrib.auth.models import Group
+
+from core.sesion import grupos_de
 
 register = template.Library()
 
@@ -9,4 +10,6 @@ def has_group(user, group_name):
     if user.is_superuser:
         return True
 
-    # Si el usuario pertenece al grupo solicitado devuelve True
\ No newline at end of file
+    # Si el usuario pertenece al grupo solicitado devuelve True
+    # (los grupos vienen de la sesión, ver core/sesion.py: sin consulta por cada menú)
+    return group_name in grupos_de(user)
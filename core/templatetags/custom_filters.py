@@ -1,5 +1,7 @@
 from django import template
 
+from core import rut as rut_util
+
 register = template.Library()
 
 @register.filter
@@ -18,4 +20,9 @@ def dinero_hibrido(valor):
     # Truco infalible: 
     # 1. Formateamos con comas (estándar python): "1,000,000"
     # 2. Reemplazamos todas las comas por puntos: "1.000.000"
-    return f"{entero:,}".replace(",", ".")
\ No newline at end of file
+    return f"{entero:,}".replace(",", ".")
+
+@register.filter
+def rut_formato(valor):
+    """RUT canónico '12345678-9' -> '12.345.678-9' (solo para mostrar)."""
+    return rut_util.formatear(valor)
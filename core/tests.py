@@ -1,13 +1,38 @@
 # core/tests.py
 from decimal import Decimal
-from django.test import TestCase, Client
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
 from django.utils import timezone
 import datetime
+import importlib
+import io
+import json
+import os
+import tempfile
+from unittest import mock
 
-from .models import Ingreso, Empresa, CentroCosto, Clasificacion
-from .services import DashboardService
+import numpy as np
+import pandas as pd
+
+from .forms import RegistroUsuarioForm
+from .models import (
+    Ingreso, Empresa, CentroCosto, Clasificacion, CajaChica, Producto, Lote,
+    AlertaVencimiento, MovimientoStock, CorteStock, Trabajador, Cargo, OperacionMasivaTrabajadores, Perfil, Egreso,
+    Movimiento, Conciliacion, PosibleDuplicado
+)
+from . import almacen_ia, archivo, backends, conciliacion, duplicados, ia, impuestos, particiones, pivot, rrhh, rut, sesion
+from .services import DashboardService, filtros_ingresos
+from .alertas import despachar_alertas
+from .inventario import StockInsuficiente, crear_corte, descontar_fifo, ingresar_lotes_masivo, stock_en_fecha
+from .reportes import caja_chica as reporte_caja
+from .reportes.motor import renderizar_reportlab
 
 class CalculosFinancierosTest(TestCase):
     def setUp(self):
@@ -78,4 +103,1158 @@ class CalculosFinancierosTest(TestCase):
         response = client.get(reverse('dashboard'))
         self.assertEqual(response.status_code, 200)
         # Verificamos que use el template correcto
-        self.assertTemplateUsed(response, 'core/dashboard.html')
\ No newline at end of file
+        self.assertTemplateUsed(response, 'core/dashboard.html')
+
+class ReporteCajaChicaTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='finanzas', password='password123')
+        for i in range(5):
+            CajaChica.objects.create(
+                fecha=datetime.date(2025, 3, 1) + datetime.timedelta(days=i),
+                monto=1000 * (i + 1),
+                responsable='Ana' if i % 2 else 'Luis',
+                descripcion=f'Gasto {i}',
+            )
+        self.cache_dir = tempfile.mkdtemp()
+
+    def test_filtros_fecha_y_responsable(self):
+        filtros = reporte_caja.filtros_desde_request({'fecha_inicio': '2025-03-02', 'responsable': 'ana'})
+        gastos = reporte_caja.filtrar_gastos(filtros)
+        self.assertEqual(gastos.count(), 2)
+
+    def test_pdf_cacheado_hasta_que_cambian_los_datos(self):
+        filtros = reporte_caja.filtros_desde_request({})
+        with mock.patch.object(reporte_caja, 'CACHE_DIR', self.cache_dir), \
+             mock.patch.object(reporte_caja, '_renderizar_en_pool', return_value=(b'%PDF-1.4', 'test')) as render:
+            ruta, desde_cache = reporte_caja.obtener_pdf_caja_chica(filtros, self.user)
+            self.assertFalse(desde_cache)
+
+            ruta_2, desde_cache = reporte_caja.obtener_pdf_caja_chica(filtros, self.user)
+            self.assertTrue(desde_cache)
+            self.assertEqual(ruta, ruta_2)
+
+            gasto = CajaChica.objects.last()
+            gasto.descripcion = 'Editado'
+            gasto.save()
+            ruta_3, desde_cache = reporte_caja.obtener_pdf_caja_chica(filtros, self.user)
+            self.assertFalse(desde_cache)
+            self.assertNotEqual(ruta, ruta_3)
+
+        self.assertEqual(render.call_count, 2)
+
+    def test_exportar_no_espera_el_render(self):
+        from concurrent.futures import Future
+
+        self.client.force_login(self.user)
+        url = reverse('exportar_caja_chica_pdf')
+        futuro = Future()
+        with mock.patch.object(reporte_caja, 'CACHE_DIR', self.cache_dir), \
+             mock.patch.object(reporte_caja, '_enviar_al_pool', return_value=futuro) as enviar:
+            respuesta = self.client.get(url, {'modo_ajax': 1})
+            self.assertEqual(respuesta.status_code, 202)
+            descarga = respuesta.json()['url']
+
+            # Un segundo pedido mientras se renderiza no encarga otro
+            self.assertEqual(self.client.get(url).status_code, 202)
+            self.assertEqual(self.client.get(descarga).status_code, 202)
+            self.assertEqual(enviar.call_count, 1)
+
+            futuro.set_result((b'%PDF-1.4', 'test'))
+            respuesta = self.client.get(descarga)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(b''.join(respuesta.streaming_content), b'%PDF-1.4')
+            respuesta.close()
+            # Con el id del trabajo, otro usuario no llega al PDF
+            otro = Client()
+            otro.force_login(User.objects.create_user(username='otro', password='password123'))
+            self.assertEqual(otro.get(descarga).status_code, 404)
+            # Con el PDF en disco la exportación lo entrega directamente
+            respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            respuesta.close()
+
+            fallido = Future()
+            enviar.return_value = fallido
+            descarga = self.client.get(url, {'responsable': 'ana', 'modo_ajax': 1}).json()['url']
+            fallido.set_exception(RuntimeError('sin fuentes'))
+            self.assertEqual(self.client.get(descarga).status_code, 500)
+
+        self.assertEqual(self.client.get(reverse('descargar_caja_chica_pdf', args=['0' * 64])).status_code, 404)
+
+    def test_paginacion_por_cursor_recorre_todo_sin_repetir(self):
+        # Dos gastos el mismo día: el id desempata el orden
+        CajaChica.objects.create(fecha=datetime.date(2025, 3, 3), monto=500, responsable='Ana', descripcion='Extra')
+        gastos = reporte_caja.filtrar_gastos({}).con_iva()
+        vistos, cursor = [], None
+        while True:
+            pagina = reporte_caja.pagina_cursor(gastos, despues=cursor, por_pagina=2)
+            vistos += [g.pk for g in pagina['gastos']]
+            cursor = pagina['siguiente']
+            if not cursor:
+                break
+        esperado = list(CajaChica.objects.order_by('-fecha', '-id').values_list('pk', flat=True))
+        self.assertEqual(vistos, esperado)
+
+        # Volver desde la última página entrega la penúltima
+        anterior = reporte_caja.pagina_cursor(gastos, antes=pagina['anterior'], por_pagina=2)
+        self.assertEqual([g.pk for g in anterior['gastos']], esperado[2:4])
+
+    def test_iva_y_totales_en_sql(self):
+        CajaChica.objects.create(fecha=datetime.date(2025, 3, 9), monto=1190, responsable='Ana',
+                                 descripcion='Peaje', tipo_documento='PEAJE')
+        gastos = reporte_caja.filtrar_gastos({}).con_iva()
+        for gasto in gastos:
+            sin_anotar = CajaChica.objects.get(pk=gasto.pk)
+            self.assertEqual(gasto.iva_recuperable, sin_anotar.iva_recuperable)
+
+        with self.assertNumQueries(1):
+            totales = reporte_caja.totales_gastos(gastos)
+        self.assertEqual(totales['registros'], 6)
+        self.assertEqual(totales['total_monto'], 16190)
+        self.assertEqual(totales['total_iva'], sum(g.iva_recuperable for g in CajaChica.objects.all()))
+
+    def test_respaldo_reportlab(self):
+        datos = {'filas': [('01/03/2025', 'Ana', 'BOLETA', 'Café', 1190)], 'total': 1190}
+        pdf = renderizar_reportlab(datos)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+
+class AlertasVencimientoTest(TestCase):
+    """Usa el backend locmem que Django activa en los tests (mail.outbox)."""
+
+    def setUp(self):
+        self.hoy = datetime.date(2025, 6, 1)
+        for i, nombre in enumerate(['ana', 'luis', 'sin_alertas']):
+            user = User.objects.create_user(username=nombre, password='password123', email=f'{nombre}@test.cl')
+            perfil = Perfil.para(user)
+            perfil.recibir_alertas_stock = nombre != 'sin_alertas'
+            perfil.save()
+
+        leche = Producto.objects.create(codigo='L1', nombre='Leche', categoria='lacteos')
+        pan = Producto.objects.create(codigo='P1', nombre='Pan', categoria='panaderia')
+        Lote.objects.create(producto=leche, numero_lote='A', fecha_vencimiento=self.hoy - datetime.timedelta(days=2), cantidad=5)
+        Lote.objects.create(producto=leche, numero_lote='B', fecha_vencimiento=self.hoy + datetime.timedelta(days=10), cantidad=5)
+        Lote.objects.create(producto=pan, numero_lote='C', fecha_vencimiento=self.hoy + datetime.timedelta(days=20), cantidad=3)
+        Lote.objects.create(producto=pan, numero_lote='D', fecha_vencimiento=self.hoy + datetime.timedelta(days=90), cantidad=3)
+
+    def test_un_correo_por_suscrito_y_consultas_acotadas(self):
+        # lotes + ya enviados + destinatarios + registro de envíos
+        with self.assertNumQueries(4):
+            resumen = despachar_alertas(hoy=self.hoy)
+
+        self.assertEqual(resumen['lotes'], 3)
+        self.assertEqual(resumen['vencidos'], 1)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['ana@test.cl', 'luis@test.cl'])
+        html = mail.outbox[0].alternatives[0][0]
+        self.assertIn('Lacteos', html)
+        self.assertIn('Panaderia', html)
+
+    def test_no_repite_alertas_ya_enviadas(self):
+        despachar_alertas(hoy=self.hoy)
+        mail.outbox = []
+
+        resumen = despachar_alertas(hoy=self.hoy)
+        self.assertEqual(resumen['lotes'], 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+        # El lote B pasa a VENCIDO: es un estado nuevo y se vuelve a avisar
+        resumen = despachar_alertas(hoy=self.hoy + datetime.timedelta(days=11))
+        self.assertEqual(resumen['vencidos'], 1)
+        self.assertEqual(AlertaVencimiento.objects.count(), 4)
+
+    def test_comando_programado(self):
+        call_command('enviar_alertas_vencimiento', fecha=self.hoy, stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class SemaforoLotesTest(TestCase):
+    def setUp(self):
+        self.hoy = datetime.date(2025, 6, 1)
+        leche = Producto.objects.create(codigo='L1', nombre='Leche', categoria='lacteos')
+        pan = Producto.objects.create(codigo='P1', nombre='Pan', categoria='panaderia')
+        Lote.objects.create(producto=leche, numero_lote='A', fecha_vencimiento=self.hoy - datetime.timedelta(days=1), cantidad=5)
+        Lote.objects.create(producto=leche, numero_lote='B', fecha_vencimiento=self.hoy + datetime.timedelta(days=30), cantidad=7)
+        Lote.objects.create(producto=pan, numero_lote='C', fecha_vencimiento=self.hoy + datetime.timedelta(days=31), cantidad=3)
+
+    def test_con_estado_calcula_en_sql(self):
+        lotes = {l.numero_lote: l for l in Lote.objects.con_estado(self.hoy)}
+        self.assertEqual(lotes['A'].estado_vencimiento, 'VENCIDO')
+        self.assertEqual(lotes['A'].dias_para_vencer, -1)
+        self.assertEqual(lotes['B'].estado_vencimiento, 'POR_VENCER')
+        self.assertEqual(lotes['C'].estado_vencimiento, 'OK')
+        self.assertEqual(Lote.objects.en_estado('por_vencer', self.hoy).count(), 1)
+
+    def test_resumen_por_categoria_una_consulta(self):
+        with self.assertNumQueries(1):
+            resumen = {r['producto__categoria']: r for r in Lote.objects.resumen_por_categoria(self.hoy)}
+        self.assertEqual(resumen['Lacteos']['vencidos'], 1)
+        self.assertEqual(resumen['Lacteos']['por_vencer'], 1)
+        self.assertEqual(resumen['Lacteos']['total_stock'], 12)
+        self.assertEqual(resumen['Panaderia']['ok'], 1)
+
+
+class CargaMasivaLotesTest(TestCase):
+    def setUp(self):
+        Producto.objects.create(codigo='L1', nombre='Leche', categoria='Lacteos')
+
+    def test_carga_con_productos_nuevos_y_errores_por_fila(self):
+        filas = [
+            {'codigo': 'L1', 'numero_lote': 'A', 'fecha_vencimiento': '2025-07-01', 'cantidad': 10},
+            {'codigo': 'Q9', 'nombre': 'Queso', 'categoria': '  quesos maduros', 'numero_lote': 'B',
+             'fecha_vencimiento': '01/08/2025', 'cantidad': '5'},
+            {'codigo': 'Q9', 'numero_lote': 'C', 'fecha_vencimiento': '2025-09-01', 'cantidad': 1},
+            {'codigo': 'X1', 'numero_lote': 'D', 'fecha_vencimiento': '2025-07-01', 'cantidad': 1},
+            {'codigo': 'L1', 'numero_lote': 'E', 'fecha_vencimiento': 'mañana', 'cantidad': 1},
+            # Más largo que el campo: error de la fila, no DataError de toda la carga en PostgreSQL
+            {'codigo': 'P' * 51, 'nombre': 'Pan', 'numero_lote': 'F', 'fecha_vencimiento': '2025-07-01', 'cantidad': 1},
+            {'codigo': 'P1', 'nombre': 'Pan' * 70, 'numero_lote': 'G', 'fecha_vencimiento': '2025-07-01', 'cantidad': 1},
+        ]
+        # in_bulk + bulk_create productos + releer productos + bulk_create lotes
+        # + bulk_create movimientos (+ savepoint)
+        with self.assertNumQueries(7):
+            resultado = ingresar_lotes_masivo(filas)
+
+        self.assertEqual(resultado['creados'], 3)
+        self.assertEqual(resultado['productos_creados'], 1)
+        self.assertEqual([e['fila'] for e in resultado['errores']], [4, 5, 6, 7])
+        self.assertIn('50 caracteres', resultado['errores'][2]['error'])
+
+        # productos_creados cuenta lo que quedó en la tabla, no lo que se intentó insertar
+        with mock.patch.object(Producto.objects, 'bulk_create', return_value=[]):
+            resultado = ingresar_lotes_masivo([{'codigo': 'Z1', 'nombre': 'Yogur', 'numero_lote': 'H',
+                                                'fecha_vencimiento': '2025-07-01', 'cantidad': 1}])
+        self.assertEqual(resultado['productos_creados'], 0)
+        self.assertEqual(resultado['creados'], 0)
+        self.assertEqual(Producto.objects.get(codigo='Q9').categoria, 'Quesos Maduros')
+        self.assertEqual(Lote.objects.filter(producto__codigo='Q9').count(), 2)
+
+    def test_endpoint_valida_crear_productos_y_filas(self):
+        user = User.objects.create_user(username='bodega', password='password123')
+        user.groups.add(Group.objects.create(name='Bodega'))
+        self.client.force_login(user)
+        url = reverse('api_lotes_masivo')
+        lote = {'codigo': 'Q9', 'nombre': 'Queso', 'numero_lote': 'A', 'fecha_vencimiento': '2025-07-01', 'cantidad': 1}
+
+        respuesta = self.client.post(url, json.dumps({'lotes': [lote], 'crear_productos': 'false'}),
+                                     content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(Producto.objects.filter(codigo='Q9').exists())
+
+        respuesta = self.client.post(url, json.dumps({'lotes': ['L1', lote], 'crear_productos': False}),
+                                     content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([e['fila'] for e in respuesta.json()['errores']], [1, 2])
+        self.assertEqual(respuesta.json()['errores'][0]['error'], 'La fila debe ser un objeto')
+        self.assertFalse(Producto.objects.filter(codigo='Q9').exists())
+
+
+class LibroStockTest(TestCase):
+    def setUp(self):
+        self.producto = Producto.objects.create(codigo='L1', nombre='Leche', categoria='Lacteos')
+
+    def _fechar(self, dia):
+        """Lleva los movimientos recién creados (sin fecha asignada) al día indicado."""
+        fecha = datetime.datetime(2025, 1, dia, 12, 0, tzinfo=timezone.get_current_timezone())
+        MovimientoStock.objects.filter(fecha__year__gt=2025).update(fecha=fecha)
+
+    def test_historial_sobrevive_al_borrado_de_lotes(self):
+        ingresar_lotes_masivo([
+            {'codigo': 'L1', 'numero_lote': 'A', 'fecha_vencimiento': '2025-03-01', 'cantidad': 10},
+            {'codigo': 'L1', 'numero_lote': 'B', 'fecha_vencimiento': '2025-04-01', 'cantidad': 5},
+        ])
+        self._fechar(1)
+        descontar_fifo(self.producto, 12)
+        self._fechar(5)
+
+        # El lote A se agotó y se borró; el B quedó con 3
+        self.assertEqual(list(Lote.objects.values_list('numero_lote', 'cantidad')), [('B', 3)])
+        self.assertEqual(MovimientoStock.objects.filter(tipo='VENTA').count(), 2)
+
+        self.assertEqual(stock_en_fecha(datetime.date(2025, 1, 3)), {self.producto.id: 15})
+        self.assertEqual(stock_en_fecha(datetime.date(2025, 1, 6)), {self.producto.id: 3})
+
+    def test_venta_sin_stock_y_producto_borrado(self):
+        ingresar_lotes_masivo([{'codigo': 'L1', 'numero_lote': 'A', 'fecha_vencimiento': '2025-03-01', 'cantidad': 5}])
+        # La revisión de stock va con los lotes bloqueados: sin stock no se descuenta nada
+        with self.assertRaisesMessage(StockInsuficiente, 'Tienes 5'):
+            descontar_fifo(self.producto, 6)
+        self.assertEqual(Lote.objects.get().cantidad, 5)
+
+        descontar_fifo(self.producto, 2)
+        self.producto.delete()  # ya no lo impide el historial
+        self.assertEqual(
+            sorted(MovimientoStock.objects.values_list('producto_id', 'codigo_producto', 'nombre_producto', 'cantidad')),
+            [(None, 'L1', 'Leche', -2), (None, 'L1', 'Leche', 5)],
+        )
+        self.assertEqual(stock_en_fecha(), {})
+
+    def test_consulta_parte_del_corte_mas_cercano(self):
+        ingresar_lotes_masivo([{'codigo': 'L1', 'numero_lote': 'A', 'fecha_vencimiento': '2025-03-01', 'cantidad': 10}])
+        self._fechar(1)
+        corte = crear_corte(datetime.date(2025, 1, 2))
+        self.assertEqual(corte.detalles.get().cantidad, 10)
+
+        descontar_fifo(self.producto, 4)
+        self._fechar(4)
+
+        # corte + saldos del corte + movimientos posteriores; sin recorrer el historial completo
+        with self.assertNumQueries(3):
+            saldos = stock_en_fecha(datetime.date(2025, 1, 10))
+        self.assertEqual(saldos, {self.producto.id: 6})
+        self.assertEqual(CorteStock.objects.count(), 1)
+
+
+def _almacen_temporal(test):
+    """Modelos, lock y estado de la IA en un directorio temporal durante el test."""
+    directorio = tempfile.mkdtemp()
+    rutas = [
+        (almacen_ia, 'DIRECTORIO', directorio),
+        (ia, 'LOCK_PATH', os.path.join(directorio, 'entrenamiento.lock')),
+        (ia, 'PENDIENTE_PATH', os.path.join(directorio, 'entrenamiento.pendiente')),
+        (ia, 'ESTADO_PATH', os.path.join(directorio, 'estado.json')),
+    ]
+    for modulo, nombre, valor in rutas:
+        parche = mock.patch.object(modulo, nombre, valor)
+        parche.start()
+        test.addCleanup(parche.stop)
+
+
+class EntrenamientoIATest(TestCase):
+    def setUp(self):
+        for texto, tipo in [('peaje ruta 5', 'PEAJE'), ('peaje autopista', 'PEAJE'),
+                            ('almuerzo equipo', 'BOLETA'), ('cafe reunion', 'BOLETA'),
+                            ('compra notebook', 'FACTURA'), ('toner impresora', 'FACTURA')]:
+            CajaChica.objects.create(fecha=datetime.date(2025, 3, 1), monto=1000, responsable='Ana',
+                                     descripcion=texto, tipo_documento=tipo)
+        _almacen_temporal(self)
+
+    def test_solicitudes_repetidas_no_reentrenan(self):
+        resultado = ia.solicitar_entrenamiento(en_segundo_plano=False)
+        self.assertEqual(resultado['resultado'], 'entrenado')
+        self.assertEqual(ia.predecir_categoria('peaje ruta 68'), 'PEAJE')
+
+        # Dentro del intervalo mínimo: queda programado y se sigue usando el modelo vigente
+        resultado = ia.solicitar_entrenamiento(en_segundo_plano=False)
+        self.assertEqual(resultado['resultado'], 'programado')
+        self.assertTrue(resultado['pendiente'])
+        self.assertEqual(almacen_ia.versiones(ia.FAMILIA_CAJA), ['v0001'])
+
+    def test_con_entrenamiento_en_curso_queda_en_cola(self):
+        open(ia.LOCK_PATH, 'w').close()  # otro proceso entrenando
+        resultado = ia.solicitar_entrenamiento(en_segundo_plano=False)
+        self.assertEqual(resultado['resultado'], 'en_cola')
+        self.assertTrue(resultado['en_curso'])
+        self.assertEqual(almacen_ia.versiones(ia.FAMILIA_CAJA), [])
+
+    def test_versiones_promover_rollback_y_mmap(self):
+        ia.entrenar_modelo()
+        CajaChica.objects.create(fecha=datetime.date(2025, 3, 2), monto=500, responsable='Ana',
+                                 descripcion='peaje costanera', tipo_documento='PEAJE')
+        ia.entrenar_modelo()
+        self.assertEqual(almacen_ia.version_actual(ia.FAMILIA_CAJA), 'v0002')
+        meta = almacen_ia.listar(ia.FAMILIA_CAJA)[0]
+        self.assertEqual((meta['version'], meta['filas'], meta['actual']), ('v0002', 7, True))
+
+        # Los arreglos numéricos quedan mapeados desde el archivo, no copiados
+        modelo = ia.cargar_modelo()
+        self.assertIsInstance(modelo.named_steps['clf'].feature_log_prob_, np.memmap)
+
+        call_command('modelos_ia', 'rollback', ia.FAMILIA_CAJA, stdout=io.StringIO())
+        self.assertEqual(almacen_ia.version_actual(ia.FAMILIA_CAJA), 'v0001')
+        self.assertIsNot(ia.cargar_modelo(), modelo)
+
+        # Un artefacto alterado no se puede promover
+        ruta = os.path.join(almacen_ia.DIRECTORIO, ia.FAMILIA_CAJA, 'v0002', almacen_ia.ARTEFACTO)
+        with open(ruta, 'ab') as f:
+            f.write(b'x')
+        with self.assertRaises(almacen_ia.ModeloInvalido):
+            almacen_ia.promover(ia.FAMILIA_CAJA, 'v0002')
+        self.assertEqual(almacen_ia.version_actual(ia.FAMILIA_CAJA), 'v0001')
+
+    def test_prediccion_por_lote_con_top_k_y_abstencion(self):
+        client = Client()
+        client.force_login(User.objects.create_user(username='caja', password='x'))
+        url = reverse('api_predecir_lote')
+
+        # Sin modelo todavía
+        respuesta = client.post(url, {'textos': ['peaje']}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 503)
+
+        ia.solicitar_entrenamiento(en_segundo_plano=False)
+        respuesta = client.post(url, {'textos': ['peaje ruta 68', 'toner', 'xyz'], 'k': 2},
+                                content_type='application/json')
+        resultados = respuesta.json()['resultados']
+        self.assertEqual(len(resultados), 3)
+        self.assertEqual(resultados[0]['tipo'], 'PEAJE')
+        self.assertEqual(len(resultados[0]['sugerencias']), 2)
+        self.assertGreaterEqual(resultados[0]['sugerencias'][0]['probabilidad'],
+                                resultados[0]['sugerencias'][1]['probabilidad'])
+
+        # Con un umbral imposible la IA se abstiene, pero igual entrega las sugerencias
+        resultados = ia.sugerir_tipos(['peaje ruta 68'], umbral=1.01)
+        self.assertIsNone(resultados[0]['tipo'])
+        self.assertEqual(resultados[0]['sugerencias'][0]['tipo'], 'PEAJE')
+
+
+class ClasificacionIngresosTest(TestCase):
+    def setUp(self):
+        self.combustible = Clasificacion.objects.create(nombre='Combustible')
+        self.oficina = Clasificacion.objects.create(nombre='Oficina')
+        self.terreno = CentroCosto.objects.create(nombre='Terreno')
+        for texto, clasif in [('bencina camioneta', self.combustible), ('diesel camion', self.combustible),
+                              ('carga combustible copec', self.combustible), ('resmas papel', self.oficina),
+                              ('lapices y carpetas', self.oficina), ('toner impresora', self.oficina)]:
+            Ingreso.objects.create(fecha=datetime.date(2025, 1, 1), monto_transferencia=1000,
+                                   descripcion_movimiento=texto, clasificacion=clasif)
+        _almacen_temporal(self)
+
+    def test_importacion_clasifica_en_lote_y_marca_baja_confianza(self):
+        exito, _ = ia.entrenar_modelo_ingresos()
+        self.assertTrue(exito)
+
+        df = pd.DataFrame({
+            'Fecha': ['2025-02-01'] * 3,
+            'Monto Transferencia': [11900, 5000, 7000],
+            'Descripcion de Movimiento': ['bencina camioneta norte', 'papel y toner', 'xyz'],
+            'Clasificación': ['', '', 'Oficina'],
+            'Tipo': ['FACTURA', 'BOLETA', 'GASTO'],
+        })
+        archivo = io.BytesIO()
+        with pd.ExcelWriter(archivo, engine='openpyxl') as writer:
+            df.to_excel(writer, sheet_name='REGISTRO EGRESOS', index=False, startrow=5)
+        archivo.seek(0)
+        archivo.name = 'egresos.xlsx'
+
+        client = Client()
+        client.force_login(User.objects.create_user(username='finanzas', password='x'))
+        with mock.patch.object(ia, 'UMBRAL_CONFIANZA', 0.6):
+            client.post(reverse('importar_excel'), {'archivo_excel': archivo})
+
+        nuevos = {i.descripcion_movimiento: i for i in Ingreso.objects.filter(fecha=datetime.date(2025, 2, 1))}
+        self.assertEqual(len(nuevos), 3)
+        self.assertEqual(nuevos['bencina camioneta norte'].clasificacion, self.combustible)
+        self.assertTrue(nuevos['bencina camioneta norte'].clasificado_por_ia)
+        self.assertIsNotNone(nuevos['bencina camioneta norte'].confianza_ia)
+        self.assertEqual(nuevos['bencina camioneta norte'].iva, 1900)  # bulk_create mantiene el cálculo de IVA
+        # La clasificación que venía en la planilla no se toca
+        self.assertFalse(nuevos['xyz'].clasificado_por_ia)
+        self.assertEqual(
+            [i.requiere_revision for i in nuevos.values()],
+            [(i.confianza_ia or 1) < 0.6 for i in nuevos.values()],
+        )
+
+
+class DashboardRRHHTest(TestCase):
+    def setUp(self):
+        self.samka = Empresa.objects.create(nombre='Samka SPA')
+        self.maquehue = Empresa.objects.create(nombre='Maquehue SPA')
+        chofer = Cargo.objects.create(nombre='Chofer')
+        for n in range(6):
+            Trabajador.objects.create(
+                empresa=self.samka if n % 2 else self.maquehue, nombre=f'T{n}', rut=f'{n}-K', cargo=chofer,
+                fecha_finiquito=datetime.date(2025, 3, 1) if n < 2 else None, monto_finiquito=1000 if n < 2 else 0,
+            )
+        usuario = User.objects.create_user(username='rrhh', password='x')
+        usuario.groups.add(Group.objects.create(name='RRHH'))
+        self.client.force_login(usuario)
+
+    def test_kpis_por_empresa_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            resumen = {r['empresa_id']: r for r in Trabajador.objects.resumen_por_empresa()}
+        self.assertEqual((resumen[self.samka.id]['activos'], resumen[self.samka.id]['finiquitados']), (2, 1))
+        self.assertEqual((resumen[self.maquehue.id]['activos'], resumen[self.maquehue.id]['finiquitados']), (2, 1))
+
+    @mock.patch.object(sesion, 'cache_compartido', return_value=True)  # Redis en producción
+    def test_dashboard_consultas_constantes(self, _compartido):
+        # usuario + KPIs + gráfico + count + página (empresa y cargo vía JOIN);
+        # la sesión sale del cache y los grupos de la sesión (core/sesion.py)
+        self.client.get(reverse('dashboard_rrhh'))  # guarda grupos y perfil en la sesión
+        with self.assertNumQueries(5):
+            respuesta = self.client.get(reverse('dashboard_rrhh'), {'empresa': self.samka.id, 'modo_ajax': 'true'})
+        datos = respuesta.json()
+        self.assertEqual(datos['titulo_pagina'], 'Samka SPA')
+        self.assertEqual(datos['html_tabla'].count('<tr>'), 3)
+        self.assertEqual(datos['data_grafico'], [1000])
+
+
+class AnaliticaRRHHTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        samka = Empresa.objects.create(nombre='Samka SPA')
+        chofer = Cargo.objects.create(nombre='Chofer')
+        fechas = [
+            ('A', datetime.date(2020, 1, 15), None),
+            ('B', datetime.date(2025, 2, 10), None),
+            ('C', datetime.date(2023, 3, 1), datetime.date(2025, 3, 31)),
+            ('D', datetime.date(2024, 12, 20), datetime.date(2025, 1, 10)),
+        ]
+        for nombre, contrato, finiquito in fechas:
+            Trabajador.objects.create(empresa=samka, cargo=chofer, nombre=nombre, rut=f'{nombre}-1',
+                                      fecha_contrato=contrato, fecha_finiquito=finiquito)
+        self.desde, self.hasta = datetime.date(2025, 1, 1), datetime.date(2025, 6, 30)
+
+    def test_antiguedad_en_sql(self):
+        a = Trabajador.objects.con_antiguedad(self.hasta).get(nombre='A')
+        self.assertEqual(a.dias_servicio, (self.hasta - datetime.date(2020, 1, 15)).days)
+        with self.assertNumQueries(1):
+            tramos = {t['tramo']: t['activos'] for t in rrhh.distribucion_antiguedad(self.hasta, usar_cache=False)}
+        self.assertEqual(tramos, {'0-1 año': 1, '1-3 años': 0, '3-5 años': 0, '5-10 años': 1, '10+ años': 0})
+
+    def test_dotacion_mensual_y_rotacion(self):
+        with self.assertNumQueries(3):
+            serie = rrhh.dotacion_mensual(self.desde, self.hasta, usar_cache=False)
+        self.assertEqual([m['dotacion'] for m in serie], [2, 3, 2, 2, 2, 2])
+        self.assertEqual(serie[0]['mes'], datetime.date(2025, 1, 1))
+
+        with self.assertNumQueries(1):
+            fila, = rrhh.rotacion(self.desde, self.hasta, usar_cache=False)
+        self.assertEqual((fila['dotacion_inicial'], fila['dotacion_final'], fila['altas'], fila['bajas']), (3, 2, 1, 2))
+        self.assertEqual(fila['tasa_rotacion'], 80.0)
+
+    def test_cache_se_invalida_al_editar(self):
+        rrhh.rotacion(self.desde, self.hasta)
+        with self.assertNumQueries(1):  # solo la huella
+            rrhh.rotacion(self.desde, self.hasta)
+        Trabajador.objects.get(nombre='B').save()
+        with self.assertNumQueries(2):
+            rrhh.rotacion(self.desde, self.hasta)
+
+
+class OperacionesMasivasRRHHTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.samka = Empresa.objects.create(nombre='Samka SPA')
+        otra = Empresa.objects.create(nombre='Maquehue SPA')
+        for n, numero in enumerate(['11.111.111-1', '22222222-2', '333333333']):
+            Trabajador.objects.create(empresa=self.samka, nombre=f'T{n}', rut=numero,
+                                      fecha_contrato=datetime.date(2024, 10, 1))
+        Trabajador.objects.create(empresa=otra, nombre='Otro', rut='44.444.444-4', fecha_contrato=datetime.date(2024, 10, 1))
+        self.usuario = User.objects.create_user(username='rrhh', password='x')
+        self.usuario.groups.add(Group.objects.create(name='RRHH'))
+
+    def test_formulario_usa_empresas_cacheadas(self):
+        from .forms import TrabajadorForm
+        TrabajadorForm()
+        with self.assertNumQueries(0):
+            opciones = TrabajadorForm().fields['empresa'].choices
+        self.assertEqual([nombre for _, nombre in opciones][1:], ['Maquehue SPA', 'Samka SPA'])
+        # Sin trabajadores no aparece; con el primero, la señal invalida el cache
+        norte = Empresa.objects.create(nombre='Norte Ltda')
+        self.assertEqual(len(Empresa.opciones_rrhh()), 2)
+        Trabajador.objects.create(empresa=norte, nombre='N', rut='55.555.555-5', fecha_contrato=datetime.date(2024, 10, 1))
+        self.assertEqual([nombre for _, nombre in Empresa.opciones_rrhh()], ['Maquehue SPA', 'Norte Ltda', 'Samka SPA'])
+
+        nueva = Empresa.objects.create(nombre='Agrícola Sur')
+        with self.settings(RRHH_EMPRESAS_IDS=[nueva.id]):
+            cache.delete(Empresa.CACHE_OPCIONES_RRHH)
+            self.assertIn((nueva.id, 'Agrícola Sur'), Empresa.opciones_rrhh())
+
+    def test_vista_previa_y_finiquito_masivo(self):
+        trabajadores, no_encontrados = rrhh.seleccionar_trabajadores(
+            empresa_id=self.samka.id, ruts=['111111111', '22.222.222-2', '33.333.333-3', '9.999.999-9'])
+        self.assertEqual(no_encontrados, ['9.999.999-9'])
+        cambios = {'fecha_finiquito': datetime.date(2025, 3, 31), 'estado': 'FINIQUITADO', 'monto_finiquito': 50000}
+        previa = rrhh.previsualizar_masivo(trabajadores, cambios)
+        self.assertEqual(previa['cantidad'], 3)
+        self.assertEqual(previa['conflictos'], [])
+        self.assertEqual(Trabajador.objects.filter(fecha_finiquito__isnull=False).count(), 0)
+
+        self.client.force_login(self.usuario)
+        respuesta = self.client.post(reverse('operaciones_masivas_rrhh'), {
+            'empresa': self.samka.id, 'solo_activos': 'on', 'fecha_finiquito': '2025-03-31',
+            'monto_finiquito': 50000, 'firma': previa['firma'], 'accion': 'aplicar',
+        })
+        self.assertRedirects(respuesta, reverse('dashboard_rrhh'), fetch_redirect_response=False)
+        self.assertEqual(
+            set(Trabajador.objects.filter(estado='FINIQUITADO').values_list('nombre', flat=True)), {'T0', 'T1', 'T2'})
+        operacion = OperacionMasivaTrabajadores.objects.get()
+        self.assertEqual((operacion.accion, operacion.cantidad, operacion.usuario), ('FINIQUITO', 3, self.usuario))
+        self.assertEqual(operacion.detalle[0]['antes']['estado'], 'ACTIVO')
+
+    def test_no_aplica_si_la_seleccion_cambio(self):
+        trabajadores, _ = rrhh.seleccionar_trabajadores(empresa_id=self.samka.id)
+        firma = rrhh.previsualizar_masivo(trabajadores, {'estado': 'FINIQUITADO'})['firma']
+        Trabajador.objects.create(empresa=self.samka, nombre='Nuevo', rut='5-5')
+        with self.assertRaises(rrhh.OperacionInvalida):
+            rrhh.aplicar_masivo(trabajadores, {'estado': 'FINIQUITADO'}, firma=firma)
+        self.assertFalse(OperacionMasivaTrabajadores.objects.exists())
+
+
+class RutTest(TestCase):
+    def test_vectorizado_igual_a_fila_a_fila(self):
+        valores = [' 12.345.678-5 ', '12345678-4', 123456785.0, '7.654.321-6', '0-0', 'abc', None, '', '1-9']
+        self.assertEqual(rut.normalizar_serie(pd.Series(valores)).tolist(), [rut.normalizar(v) for v in valores])
+        self.assertEqual(rut.normalizar(' 12.345.678-5 '), '12345678-5')
+        self.assertEqual(rut.formatear('123456785'), '12.345.678-5')
+
+    def test_forma_canonica_en_base_y_login(self):
+        empresa = Empresa.objects.create(nombre='Samka SPA')
+        Trabajador.objects.create(empresa=empresa, nombre='A', rut='12.345.678-5')
+        self.assertTrue(Trabajador.objects.filter(rut='12345678-5').exists())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Trabajador.objects.create(empresa=empresa, nombre='A bis', rut='123456785')
+
+        User.objects.create_user(username='12345678-5', password='clave')
+        self.assertTrue(Client().login(username='12.345.678-5', password='clave'))
+
+    def test_migracion_normaliza_por_tramos(self):
+        from django.apps import apps
+        migracion = importlib.import_module('core.migrations.0023_normalizar_rut_trabajador')
+        empresa = Empresa.objects.create(nombre='Samka SPA')
+        a, b, *_ = Trabajador.objects.bulk_create([
+            Trabajador(empresa=empresa, nombre='A', rut='11.111.111-1'),
+            Trabajador(empresa=empresa, nombre='B', rut='111111111'),  # mismo RUT que A
+            Trabajador(empresa=empresa, nombre='C', rut='7654321-6'),
+            Trabajador(empresa=empresa, nombre='D', rut='sin rut'),
+            Trabajador(empresa=empresa, nombre='E', rut='22.222.222-2'),
+        ])
+        # Un RUT repetido detiene la migración sin tocar nada y dice qué filas revisar
+        with mock.patch.object(migracion, 'TRAMO', 2):
+            with self.assertRaisesMessage(RuntimeError, f'11111111-1: ids [{a.pk}, {b.pk}]'):
+                migracion.normalizar_ruts(apps, None)
+        self.assertEqual(Trabajador.objects.get(nombre='A').rut, '11.111.111-1')
+
+        b.delete()
+        with mock.patch.object(migracion, 'TRAMO', 2):
+            migracion.normalizar_ruts(apps, None)
+        ruts = dict(Trabajador.objects.values_list('nombre', 'rut'))
+        self.assertEqual(ruts, {'A': '11111111-1', 'C': '7654321-6', 'D': 'sin rut', 'E': '22222222-2'})
+
+
+class MotorIVATest(TestCase):
+    def test_reglas_por_tipo_y_redondeo_entero(self):
+        self.assertEqual(impuestos.calcular_iva(11900, 'FACTURA'), Decimal('1900'))
+        self.assertEqual(impuestos.calcular_iva(7, 'Boleta'), Decimal('1'))  # neto = round(7 / 1,19) = 6
+        self.assertEqual(impuestos.calcular_iva(11900, 'Nota de Crédito'), Decimal('1900'))
+        self.assertEqual(impuestos.calcular_iva(-11900, 'NOTA_DE_CREDITO'), Decimal('-1900'))
+        self.assertEqual(impuestos.calcular_iva(11900, 'FACTURA EXENTA'), Decimal('0'))
+        self.assertEqual(impuestos.calcular_iva(11900, 'RECIBO'), Decimal('0'))
+
+    def test_vectorizado_igual_a_fila_a_fila(self):
+        montos = list(range(-300, 5000, 7)) + [Decimal('999999999999'), None]
+        tipos = ['FACTURA', 'boleta', 'PEAJE', 'factura exenta', None] * (len(montos) // 5 + 1)
+        tipos = tipos[:len(montos)]
+        vectorizado = impuestos.calcular_iva_vectorizado(montos, tipos).tolist()
+        self.assertEqual(vectorizado, [int(impuestos.calcular_iva(m, t)) for m, t in zip(montos, tipos)])
+
+        # Caja chica (SQL y propiedad) usa la misma regla
+        for monto in (7, 1190, 12345):
+            gasto = CajaChica.objects.create(fecha=datetime.date(2025, 1, 1), monto=monto, responsable='Ana',
+                                             descripcion='x', tipo_documento='BOLETA')
+            self.assertEqual(gasto.iva_recuperable, impuestos.iva_incluido(monto))
+            self.assertEqual(CajaChica.objects.con_iva().get(pk=gasto.pk).iva_recuperable, impuestos.iva_incluido(monto))
+
+    def test_comando_recalcula_por_tramos(self):
+        for monto in (1190, 2380, 100):
+            Ingreso.objects.create(fecha=datetime.date(2025, 1, 1), monto_transferencia=monto, tipo_documento='FACTURA')
+        Ingreso.objects.create(fecha=datetime.date(2025, 1, 1), monto_transferencia=500, tipo_documento='VOUCHER')
+        Ingreso.objects.update(iva=0)
+
+        salida = io.StringIO()
+        call_command('recalcular_iva', tramo=2, stdout=salida)
+        self.assertIn('4 filas revisadas, 3 actualizadas', salida.getvalue())
+        self.assertEqual(sorted(Ingreso.objects.values_list('iva', flat=True)), [0, 16, 190, 380])
+
+
+class ArranqueLivianoTest(SimpleTestCase):
+    def test_urls_no_cargan_librerias_pesadas(self):
+        # Proceso nuevo: en este ya están cargadas por los demás tests
+        salida = io.StringIO()
+        call_command('benchmark_arranque', modulos='sistema.urls', repeticiones=1, json=True, stdout=salida)
+        setup, urls = json.loads(salida.getvalue())
+        self.assertEqual(setup['pesadas'], [])
+        self.assertEqual(urls['pesadas'], [])
+
+        # Las vistas se miden sin core/views/__init__.py: cada una con su propio costo
+        salida = io.StringIO()
+        call_command('benchmark_arranque', modulos='core.views.inicio,core.views', repeticiones=1, json=True, stdout=salida)
+        _, inicio, vistas = json.loads(salida.getvalue())
+        self.assertLess(inicio['modulos_nuevos'], vistas['modulos_nuevos'])
+
+
+class AutenticacionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.rut = f"12.345.678-{rut.calcular_dv(12345678)}"
+        self.user = User.objects.create_user(username=self.rut, email=' Ana.Perez@Empresa.cl ', password='clave-segura-1')
+
+    def _login(self, identificador, clave='clave-segura-1', ip='10.0.0.1'):
+        from django.contrib.auth import authenticate
+        from django.test.client import RequestFactory
+        return authenticate(RequestFactory().post('/login/', REMOTE_ADDR=ip), username=identificador, password=clave)
+
+    def test_username_rut_canonico_y_login_por_correo_o_rut(self):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.username, rut.normalizar(self.rut))
+        self.assertEqual(self.user.email, 'Ana.Perez@empresa.cl')  # sin espacios
+        for identificador in ('ana.perez@empresa.cl', 'ANA.PEREZ@EMPRESA.CL', self.rut, self.user.username):
+            self.assertEqual(self._login(identificador), self.user, identificador)
+        with self.assertNumQueries(1):
+            self.assertEqual(backends.buscar_usuario('Ana.Perez@empresa.CL'), self.user)
+
+    def test_correo_unico_sin_distinguir_mayusculas(self):
+        form = RegistroUsuarioForm(data={
+            'username': 'otro', 'first_name': 'A', 'last_name': 'B', 'email': 'ANA.PEREZ@empresa.cl',
+            'password1': 'Clave-Larga-987', 'password2': 'Clave-Larga-987',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='otro', email='ana.perez@EMPRESA.cl')
+        # Varios usuarios sin correo siguen permitidos
+        User.objects.create_user(username='sin1')
+        User.objects.create_user(username='sin2')
+
+    def test_migracion_no_borra_correos_repetidos(self):
+        from django.apps import apps
+        migracion = importlib.import_module('core.migrations.0024_auth_user_email_unico')
+        with connection.cursor() as cursor:
+            cursor.execute("DROP INDEX auth_user_email_ci_uniq")  # el estado de antes de la migración
+        otro = User.objects.create_user(username='otro', email='ana.perez@EMPRESA.cl')
+        with self.assertRaisesMessage(RuntimeError, f'ids [{self.user.pk}, {otro.pk}]'):
+            migracion.normalizar_usuarios(apps, None)
+        otro.refresh_from_db()
+        self.assertEqual(otro.email, 'ana.perez@empresa.cl')
+
+        # Mismo RUT escrito de otra forma en el username: también se detiene
+        otro.delete()
+        copia = User.objects.create_user(username='copia')
+        User.objects.filter(pk=copia.pk).update(username=self.rut)  # sin la señal que normaliza
+        with self.assertRaisesMessage(RuntimeError, f'ids [{self.user.pk}, {copia.pk}]'):
+            migracion.normalizar_usuarios(apps, None)
+        copia.refresh_from_db()
+        self.assertEqual(copia.username, self.rut)
+
+    def test_bloqueo_no_llega_al_hasher(self):
+        for _ in range(backends.LOGIN_MAX_FALLOS_CUENTA):
+            self.assertIsNone(self._login(self.rut, clave='mala'))
+        with mock.patch.object(User, 'check_password') as check:
+            self.assertIsNone(self._login(self.rut))
+            check.assert_not_called()
+        # Otra cuenta desde la misma IP no queda bloqueada; al reiniciar vuelve a entrar
+        self.assertIsNone(self._login('otra@empresa.cl', clave='mala'))
+        backends.reiniciar_intentos(None, self.rut)
+        self.assertEqual(self._login(self.rut), self.user)
+
+
+class PerfilTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='maria', email='maria@test.cl', password='password123')
+
+    @mock.patch.object(sesion, 'cache_compartido', return_value=True)  # Redis en producción
+    def test_login_no_toca_el_perfil(self, _compartido):
+        # usuario por índice + sesión (existe?, INSERT con savepoint) + grupos leídos
+        # una vez para la sesión + last_login + UPDATE de la sesión (con savepoint)
+        with self.assertNumQueries(10):
+            respuesta = self.client.post(reverse('login'), {'username': 'maria@test.cl', 'password': 'password123'})
+        self.assertRedirects(respuesta, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertFalse(Perfil.objects.exists())
+
+    def test_perfil_perezoso_y_solo_guarda_cambios(self):
+        perfil = Perfil.para(self.user)
+        self.assertIs(self.user.perfil, perfil)
+        with self.assertNumQueries(0):
+            Perfil.para(self.user)
+            perfil.save()
+
+        perfil.telefono = '+56 9 1234 5678'
+        with CaptureQueriesContext(connection) as consultas:
+            perfil.save()
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('"telefono"', consultas[0]['sql'])
+        self.assertNotIn('"imagen"', consultas[0]['sql'])
+
+        leido = Perfil.objects.get(pk=perfil.pk)
+        with self.assertNumQueries(0):
+            leido.save()
+        self.assertEqual(leido.telefono, '+56 9 1234 5678')
+
+
+class ContextoSesionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='pedro', password='password123')
+        self.client.force_login(self.user)
+
+    @mock.patch.object(sesion, 'cache_compartido', return_value=True)
+    def test_grupos_en_sesion_y_cambios_inmediatos(self, _compartido):
+        self.assertEqual(self.client.get(reverse('dashboard_rrhh')).status_code, 302)
+        self.user.groups.add(Group.objects.create(name='RRHH'))
+        self.assertEqual(self.client.get(reverse('dashboard_rrhh')).status_code, 200)
+
+        # El menú (has_group) ya no consulta grupos: solo el usuario y los KPIs del inicio
+        respuesta = self.client.get(reverse('dashboard'))
+        self.assertContains(respuesta, reverse('dashboard_rrhh'))
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('dashboard'))
+        self.assertFalse([q for q in consultas.captured_queries if 'auth_group' in q['sql']])
+
+        Group.objects.get(name='RRHH').user_set.clear()
+        self.assertEqual(self.client.get(reverse('dashboard_rrhh')).status_code, 302)
+
+        # Borrar el grupo no dispara m2m_changed: la señal del grupo invalida la sesión
+        self.user.groups.add(Group.objects.get(name='RRHH'))
+        self.assertEqual(self.client.get(reverse('dashboard_rrhh')).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.get(name='RRHH').delete()
+        self.assertEqual(self.client.get(reverse('dashboard_rrhh')).status_code, 302)
+
+    def test_cache_por_proceso_lee_grupos_en_cada_peticion(self):
+        # LocMemCache: otro worker no vería la versión nueva, así que nada queda en la sesión
+        self.assertFalse(sesion.cache_compartido())
+        self.user.groups.add(Group.objects.create(name='RRHH'))
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(reverse('dashboard_rrhh')).status_code, 200)
+        sql = [q['sql'] for q in consultas.captured_queries]
+        # Una sola lectura de grupos (grupos_de la guarda en el usuario) y nada del perfil
+        self.assertEqual(len([q for q in sql if 'auth_group' in q]), 1)
+        self.assertFalse([q for q in sql if 'core_perfil' in q])
+        self.assertNotIn(sesion.CLAVE_SESION, self.client.session)
+
+    def test_middleware_no_consulta_grupos_por_su_cuenta(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        request.session = self.client.session
+        with self.assertNumQueries(0):
+            sesion.ContextoUsuarioMiddleware(lambda r: HttpResponse())(request)
+        self.assertFalse(hasattr(request.user, 'grupos_sesion'))
+
+
+class ParticionesTest(TestCase):
+    def test_rango_periodo(self):
+        self.assertEqual(particiones.rango_periodo(2025), (datetime.date(2025, 1, 1), datetime.date(2026, 1, 1)))
+        self.assertEqual(particiones.rango_periodo('2025', '12'), (datetime.date(2025, 12, 1), datetime.date(2026, 1, 1)))
+        self.assertIsNone(particiones.rango_periodo('dos mil', None))
+        self.assertIsNone(particiones.rango_periodo(2025, 13))
+
+    def test_dashboard_filtra_por_rango_sin_postgres(self):
+        for fecha in ('2024-12-31', '2025-01-01', '2025-01-31', '2025-02-01'):
+            Ingreso.objects.create(fecha=fecha, monto_transferencia=1000)
+
+        servicio = DashboardService(anio=2025, mes=1)
+        self.assertEqual(servicio.obtener_kpis()['total_registros'], 2)
+        # Comparación directa sobre fecha (prunable), no EXTRACT del mes
+        self.assertNotIn('extract', str(servicio.queryset.query).lower())
+
+        # SQLite: las tablas son normales y el comando no hace nada
+        self.assertEqual(particiones.asegurar_particiones(), [])
+        salida = io.StringIO()
+        call_command('particiones', stdout=salida)
+        self.assertIn('no particiona', salida.getvalue())
+
+
+class ArchivoHistoricoTest(TestCase):
+    def setUp(self):
+        parche = mock.patch.object(archivo, 'DIRECTORIO', tempfile.mkdtemp())
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.user = User.objects.create_user(username='contador', password='password123')
+        self.user.groups.add(Group.objects.create(name='Finanzas'))
+        empresa = Empresa.objects.create(nombre='Samka')
+        Ingreso.objects.create(fecha='2023-03-10', monto_transferencia=1000, empresa=empresa)
+        Ingreso.objects.create(fecha='2023-03-20', monto_transferencia=3000)
+        Ingreso.objects.create(fecha='2025-01-05', monto_transferencia=500)
+        Movimiento.objects.create(fecha='2023-05-01', tipo='INGRESO', descripcion='Venta', monto=7000, empresa=empresa)
+        Movimiento.objects.create(fecha='2023-05-02', tipo='EGRESO', descripcion='Compra', monto=2000)
+        CajaChica.objects.create(fecha='2023-06-01', monto=990, responsable='Ana', descripcion='Peaje')
+
+    def test_archivar_y_leer(self):
+        with self.assertRaises(archivo.ArchivoError):
+            archivo.archivar_anio(2025, hoy=datetime.date(2025, 6, 1))
+
+        meta = archivo.archivar_anio(2023, hoy=datetime.date(2025, 6, 1))
+        self.assertEqual(meta['tablas']['ingreso']['filas'], 2)
+        self.assertEqual(meta['tablas']['movimiento']['suma'], 9000)
+        self.assertEqual(Ingreso.objects.count(), 1)
+        self.assertFalse(Movimiento.objects.exists() or CajaChica.objects.exists())
+        self.assertEqual(archivo.anios_archivados(), [2023])
+
+        # Dashboards filtrados por el año archivado: mismos números, desde el Parquet
+        kpis = DashboardService(anio=2023, mes=3).obtener_kpis()
+        self.assertEqual((kpis['total_monto'], kpis['total_registros'], kpis['promedio_monto']), (4000, 2, 2000))
+        self.assertIn('Samka', DashboardService(anio=2023).obtener_datos_graficos()['labels_empresas'])
+
+        self.client.force_login(self.user)
+        respuesta = self.client.get(reverse('finanzas_dashboard'), {'anio': 2023})
+        self.assertEqual((respuesta.context['total_ingresos'], respuesta.context['balance']), (7000, 5000))
+        self.assertEqual([f.year for f in respuesta.context['anios_disponibles']], [2023])
+        self.assertContains(respuesta, 'Venta')
+
+        # Filas escritas después de archivar el año también cuentan
+        Ingreso.objects.create(fecha='2023-03-25', monto_transferencia=2000)
+        Movimiento.objects.create(fecha='2023-05-03', tipo='EGRESO', descripcion='Tardía', monto=1000)
+        kpis = DashboardService(anio=2023, mes=3).obtener_kpis()
+        self.assertEqual((kpis['total_monto'], kpis['total_registros']), (6000, 3))
+        respuesta = self.client.get(reverse('finanzas_dashboard'), {'anio': 2023})
+        self.assertEqual((respuesta.context['total_egresos'], respuesta.context['balance']), (3000, 4000))
+        self.assertContains(respuesta, 'Tardía')
+        Ingreso.objects.filter(fecha='2023-03-25').delete()
+
+        # La exportación CSV incluye las filas vigentes y las archivadas
+        filas = self.client.get(reverse('export_finanzas')).content.decode().splitlines()
+        self.assertEqual([f.split(',')[1] for f in filas[1:]], ['2025-01-05', '2023-03-20', '2023-03-10'])
+        self.assertIn('Samka', filas[-1])
+
+
+class PivotIngresosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.samka = Empresa.objects.create(nombre='Samka')
+        self.maquehue = Empresa.objects.create(nombre='Maquehue')
+        peajes = Clasificacion.objects.create(nombre='Peajes')
+        for fecha, empresa, monto in [('2025-01-10', self.samka, 1190), ('2025-02-05', self.samka, 2380),
+                                      ('2025-03-20', self.maquehue, 5000), ('2025-04-02', self.samka, 100)]:
+            Ingreso.objects.create(fecha=fecha, empresa=empresa, clasificacion=peajes,
+                                   monto_transferencia=monto, tipo_documento='FACTURA')
+
+    def test_rollup_y_corte_desde_cubo_cacheado(self):
+        _, resultado, origen = pivot.pivotear(['empresa', 'clasificacion'], ['mes'], ['monto_transferencia:sum', 'iva:sum'])
+        self.assertEqual(origen, 'sql')
+        self.assertEqual(len(resultado), 4)
+
+        # Menos dimensiones, grano más grueso y un corte: se resuelve con el cubo por mes
+        filtros = filtros_ingresos({'empresa': str(self.samka.pk), 'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-03-31'})
+        with self.assertNumQueries(0):
+            consulta, resultado, origen = pivot.pivotear(['trimestre'], [], ['monto_transferencia:sum', 'monto_transferencia:avg', 'iva:count'], filtros)
+        self.assertEqual(origen, 'cache')
+        self.assertEqual(resultado.to_dict('records'), [
+            {'trimestre': '2025-T1', 'monto_transferencia:sum': 3570, 'monto_transferencia:avg': 1785, 'iva:count': 2},
+        ])
+        self.assertEqual(pivot.tabla(resultado, consulta)[1], [['2025-T1', 3570, 1785, 2]])
+
+        # Un rango que no calza con el mes necesita la base
+        filtros['fecha_fin'] = datetime.date(2025, 3, 15)
+        self.assertEqual(pivot.pivotear(['trimestre'], [], ['monto_transferencia:sum'], filtros)[2], 'sql')
+
+        # Cualquier cambio en Ingreso renueva la versión de los cubos, recién al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingreso.objects.create(fecha='2025-01-11', empresa=self.samka, monto_transferencia=10)
+            self.assertEqual(pivot.pivotear(['empresa'], [], ['monto_transferencia:sum'])[2], 'cache')
+        _, resultado, origen = pivot.pivotear(['empresa'], [], ['monto_transferencia:sum'])
+        self.assertEqual(origen, 'sql')
+        self.assertEqual(dict(resultado.values.tolist()), {'Samka': 3680, 'Maquehue': 5000})
+
+    def test_endpoint_json_y_xlsx(self):
+        user = User.objects.create_user(username='analista', password='password123')
+        user.groups.add(Group.objects.create(name='Finanzas'))
+        self.client.force_login(user)
+        url = reverse('api_pivot_ingresos')
+
+        datos = self.client.get(url, {'filas': 'empresa', 'columnas': 'anio', 'medidas': 'monto_transferencia:sum'}).json()
+        self.assertEqual(datos['encabezados'], ['empresa', 'monto_transferencia:sum | 2025'])
+        self.assertEqual(datos['tabla'], [['Maquehue', 5000], ['Samka', 3670]])
+
+        respuesta = self.client.get(url, {'filas': 'empresa', 'formato': 'xlsx'})
+        self.assertEqual(respuesta['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        self.assertEqual(self.client.get(url, {'filas': 'rut'}).status_code, 400)
+
+    def test_lista_ingresos_html_y_ajax(self):
+        user = User.objects.create_user(username='analista', password='password123')
+        user.groups.add(Group.objects.create(name='Finanzas'))
+        self.client.force_login(user)
+        url = reverse('lista_ingresos')
+
+        respuesta = self.client.get(url, {'empresa': self.samka.pk, 'revision': '1'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.context['revision_sel'])
+        respuesta = self.client.get(url, {'empresa': self.samka.pk})
+        self.assertFalse(respuesta.context['revision_sel'])
+        self.assertEqual(respuesta.context['page_obj'].paginator.count, 3)
+        self.assertEqual(self.client.get(url, {'modo_ajax': '1'}).status_code, 200)
+
+
+class ConciliacionTest(TestCase):
+    def _mov(self, fecha, monto, doc=None, tipo='EGRESO'):
+        return Movimiento.objects.create(fecha=fecha, descripcion='banco', tipo=tipo, monto=monto, n_documento=doc)
+
+    def _ing(self, fecha, monto, doc=None):
+        return Ingreso.objects.create(fecha=fecha, monto_transferencia=monto, n_documento=doc)
+
+    def test_reglas_desempate_e_incremental(self):
+        transferencia = self._mov('2025-03-10', 5000, doc='00123')
+        pago_a = self._mov('2025-03-10', 1000)
+        pago_b = self._mov('2025-03-12', 1000)
+        agrupado = self._mov('2025-03-15', 3000)
+        self._mov('2025-03-10', 7000, tipo='INGRESO')  # abonos no se cruzan con egresos
+
+        por_documento = self._ing('2025-03-11', 5000, doc='Nº 123')
+        cercano_b = self._ing('2025-03-12', 1000)
+        cercano_a = self._ing('2025-03-11', 1000)
+        facturas = [self._ing('2025-03-14', 1200, doc='F-9'), self._ing('2025-03-15', 1800, doc='F-9')]
+        fuera_de_plazo = self._ing('2025-04-30', 5000)
+
+        resultado = conciliacion.conciliar(tolerancia=3)
+        self.assertEqual(resultado['nuevas'], {'DOCUMENTO': 1, 'MONTO_FECHA': 2, 'AGRUPADO': 2})
+        self.assertEqual(resultado['pendientes'], {'movimientos': 0, 'ingresos': 1})
+
+        pares = dict(Conciliacion.objects.values_list('ingreso_id', 'movimiento_id'))
+        self.assertEqual(pares[por_documento.pk], transferencia.pk)
+        # Cada pago con el ingreso de su misma fecha, aunque ambos estén dentro de la tolerancia
+        self.assertEqual(pares[cercano_b.pk], pago_b.pk)
+        self.assertEqual(pares[cercano_a.pk], pago_a.pk)
+        self.assertEqual({pares[f.pk] for f in facturas}, {agrupado.pk})
+        self.assertNotIn(fuera_de_plazo.pk, pares)
+
+        # Una importación nueva solo cruza lo pendiente
+        tardio = self._mov('2025-05-01', 5000)
+        resultado = conciliacion.conciliar(tolerancia=3)
+        self.assertEqual(sum(resultado['nuevas'].values()), 1)
+        self.assertEqual(fuera_de_plazo.conciliacion.movimiento, tardio)
+        self.assertEqual(Conciliacion.objects.count(), 6)
+
+    def test_endpoint(self):
+        self._mov('2025-03-10', 1000)
+        self._ing('2025-03-10', 1000)
+        self._ing('2025-03-10', 2500)
+        user = User.objects.create_user(username='tesorero', password='password123')
+        user.groups.add(Group.objects.create(name='Finanzas'))
+        self.client.force_login(user)
+        url = reverse('api_conciliacion')
+
+        self.assertEqual(self.client.post(url).json()['nuevas']['MONTO_FECHA'], 1)
+        datos = self.client.get(url).json()
+        self.assertEqual(datos['conciliados'], {'MONTO_FECHA': 1})
+        self.assertEqual(datos['pendientes'], {'movimientos': 0, 'ingresos': 1})
+        self.assertEqual([i['monto_transferencia'] for i in datos['ingresos_sin_conciliar']], ['2500'])
+
+    def test_importaciones_reales_concilian_por_documento(self):
+        _almacen_temporal(self)
+        self.client.force_login(User.objects.create_user(username='tesorero', password='password123'))
+
+        banco = pd.DataFrame({
+            'Fecha': pd.to_datetime(['2025-03-10', '2025-03-15']),
+            'Descripción': ['Transferencia', 'Pago proveedor'],
+            'Tipo': ['EGRESO', 'EGRESO'],
+            'Categoría': ['', ''],
+            'Monto': [5000, 3000],
+            'N° Documento': [123.0, None],
+            'Banco': ['BCI', 'BCI'],
+        })
+        archivo = io.BytesIO()
+        with pd.ExcelWriter(archivo, engine='openpyxl') as writer:
+            banco.to_excel(writer, sheet_name='Control de Finanzas', index=False, startrow=12, startcol=1)
+        archivo.seek(0)
+        archivo.name = 'control.xlsx'
+        self.client.post(reverse('importar_finanzas'), {'archivo_excel': archivo})
+        self.assertEqual(list(Movimiento.objects.order_by('fecha').values_list('n_documento', 'banco')), [('123', 'BCI'), (None, 'BCI')])
+
+        egresos = pd.DataFrame({
+            'Fecha': ['2025-03-10', '2025-03-12', '2025-03-14', '2025-03-15'],
+            'Monto Transferencia': [5000, 5000, 1200, 1800],
+            'Descripcion de Movimiento': ['sin doc', 'factura 123', 'parte 1', 'parte 2'],
+            'N° DOCUMENTO': [None, 'Nº 00123', 'F-9', 'F-9'],
+            'Tipo': ['GASTO'] * 4,
+        })
+        archivo = io.BytesIO()
+        with pd.ExcelWriter(archivo, engine='openpyxl') as writer:
+            egresos.to_excel(writer, sheet_name='REGISTRO EGRESOS', index=False, startrow=5)
+        archivo.seek(0)
+        archivo.name = 'egresos.xlsx'
+        self.client.post(reverse('importar_excel'), {'archivo_excel': archivo})
+        self.assertEqual(Ingreso.objects.filter(n_documento='F-9').count(), 2)
+
+        resultado = conciliacion.conciliar(tolerancia=3)
+        # El documento gana aunque el ingreso sin documento sea del mismo día
+        self.assertEqual(resultado['nuevas'], {'DOCUMENTO': 1, 'MONTO_FECHA': 0, 'AGRUPADO': 2})
+        pares = dict(Conciliacion.objects.values_list('ingreso__descripcion_movimiento', 'movimiento__monto'))
+        self.assertEqual(pares, {'factura 123': 5000, 'parte 1': 3000, 'parte 2': 3000})
+
+
+class DuplicadosTest(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Samka')
+        self.otra = Empresa.objects.create(nombre='Maquehue')
+
+    def _ing(self, fecha, monto, texto, empresa=None):
+        return Ingreso.objects.create(fecha=fecha, empresa=empresa or self.empresa,
+                                      monto_transferencia=monto, descripcion_movimiento=texto)
+
+    def test_bloques_similitud_e_incremental(self):
+        original = self._ing('2025-03-10', 15000, 'Pago peaje Ruta 5 - Marzo')
+        copia = self._ing('2025-03-12', 15000, 'PAGO PEAJE RUTA 5 MARZO.')
+        self._ing('2025-03-16', 15000, 'Pago peaje Ruta 5 - Marzo')            # fuera de la ventana
+        self._ing('2025-03-10', 15001, 'Pago peaje Ruta 5 - Marzo')            # otro monto
+        self._ing('2025-03-10', 15000, 'Pago peaje Ruta 5 - Marzo', self.otra)  # otra empresa
+        self._ing('2025-03-11', 15000, 'Arriendo bodega Temuco')               # texto distinto
+
+        resultado = duplicados.buscar(ventana=2, umbral=0.85)
+        self.assertEqual(resultado['nuevos'], 1)
+        par = PosibleDuplicado.objects.get()
+        self.assertEqual((par.ingreso, par.duplicado, par.diferencia_dias), (original, copia, 2))
+        self.assertEqual(par.estado, 'PENDIENTE')
+
+        # El par descartado no reaparece; solo la fila nueva se compara
+        par.estado = 'DESCARTADO'
+        par.save()
+        ultimo_id = Ingreso.objects.latest('id').id
+        nueva = self._ing('2025-03-11', 15000, 'Pago peaje ruta 5 marzo')
+        resultado = duplicados.buscar(desde_id=ultimo_id, ventana=2, umbral=0.85)
+        self.assertEqual(resultado['filas'], 1)
+        self.assertEqual(resultado['nuevos'], 2)
+        self.assertEqual(set(PosibleDuplicado.objects.filter(duplicado=nueva).values_list('ingreso', flat=True)),
+                         {original.pk, copia.pk})
+        self.assertEqual(PosibleDuplicado.objects.get(ingreso=original, duplicado=copia).estado, 'DESCARTADO')
+
+
+class AdminConsultasTest(TestCase):
+    LISTADOS = ('ingreso', 'trabajador', 'producto', 'lote', 'movimientostock', 'conciliacion',
+                'posibleduplicado', 'perfil', 'egreso')
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='password123')
+        self.client.force_login(self.admin)
+        self.creados = 0
+
+    def _poblar(self, n):
+        # Cada fila con sus propios catálogos: una consulta por fila se notaría
+        for _ in range(n):
+            i = self.creados = self.creados + 1
+            empresa = Empresa.objects.create(nombre=f'Empresa {i}')
+            centro = CentroCosto.objects.create(nombre=f'Centro {i}')
+            clasificacion = Clasificacion.objects.create(nombre=f'Clasificación {i}')
+            ingreso = Ingreso.objects.create(fecha=datetime.date(2025, 1, i), empresa=empresa, centro_costo=centro,
+                                             clasificacion=clasificacion, monto_transferencia=1000 * i)
+            copia = Ingreso.objects.create(fecha=datetime.date(2025, 1, i), empresa=empresa, monto_transferencia=1000 * i)
+            PosibleDuplicado.objects.create(ingreso=ingreso, duplicado=copia, similitud=1)
+            movimiento = Movimiento.objects.create(fecha=datetime.date(2025, 1, i), descripcion='banco', tipo='EGRESO',
+                                                   monto=1000 * i)
+            Conciliacion.objects.create(movimiento=movimiento, ingreso=ingreso, regla='MONTO_FECHA')
+            Trabajador.objects.create(empresa=empresa, nombre=f'Trabajador {i}', rut=f'{10_000_000 + i}-{i % 10}',
+                                      cargo=Cargo.objects.create(nombre=f'Cargo {i}'))
+            producto = Producto.objects.create(codigo=f'P{i}', nombre=f'Producto {i}')
+            lote = Lote.objects.create(producto=producto, numero_lote=f'L{i}', fecha_vencimiento=datetime.date(2026, 1, i), cantidad=i)
+            MovimientoStock.objects.create(tipo='ENTRADA', producto=producto, lote=lote, numero_lote=lote.numero_lote,
+                                           cantidad=i, usuario=self.admin)
+            Egreso.objects.create(fecha=datetime.date(2025, 1, i), monto_transferencia=i, estado='PAGADO',
+                                  clasificacion=clasificacion)
+            Perfil.objects.create(user=User.objects.create_user(username=f'usuario{i}'))
+
+    def _consultas(self):
+        conteos = {}
+        for modelo in self.LISTADOS:
+            url = reverse(f'admin:core_{modelo}_changelist')
+            self.client.get(url)  # llena el cache de catálogos de los filtros
+            with CaptureQueriesContext(connection) as consultas:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            conteos[modelo] = len(consultas)
+        return conteos
+
+    def test_consultas_constantes_por_listado(self):
+        self._poblar(2)
+        pocos = self._consultas()
+        self._poblar(4)
+        self.assertEqual(self._consultas(), pocos)
+
+    def test_stock_anotado_y_filtro_por_catalogo(self):
+        self._poblar(3)
+        respuesta = self.client.get(reverse('admin:core_producto_changelist'), {'o': '-3'})
+        self.assertEqual([p.stock_total for p in respuesta.context['cl'].result_list], [3, 2, 1])
+
+        empresa = Empresa.objects.get(nombre='Empresa 2')
+        respuesta = self.client.get(reverse('admin:core_ingreso_changelist'), {'empresa__id__exact': empresa.pk})
+        self.assertEqual(respuesta.context['cl'].result_count, 2)
+        self.assertEqual(self.client.get(reverse('admin:core_ingreso_changelist'),
+                                         {'empresa__id__exact': 'x'}).status_code, 302)
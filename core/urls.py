@@ -25,12 +25,15 @@ urlpatterns = [
     path('caja-chica/eliminar/<int:id>/', views.caja_chica_eliminar, name='caja_chica_eliminar'),
     
     path('caja-chica/exportar/', views.exportar_caja_chica_pdf, name='exportar_caja_chica_pdf'),
+    path('caja-chica/exportar/<str:trabajo>/', views.descargar_caja_chica_pdf, name='descargar_caja_chica_pdf'),
 
     # --- RRHH Y OTROS ---
     path('rrhh/', views.dashboard_rrhh, name='dashboard_rrhh'),
     path('rrhh/importar/', views.importar_rrhh, name='importar_rrhh'),
     path('rrhh/nuevo/', views.nuevo_trabajador, name='nuevo_trabajador'),
     path('rrhh/editar/<int:id>/', views.editar_trabajador, name='editar_trabajador'),
+    path('rrhh/masivo/', views.operaciones_masivas_rrhh, name='operaciones_masivas_rrhh'),
+    path('rrhh/analitica/', views.api_rrhh_analitica, name='api_rrhh_analitica'),
 
     # --- USUARIO ---
     path('perfil/', views.perfil_usuario, name='perfil_usuario'),
@@ -38,19 +41,26 @@ urlpatterns = [
     path('logout/', auth_views.LogoutView.as_view(next_page='login'), name='logout'),
 
     path('api/entrenar-ia/', views.api_entrenar_ia, name='api_entrenar_ia'),
+    path('api/estado-ia/', views.api_estado_ia, name='api_estado_ia'),
     path('api/predecir/', views.api_predecir_categoria, name='api_predecir_categoria'),
+    path('api/predecir/lote/', views.api_predecir_lote, name='api_predecir_lote'),
 
     path('finanzas/', views.finanzas_dashboard, name='finanzas_dashboard'),
     path('finanzas/importar/', views.importar_finanzas, name='importar_finanzas'),
+    path('api/finanzas/pivot/', views.api_pivot_ingresos, name='api_pivot_ingresos'),
+    path('api/finanzas/conciliacion/', views.api_conciliacion, name='api_conciliacion'),
 
     path('inventario/', views.inventario_dashboard, name='inventario_dashboard'),
     path('inventario/nuevo-lote/', views.ingresar_lote, name='ingresar_lote'),
+    path('inventario/carga-masiva/', views.carga_masiva_lotes, name='carga_masiva_lotes'),
+    path('api/inventario/lotes/', views.api_lotes_masivo, name='api_lotes_masivo'),
     path('inventario/salida/', views.salida_stock, name='salida_stock'),
     path('inventario/enviar-alerta/', views.enviar_alerta_vencimientos, name='enviar_alerta'),
 
     path('datos/', views.centro_datos, name='centro_datos'),
     path('datos/exportar-finanzas/', views.exportar_finanzas_csv, name='export_finanzas'),
     path('datos/exportar-stock/', views.exportar_inventario_csv, name='export_stock'),
+    path('datos/exportar-stock-historico/', views.exportar_stock_historico_csv, name='export_stock_historico'),
 
     path('reportes/excel/', views.exportar_excel, name='exportar_excel'),
 ]
@@ -0,0 +1,57 @@
+# core/views/__init__.py
+"""
+Vistas de `core`, una sub-vista por módulo del ERP.
+
+Aquí solo se re-exportan (core/urls.py usa `views.<nombre>` y sistema/urls.py
+importa CustomLoginView). Ningún sub-módulo importa pandas, openpyxl, sklearn ni
+joblib al cargarse: cada vista los importa cuando los necesita, así un worker
+arranca sin pagar esas librerías hasta la primera importación/exportación o
+predicción. `manage.py benchmark_arranque` mide el costo de cada módulo.
+"""
+from .permisos import es_bodega, es_finanzas, es_rrhh
+from .inicio import dashboard
+from .finanzas import (
+    api_conciliacion,
+    api_pivot_ingresos,
+    descargar_plantilla,
+    editar_ingreso,
+    eliminar_ingreso,
+    finanzas_dashboard,
+    importar_excel,
+    importar_finanzas,
+    lista_ingresos,
+    nuevo_ingreso,
+)
+from .caja import (
+    caja_chica_crear,
+    caja_chica_editar,
+    caja_chica_eliminar,
+    descargar_caja_chica_pdf,
+    exportar_caja_chica_pdf,
+    lista_caja_chica,
+)
+from .rrhh import (
+    api_rrhh_analitica,
+    dashboard_rrhh,
+    editar_trabajador,
+    importar_rrhh,
+    nuevo_trabajador,
+    operaciones_masivas_rrhh,
+)
+from .inventario import (
+    api_lotes_masivo,
+    carga_masiva_lotes,
+    enviar_alerta_vencimientos,
+    ingresar_lote,
+    inventario_dashboard,
+    salida_stock,
+)
+from .usuarios import AdminLoginView, CustomLoginView, perfil_usuario, registro_usuario
+from .ia import api_entrenar_ia, api_estado_ia, api_predecir_categoria, api_predecir_lote
+from .export import (
+    centro_datos,
+    exportar_excel,
+    exportar_finanzas_csv,
+    exportar_inventario_csv,
+    exportar_stock_historico_csv,
+)
@@ -0,0 +1,157 @@
+# core/views/caja.py
+"""Caja chica: listado con cursor, CRUD y rendición en PDF (core/reportes/caja_chica.py)."""
+import re
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from ..forms import CajaChicaForm
+from ..models import CajaChica
+from ..reportes.caja_chica import (
+    filtrar_gastos,
+    filtros_desde_request,
+    estado_pdf,
+    gastos_por_mes,
+    pagina_cursor,
+    solicitar_pdf_caja_chica,
+    totales_gastos,
+)
+from .permisos import es_finanzas
+
+TRABAJO_VALIDO = re.compile(r'[0-9a-f]{64}')  # clave_cache(): sha256 en hex
+
+
+@login_required
+@user_passes_test(es_finanzas)
+def lista_caja_chica(request):
+    filtros = filtros_desde_request(request.GET)
+    gastos = filtrar_gastos(filtros).con_iva()
+
+    try:
+        per_page = min(max(int(request.GET.get('per_page', 25)), 10), 100)
+    except ValueError:
+        per_page = 25
+    pagina = pagina_cursor(
+        gastos,
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        por_pagina=per_page,
+    )
+    context = {
+        'gastos': pagina['gastos'],
+        'cursor_siguiente': pagina['siguiente'],
+        'cursor_anterior': pagina['anterior'],
+    }
+
+    # --- RESPUESTA AJAX ---
+    if request.GET.get('modo_ajax'):
+        respuesta = {
+            'html_tabla': render_to_string('core/partials/tabla_caja_chica.html', context, request=request),
+            'html_paginacion': render_to_string('core/partials/paginacion_cursor.html', context, request=request),
+        }
+        # Al cambiar de página los filtros no cambian: totales y gráfico se quedan como están
+        if not request.GET.get('solo_tabla'):
+            labels, data = gastos_por_mes(gastos)
+            respuesta.update({
+                'totales': totales_gastos(gastos),
+                'grafico_labels': labels,
+                'grafico_data': data,
+            })
+        return JsonResponse(respuesta)
+
+    # --- RESPUESTA NORMAL ---
+    labels, data = gastos_por_mes(gastos)
+    context.update({
+        'totales': totales_gastos(gastos),
+        'labels_grafico': labels,
+        'data_grafico': data,
+        'filtros': filtros,
+        'tipos_documento': CajaChica.TIPOS_DOCUMENTO,
+        'per_page': per_page,
+    })
+    return render(request, 'core/caja_chica_lista.html', context)
+
+@login_required
+def caja_chica_crear(request):
+    if request.method == 'POST':
+        form = CajaChicaForm(request.POST, request.FILES)
+        if form.is_valid():
+            gasto = form.save(commit=False)
+            gasto.responsable = request.user
+            gasto.save()
+            messages.success(request, 'Gasto registrado correctamente.')
+            return redirect('lista_caja_chica')
+    else:
+        form = CajaChicaForm()
+    return render(request, 'core/caja_chica_form.html', {'form': form, 'titulo': 'Nuevo Gasto'})
+
+@login_required
+def caja_chica_editar(request, id):
+    gasto = get_object_or_404(CajaChica, id=id)
+    if request.method == 'POST':
+        form = CajaChicaForm(request.POST, request.FILES, instance=gasto)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Gasto actualizado.')
+            return redirect('lista_caja_chica')
+    else:
+        form = CajaChicaForm(instance=gasto)
+    return render(request, 'core/caja_chica_form.html', {'form': form, 'titulo': 'Editar Gasto'})
+
+@login_required
+def caja_chica_eliminar(request, id):
+    gasto = get_object_or_404(CajaChica, id=id)
+    gasto.delete()
+    messages.success(request, 'Gasto eliminado.')
+    return redirect('lista_caja_chica')
+
+def _pdf_pendiente(request, trabajo):
+    """202 mientras el pool renderiza: JSON con modo_ajax, si no una página que reintenta sola."""
+    url_descarga = reverse('descargar_caja_chica_pdf', args=[trabajo])
+    if request.GET.get('modo_ajax'):
+        return JsonResponse({'trabajo': trabajo, 'estado': 'pendiente', 'url': url_descarga}, status=202)
+    return render(request, 'core/caja_chica_generando.html', {'url_descarga': url_descarga}, status=202)
+
+def _respuesta_trabajo(request, trabajo):
+    """El PDF si terminó, 202 si sigue en el pool, 500 si falló, 404 si no existe o es de otro usuario."""
+    estado, detalle = estado_pdf(trabajo, request.user)
+    if estado == 'listo':
+        return FileResponse(
+            open(detalle, 'rb'),
+            content_type='application/pdf',
+            filename='rendicion_caja_chica.pdf',
+        )
+    if estado == 'pendiente':
+        return _pdf_pendiente(request, trabajo)
+    if estado == 'error':
+        return HttpResponse(f"Error al generar el PDF: {detalle}", status=500)
+    raise Http404("El reporte venció o no existe; vuelva a exportarlo.")
+
+@login_required
+def exportar_caja_chica_pdf(request):
+    """
+    Rendición en PDF filtrada por fecha/responsable, cacheada en disco.
+    Si ya está renderizada se descarga de inmediato; si no, se encarga al pool y se
+    responde 202 con el id del trabajo (descargar_caja_chica_pdf lo entrega al terminar).
+    """
+    filtros = filtros_desde_request(request.GET)
+    try:
+        trabajo, _listo = solicitar_pdf_caja_chica(
+            filtros, request.user, base_url=request.build_absolute_uri()
+        )
+    except Exception as e:
+        print(f"Error PDF: {e}")
+        return HttpResponse(f"Error al generar el PDF: {str(e)}", status=500)
+
+    return _respuesta_trabajo(request, trabajo)
+
+@login_required
+def descargar_caja_chica_pdf(request, trabajo):
+    """Consulta (polling) y descarga del trabajo encargado por exportar_caja_chica_pdf."""
+    if not TRABAJO_VALIDO.fullmatch(trabajo):
+        raise Http404
+    return _respuesta_trabajo(request, trabajo)
@@ -0,0 +1,162 @@
+# core/views/export.py
+"""Centro de datos: exportaciones CSV y reporte Excel (openpyxl se importa al exportar)."""
+import csv
+import datetime
+
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse
+from django.shortcuts import render
+
+from .. import archivo
+from ..inventario import stock_en_fecha
+from ..models import Ingreso, Lote, Movimiento, Producto
+
+
+@login_required
+def centro_datos(request):
+    return render(request, 'core/exportar_datos.html')
+
+@login_required
+def exportar_finanzas_csv(request):
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="dataset_finanzas.csv"'
+
+    writer = csv.writer(response)
+    writer.writerow(['ID', 'Fecha', 'Año', 'Mes', 'Tipo', 'Empresa', 'Centro Costo', 'Clasificacion', 'Descripcion', 'Detalle', 'Monto'])
+
+    movimientos = Ingreso.objects.select_related('empresa', 'centro_costo', 'clasificacion').all().order_by('-fecha')
+
+    for mov in movimientos:
+        writer.writerow([
+            mov.id,
+            mov.fecha,
+            mov.fecha.year,
+            mov.fecha.month,
+            mov.tipo_documento,
+            mov.empresa.nombre if mov.empresa else 'Sin Asignar',
+            mov.centro_costo.nombre if mov.centro_costo else 'General',
+            mov.clasificacion.nombre if mov.clasificacion else 'Sin Clasificar',
+            mov.descripcion_movimiento,
+            mov.detalle,
+            mov.monto_transferencia
+        ])
+
+    # Años archivados (core/archivo.py), del más reciente al más antiguo
+    if archivo.anios_archivados():
+        archivados = archivo.leer('ingreso').sort_values(['fecha', 'id'], ascending=False)
+        for mov in archivados.to_dict('records'):
+            writer.writerow([
+                mov['id'],
+                mov['fecha'],
+                mov['fecha'].year,
+                mov['fecha'].month,
+                mov['tipo_documento'],
+                mov['empresa__nombre'] or 'Sin Asignar',
+                mov['centro_costo__nombre'] or 'General',
+                mov['clasificacion__nombre'] or 'Sin Clasificar',
+                mov['descripcion_movimiento'],
+                mov['detalle'],
+                mov['monto_transferencia']
+            ])
+
+    return response
+
+@login_required
+def exportar_inventario_csv(request):
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="dataset_stock_actual.csv"'
+
+    writer = csv.writer(response)
+    writer.writerow(['SKU', 'Producto', 'Categoria', 'Nro Lote', 'Fecha Vencimiento', 'Dias para Vencer', 'Estado', 'Cantidad Stock'])
+
+    lotes = Lote.objects.con_estado().order_by('fecha_vencimiento').values_list(
+        'producto__codigo', 'producto__nombre', 'producto__categoria',
+        'numero_lote', 'fecha_vencimiento', 'vence_en', 'semaforo', 'cantidad'
+    )
+
+    for codigo, nombre, categoria, numero_lote, vencimiento, vence_en, semaforo, cantidad in lotes.iterator(chunk_size=2000):
+        writer.writerow([
+            codigo,
+            nombre,
+            categoria,
+            numero_lote,
+            vencimiento,
+            vence_en.days,
+            semaforo.replace('_', ' '),
+            cantidad
+        ])
+
+    return response
+
+@login_required
+def exportar_stock_historico_csv(request):
+    """Stock por producto a una fecha dada (?fecha=YYYY-MM-DD), desde el libro de movimientos."""
+    fecha_txt = request.GET.get('fecha') or ''
+    try:
+        fecha = datetime.date.fromisoformat(fecha_txt) if fecha_txt else datetime.date.today()
+    except ValueError:
+        return HttpResponse("Fecha inválida. Use el formato AAAA-MM-DD.", status=400)
+
+    saldos = stock_en_fecha(fecha)
+    productos = Producto.objects.in_bulk(list(saldos))
+
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="dataset_stock_{fecha.isoformat()}.csv"'
+
+    writer = csv.writer(response)
+    writer.writerow(['Fecha Corte', 'SKU', 'Producto', 'Categoria', 'Cantidad Stock'])
+    for producto in sorted(productos.values(), key=lambda p: p.nombre):
+        writer.writerow([fecha, producto.codigo, producto.nombre, producto.categoria, saldos[producto.id]])
+
+    return response
+
+def exportar_excel(request):
+    import openpyxl
+    from openpyxl.styles import Alignment, Font, PatternFill
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Reporte Financiero"
+
+    headers = ['ID', 'Fecha', 'Tipo', 'Categoría', 'Descripción', 'Monto']
+    ws.append(headers)
+
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+    
+    for cell in ws[1]:
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = Alignment(horizontal="center")
+
+    movimientos = Movimiento.objects.all().order_by('-fecha')
+
+    for mov in movimientos:
+        ws.append([
+            mov.id,
+            mov.fecha.strftime('%d/%m/%Y'),
+            mov.tipo,
+            str(mov.categoria),
+            mov.descripcion,
+            mov.monto
+        ])
+
+    dim_holder = {}
+    for col in range(ws.min_column, ws.max_column + 1):
+        dim_holder[col] = 0
+        
+    for row in ws.iter_rows():
+        for cell in row:
+            if cell.value:
+                dim_holder[cell.column] = max((dim_holder[cell.column], len(str(cell.value))))
+    
+    for col, width in dim_holder.items():
+        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = width + 2
+
+    response = HttpResponse(
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    response['Content-Disposition'] = 'attachment; filename="Reporte_Finanzas.xlsx"'
+    
+    wb.save(response)
+    return response
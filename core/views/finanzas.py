@@ -0,0 +1,523 @@
+# core/views/finanzas.py
+"""
+Finanzas: dashboard de movimientos (.xlsm), CRUD de ingresos/gastos e importadores.
+pandas se importa dentro de los importadores, no al cargar el módulo.
+"""
+import datetime
+import io
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+
+from .. import archivo, conciliacion, duplicados, pivot
+from ..forms import CargaExcelForm, IngresoForm
+from ..ia import clasificar_ingresos, solicitar_entrenamiento
+from ..impuestos import calcular_iva_vectorizado
+from ..models import CentroCosto, Clasificacion, Empresa, Ingreso, Movimiento
+from ..particiones import rango_periodo
+from ..services import filtrar_ingresos, filtros_ingresos
+from .permisos import es_finanzas
+
+
+def _texto_celda(valor, largo):
+    """Celda de Excel -> texto recortado a `largo` o None. 123.0 -> '123' (N° de documento)."""
+    if valor is None or valor != valor:  # vacío / NaN
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    texto = str(valor).strip()
+    return texto[:largo] if texto and texto.lower() != 'nan' else None
+
+
+# =========================================================
+# 2. MÓDULO FINANZAS (Control de Movimientos .xlsm)
+# =========================================================
+@login_required
+@user_passes_test(es_finanzas)
+def finanzas_dashboard(request):
+    """Dashboard Financiero con Filtros de Fecha."""
+    
+    # 1. Capturar Filtros
+    anio = request.GET.get('anio')
+    mes = request.GET.get('mes')
+
+    # Queryset base (todos los movimientos)
+    queryset = Movimiento.objects.all()
+
+    # Aplicar filtros si existen (rango de fechas: Postgres solo lee la partición del año)
+    rango = rango_periodo(anio, mes) if anio else None
+    if rango:
+        queryset = queryset.filter(fecha__gte=rango[0], fecha__lt=rango[1])
+
+    # Año archivado (core/archivo.py): se resume el Parquet junto con lo que siga en la tabla
+    archivado = None
+    if rango and archivo.esta_archivado(anio):
+        archivado = archivo.resumen_movimientos(*rango, por_dia=bool(mes))
+
+    # 2. Calcular KPIs
+    if archivado:
+        total_ingresos, total_egresos = archivado['total_ingresos'], archivado['total_egresos']
+    else:
+        total_ingresos = queryset.filter(tipo='INGRESO').aggregate(Sum('monto'))['monto__sum'] or 0
+        total_egresos = queryset.filter(tipo='EGRESO').aggregate(Sum('monto'))['monto__sum'] or 0
+    balance = total_ingresos - total_egresos
+
+    # 3. Datos para Gráfico de Evolución
+    if archivado:
+        evolucion = archivado['evolucion']
+        formato_fecha = "%d %b" if mes else "%B %Y"
+    elif anio and mes:
+        # Agrupar por DÍA
+        evolucion = queryset.annotate(fecha_trunc=TruncDay('fecha'))\
+                            .values('fecha_trunc')\
+                            .annotate(
+                                ingreso=Sum('monto', filter=Q(tipo='INGRESO')),
+                                egreso=Sum('monto', filter=Q(tipo='EGRESO'))
+                            ).order_by('fecha_trunc')
+        formato_fecha = "%d %b"
+    else:
+        # Agrupar por MES
+        evolucion = queryset.annotate(fecha_trunc=TruncMonth('fecha'))\
+                            .values('fecha_trunc')\
+                            .annotate(
+                                ingreso=Sum('monto', filter=Q(tipo='INGRESO')),
+                                egreso=Sum('monto', filter=Q(tipo='EGRESO'))
+                            ).order_by('fecha_trunc')
+        formato_fecha = "%B %Y"
+
+    labels_evolucion = []
+    data_ingresos = []
+    data_egresos = []
+
+    for e in evolucion:
+        if e['fecha_trunc']:
+            labels_evolucion.append(e['fecha_trunc'].strftime(formato_fecha))
+            data_ingresos.append(e['ingreso'] or 0)
+            data_egresos.append(e['egreso'] or 0)
+
+    # 4. Obtener Años Disponibles (los de la tabla y los archivados)
+    anios = {fecha.year for fecha in Movimiento.objects.dates('fecha', 'year')}
+    anios.update(archivo.anios_archivados())
+    anios_disponibles = [datetime.date(a, 1, 1) for a in sorted(anios, reverse=True)]
+
+    context = {
+        'total_ingresos': total_ingresos,
+        'total_egresos': total_egresos,
+        'balance': balance,
+        'movimientos': archivado['movimientos'] if archivado else queryset.order_by('-fecha')[:50],
+        'pie_labels': ['Ingresos', 'Egresos'],
+        'pie_data': [total_ingresos, total_egresos],
+        'bar_labels': labels_evolucion,
+        'bar_ingresos': data_ingresos,
+        'bar_egresos': data_egresos,
+        'anios_disponibles': anios_disponibles,
+        'anio_seleccionado': int(anio) if anio else None,
+        'mes_seleccionado': int(mes) if mes else None,
+    }
+    return render(request, 'core/finanzas/dashboard.html', context)
+
+@login_required
+def importar_finanzas(request):
+    """Importador Específico para Hoja 'Control de Finanzas'"""
+    import pandas as pd
+
+    if request.method == 'POST' and request.FILES.get('archivo_excel'):
+        archivo = request.FILES['archivo_excel']
+        try:
+            df = pd.read_excel(
+                archivo, 
+                engine='openpyxl', 
+                sheet_name='Control de Finanzas',
+                header=12,
+            )
+            # Columnas B:H (N° de documento y banco son opcionales: las hojas antiguas llegan hasta F)
+            df = df.iloc[:, 1:8]
+            nuevos_nombres = ['FECHA', 'DESCRIPCION', 'TIPO', 'CATEGORIA', 'MONTO', 'N_DOCUMENTO', 'BANCO']
+            if len(df.columns) >= 5:
+                df.columns = nuevos_nombres[:len(df.columns)]
+            
+            creados = 0
+            
+            with transaction.atomic():
+                for index, row in df.iterrows():
+                    fecha = row.get('FECHA')
+                    if pd.isnull(fecha) or str(fecha).strip() == '': continue
+
+                    desc = str(row.get('DESCRIPCION', '')).strip()
+                    if desc == 'nan': desc = 'Sin detalle'
+
+                    categoria = str(row.get('CATEGORIA', '')).strip()
+                    if categoria and categoria != 'nan':
+                        desc = f"{categoria} - {desc}"
+
+                    try:
+                        val_monto = row.get('MONTO', 0)
+                        if isinstance(val_monto, str):
+                             val_monto = val_monto.replace('$', '').replace('.', '').replace(',', '')
+                        monto = abs(int(float(val_monto)))
+                    except:
+                        monto = 0
+                        
+                    if monto == 0: continue
+
+                    tipo_texto = str(row.get('TIPO', '')).upper()
+                    tipo_final = 'EGRESO' 
+                    if 'INGRESO' in tipo_texto or 'ABONO' in tipo_texto:
+                        tipo_final = 'INGRESO'
+                    
+                    Movimiento.objects.create(
+                        fecha=fecha,
+                        descripcion=desc,
+                        monto=monto,
+                        tipo=tipo_final,
+                        n_documento=_texto_celda(row.get('N_DOCUMENTO'), 100),
+                        banco=_texto_celda(row.get('BANCO'), 100),
+                    )
+                    creados += 1
+
+                if creados:
+                    transaction.on_commit(conciliacion.solicitar)
+
+            if creados > 0:
+                messages.success(request, f'¡Excelente! Se cargaron {creados} registros.')
+            else:
+                messages.warning(request, 'Se leyó la hoja, pero no se encontraron filas válidas.')
+                
+            return redirect('finanzas_dashboard')
+
+        except Exception as e:
+            if "Worksheet" in str(e) and "does not exist" in str(e):
+                messages.error(request, 'Error: No se encontró la hoja llamada "Control de Finanzas".')
+            else:
+                messages.error(request, f"Error técnico: {str(e)}")
+            print(f"Error Finanzas: {e}")
+
+    return render(request, 'core/finanzas/importar.html')
+
+
+# =========================================================
+# 3. MÓDULO INGRESOS / GASTOS (CRUD Clásico)
+# =========================================================
+@login_required
+@user_passes_test(es_finanzas)
+def lista_ingresos(request):
+    # 1. Base Query + 2. Filtros (core/services.py, los mismos del pivot de ingresos)
+    filtros = filtros_ingresos(request.GET)
+    movimientos = filtrar_ingresos(
+        filtros, Ingreso.objects.select_related('empresa', 'centro_costo', 'clasificacion'),
+    )
+    f_inicio = request.GET.get('fecha_inicio')
+    f_fin = request.GET.get('fecha_fin')
+
+    # 3. Ordenamiento
+    orden = request.GET.get('orden', 'fecha_desc')
+    if orden == 'fecha_asc': movimientos = movimientos.order_by('fecha')
+    elif orden == 'fecha_desc': movimientos = movimientos.order_by('-fecha')
+    elif orden == 'monto_asc': movimientos = movimientos.order_by('monto_transferencia')
+    elif orden == 'monto_desc': movimientos = movimientos.order_by('-monto_transferencia')
+    else: movimientos = movimientos.order_by('-fecha')
+
+    # 4. Preparar Datos para el Gráfico (LÓGICA INTELIGENTE DÍA/MES)
+    agrupar_por_dia = False
+    
+    if f_inicio and f_fin:
+        try:
+            d1 = datetime.datetime.strptime(f_inicio, '%Y-%m-%d')
+            d2 = datetime.datetime.strptime(f_fin, '%Y-%m-%d')
+            dias_diff = abs((d2 - d1).days)
+            if dias_diff <= 60:
+                agrupar_por_dia = True
+        except ValueError:
+            pass 
+
+    if agrupar_por_dia:
+        datos_grafico = movimientos.annotate(periodo=TruncDay('fecha'))\
+                                   .values('periodo')\
+                                   .annotate(total=Sum('monto_transferencia'))\
+                                   .order_by('periodo')
+        labels_grafico = [d['periodo'].strftime('%d/%m') for d in datos_grafico] if datos_grafico else []
+    else:
+        datos_grafico = movimientos.annotate(periodo=TruncMonth('fecha'))\
+                                   .values('periodo')\
+                                   .annotate(total=Sum('monto_transferencia'))\
+                                   .order_by('periodo')
+        labels_grafico = [d['periodo'].strftime('%Y-%m') for d in datos_grafico] if datos_grafico else []
+
+    data_grafico = [d['total'] for d in datos_grafico] if datos_grafico else []
+
+    # 5. Paginación
+    per_page = request.GET.get('per_page', 25)
+    paginator = Paginator(movimientos, per_page)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+
+    # --- RESPUESTA AJAX ---
+    if request.GET.get('modo_ajax'):
+        html_tabla = render_to_string('core/partials/tabla_ingresos.html', {'page_obj': page_obj}, request=request)
+        html_paginacion = render_to_string('core/partials/paginacion.html', {'page_obj': page_obj}, request=request)
+        
+        return JsonResponse({
+            'html_tabla': html_tabla,
+            'html_paginacion': html_paginacion,
+            'grafico_labels': labels_grafico,
+            'grafico_data': data_grafico
+        })
+
+    # --- RESPUESTA NORMAL ---
+    context = {
+        'page_obj': page_obj,
+        'empresas': Empresa.objects.all(),
+        'centros': CentroCosto.objects.all(),
+        'clasificaciones': Clasificacion.objects.all(),
+        'labels_grafico': labels_grafico,
+        'data_grafico': data_grafico,
+        'orden_sel': orden,
+        'per_page': int(per_page),
+        'inicio_sel': f_inicio,
+        'fin_sel': f_fin,
+        'revision_sel': filtros['revision'],
+        'total_revision': Ingreso.objects.filter(requiere_revision=True).count(),
+    }
+    return render(request, 'core/lista_ingresos.html', context)
+
+@login_required
+def nuevo_ingreso(request):
+    if request.method == 'POST':
+        form = IngresoForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Registro guardado correctamente.')
+            return redirect('dashboard')
+    else:
+        form = IngresoForm()
+    
+    return render(request, 'core/nuevo_ingreso.html', {'form': form})
+
+@login_required
+def editar_ingreso(request, id):
+    ingreso = get_object_or_404(Ingreso, id=id)
+    if request.method == 'POST':
+        form = IngresoForm(request.POST, instance=ingreso)
+        if form.is_valid():
+            ingreso = form.save(commit=False)
+            # Una persona revisó la clasificación: pasa a ser dato de entrenamiento
+            ingreso.clasificado_por_ia = False
+            ingreso.requiere_revision = False
+            ingreso.save()
+            messages.success(request, 'Registro actualizado correctamente.')
+            return redirect('lista_ingresos')
+    else:
+        form = IngresoForm(instance=ingreso)
+    return render(request, 'core/editar_ingreso.html', {'form': form, 'ingreso': ingreso})
+
+@login_required
+def eliminar_ingreso(request, id):
+    ingreso = get_object_or_404(Ingreso, id=id)
+    ingreso.delete()
+    messages.success(request, 'Registro eliminado correctamente.')
+    return redirect('lista_ingresos')
+
+@login_required
+@user_passes_test(es_finanzas)
+def api_pivot_ingresos(request):
+    """
+    GET ?filas=empresa,clasificacion&columnas=mes&medidas=monto_transferencia:sum,iva:avg
+    más los filtros de lista_ingresos; &formato=xlsx descarga la tabla cruzada.
+    Cubos cacheados (core/pivot.py): roll-ups y cortes de un cubo más fino no van a la base.
+    """
+    def _lista(nombre, defecto=''):
+        return [v.strip() for v in (request.GET.get(nombre) or defecto).split(',') if v.strip()]
+
+    try:
+        consulta, resultado, origen = pivot.pivotear(
+            _lista('filas'), _lista('columnas'),
+            _lista('medidas', 'monto_transferencia:sum'),
+            filtros_ingresos(request.GET),
+        )
+    except pivot.ConsultaInvalida as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    encabezados, filas = pivot.tabla(resultado, consulta)
+
+    if request.GET.get('formato') == 'xlsx':
+        import openpyxl
+        from openpyxl.styles import Font
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Pivot Ingresos"
+        ws.append(encabezados)
+        for celda in ws[1]:
+            celda.font = Font(bold=True)
+        for fila in filas:
+            ws.append(fila)
+        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        response['Content-Disposition'] = 'attachment; filename="pivot_ingresos.xlsx"'
+        wb.save(response)
+        return response
+
+    return JsonResponse({
+        'filas': consulta['filas'],
+        'columnas': consulta['columnas'],
+        'medidas': consulta['medidas'],
+        'origen': origen,
+        'datos': resultado.to_dict('records'),
+        'encabezados': encabezados,
+        'tabla': filas,
+    })
+
+@login_required
+@user_passes_test(es_finanzas)
+def api_conciliacion(request):
+    """
+    GET: conciliados por regla, cuántos quedan pendientes y los últimos sin conciliar
+    (?limite=, máx. 1000). POST: concilia lo pendiente ahora (core/conciliacion.py).
+    """
+    if request.method == 'POST':
+        return JsonResponse(conciliacion.conciliar())
+    try:
+        limite = min(max(int(request.GET.get('limite', 100)), 0), 1000)
+    except ValueError:
+        limite = 100
+    return JsonResponse(conciliacion.resumen(limite))
+
+@login_required
+def importar_excel(request):
+    """Importador con AUTO-CREACIÓN de Categorías y Centros de Costo"""
+    import pandas as pd
+
+    if request.method == 'POST':
+        form = CargaExcelForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = request.FILES['archivo_excel']
+            creados = 0
+            
+            try:
+                try:
+                    df = pd.read_excel(archivo, sheet_name='REGISTRO EGRESOS', header=5)
+                except:
+                    df = pd.read_excel(archivo, header=5)
+
+                df.columns = df.columns.str.strip()
+
+                if 'Fecha' not in df.columns or 'Monto Transferencia' not in df.columns:
+                    messages.error(request, 'Error: No se encontraron columnas "Fecha" o "Monto Transferencia" en la fila 6.')
+                    return redirect('importar_excel')
+
+                # Catálogos resueltos una vez por nombre (no un get_or_create por fila)
+                catalogos = {Empresa: {}, CentroCosto: {}, Clasificacion: {}}
+
+                def _catalogo(modelo, nombre):
+                    nombre = str(nombre or '').strip()
+                    if not nombre or nombre.lower() == 'nan':
+                        return None
+                    cache = catalogos[modelo]
+                    if nombre.lower() not in cache:
+                        cache[nombre.lower()], _ = modelo.objects.get_or_create(
+                            nombre__iexact=nombre,
+                            defaults={'nombre': nombre}
+                        )
+                    return cache[nombre.lower()]
+
+                with transaction.atomic():
+                    nuevos = []
+                    for index, row in df.iterrows():
+                        fecha = row.get('Fecha')
+                        if pd.isnull(fecha): continue
+                        
+                        monto = row.get('Monto Transferencia', 0)
+                        if pd.isnull(monto) or monto == 0: continue
+
+                        # 1. Empresa / 2. Centro de Costo / 3. Clasificación
+                        empresa_obj = _catalogo(Empresa, row.get('Empresa', ''))
+                        centro_obj = _catalogo(CentroCosto, row.get('Centro de Costo', ''))
+                        clasif_obj = _catalogo(Clasificacion, row.get('Clasificación', ''))
+
+                        desc_movimiento = str(row.get('Descripcion de Movimiento', 'Sin descripción')).strip()
+                        if desc_movimiento.lower() == 'nan': desc_movimiento = 'Sin descripción'
+
+                        detalle_txt = str(row.get('Detalle', '')).strip()
+                        if detalle_txt.lower() == 'nan': detalle_txt = ''
+
+                        tipo_doc = str(row.get('Tipo', 'GASTO')).strip()
+                        
+                        ingreso = Ingreso(
+                            fecha=fecha,
+                            monto_transferencia=monto,
+                            descripcion_movimiento=desc_movimiento,
+                            tipo_documento=tipo_doc,
+                            detalle=detalle_txt,
+                            n_documento=_texto_celda(row.get('N° DOCUMENTO'), 50),  # lo usa la conciliación
+                            empresa=empresa_obj,
+                            centro_costo=centro_obj,
+                            clasificacion=clasif_obj,
+                        )
+                        nuevos.append(ingreso)
+
+                    # IVA de todas las filas en una pasada (bulk_create no llama a save())
+                    ivas = calcular_iva_vectorizado(
+                        [i.monto_transferencia for i in nuevos], [i.tipo_documento for i in nuevos]
+                    )
+                    for ingreso, iva in zip(nuevos, ivas.tolist()):
+                        ingreso.iva = iva
+
+                    # 4. Clasificación automática de las filas sin categoría (una predicción por lote)
+                    clasificados = clasificar_ingresos(nuevos)
+                    Ingreso.objects.bulk_create(nuevos, batch_size=1000)
+                    transaction.on_commit(Ingreso.invalidar_cubos)
+                    creados = len(nuevos)
+
+                    # Los datos nuevos sirven para reentrenar (se junta con otras solicitudes)
+                    if creados:
+                        transaction.on_commit(solicitar_entrenamiento)
+                        # Conciliación bancaria y posibles duplicados de lo recién cargado
+                        transaction.on_commit(conciliacion.solicitar)
+                        ids = [i.pk for i in nuevos]
+                        transaction.on_commit(lambda: duplicados.solicitar(ids))
+
+                por_revisar = sum(1 for i in nuevos if i.requiere_revision)
+                messages.success(request, f'¡Listo! Se cargaron {creados} registros y se crearon las categorías faltantes automáticamente.')
+                if clasificados:
+                    messages.info(request, f'La IA clasificó {clasificados} registros; {por_revisar} quedaron marcados para revisión.')
+
+            except Exception as e:
+                messages.error(request, f"Error técnico: {str(e)}")
+                print(f"Error completo: {e}")
+                
+            return redirect('importar_excel')
+    else:
+        form = CargaExcelForm()
+        
+    return render(request, 'core/importar.html', {'form': form})
+
+@login_required
+def descargar_plantilla(request):
+    import pandas as pd
+
+    ejemplo = {
+        'Fecha': ['01/12/2025'],
+        'Empresa': ['Nombre Empresa'],
+        'Centro de Costo': ['Administracion'],
+        'Clasificación': ['Insumos'],
+        'N° DOCUMENTO': ['12345'],
+        'Monto Transferencia': [50000],
+        'Descripcion de Movimiento': ['Compra'],
+        'Estado': ['Pagado'],
+        'Detalle': ['Papeleria'],
+        'Tipo': ['GASTO']
+    }
+    df = pd.DataFrame(ejemplo)
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='REGISTRO EGRESOS', index=False, startrow=5)
+    
+    buffer.seek(0)
+    response = HttpResponse(buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    response['Content-Disposition'] = 'attachment; filename=plantilla_importacion.xlsx'
+    return response
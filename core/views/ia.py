@@ -0,0 +1,66 @@
+# core/views/ia.py
+"""
+API de la IA (core/ia.py). sklearn, numpy y joblib se cargan recién cuando se
+entrena o se predice por primera vez en el proceso.
+"""
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from ..ia import MAX_TEXTOS_LOTE, leer_estado, solicitar_entrenamiento, sugerir_tipos
+
+
+@login_required
+def api_entrenar_ia(request):
+    """Solicita un reentrenamiento; los clics repetidos se juntan en una sola corrida."""
+    estado = solicitar_entrenamiento()
+    return JsonResponse({'status': 'ok', **estado})
+
+@login_required
+def api_estado_ia(request):
+    return JsonResponse(leer_estado())
+
+@login_required
+def api_predecir_categoria(request):
+    texto = request.GET.get('texto', '')
+    resultados = sugerir_tipos([texto])
+    if resultados is None:
+        return JsonResponse({'categoria': None, 'modelo_disponible': False})
+    return JsonResponse({
+        'categoria': resultados[0]['tipo'],
+        'confianza': resultados[0]['confianza'],
+        'sugerencias': resultados[0]['sugerencias'],
+        'modelo_disponible': True,
+    })
+
+@login_required
+def api_predecir_lote(request):
+    """
+    POST JSON: {"textos": ["peaje ruta 5", ...], "k": 3, "umbral": 0.5}
+    Clasifica todas las descripciones en una sola llamada al modelo.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+
+    if isinstance(payload, list):
+        payload = {'textos': payload}
+    textos = payload.get('textos') if isinstance(payload, dict) else None
+    if not isinstance(textos, list):
+        return JsonResponse({'error': 'Se esperaba una lista en "textos"'}, status=400)
+    if len(textos) > MAX_TEXTOS_LOTE:
+        return JsonResponse({'error': f'Máximo {MAX_TEXTOS_LOTE} textos por solicitud'}, status=400)
+    try:
+        k = int(payload.get('k', 3))
+        umbral = float(payload['umbral']) if payload.get('umbral') is not None else None
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Parámetros k/umbral inválidos'}, status=400)
+
+    resultados = sugerir_tipos(textos, k=k, umbral=umbral)
+    if resultados is None:
+        return JsonResponse({'error': 'La IA aún no está entrenada', 'modelo_disponible': False}, status=503)
+    return JsonResponse({'resultados': resultados, 'modelo_disponible': True})
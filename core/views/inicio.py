@@ -0,0 +1,55 @@
+# core/views/inicio.py
+"""Dashboard general (Página de Inicio)."""
+import datetime
+
+from django.contrib.auth.decorators import login_required
+from django.db.models import Sum
+from django.shortcuts import render
+
+from ..models import Ingreso, Lote, Trabajador
+
+
+@login_required
+def dashboard(request):
+    """VISTA PRINCIPAL: COMANDO CENTRAL"""
+    hoy = datetime.date.today()
+    inicio_mes = hoy.replace(day=1)
+
+    # Definimos qué palabras clave cuentan como dinero entrando
+    tipos_entrada = ['INGRESO', 'VENTA', 'ABONO', 'DEVOLUCION']
+
+    # 1. KPI FINANCIEROS (Mes Actual)
+    # A. GASTOS: Sumamos todo lo que NO sea entrada
+    total_gastos = Ingreso.objects.filter(
+        fecha__gte=inicio_mes
+    ).exclude(tipo_documento__in=tipos_entrada).aggregate(total=Sum('monto_transferencia'))['total'] or 0
+
+    # B. INGRESOS: Sumamos solo lo que sea entrada
+    total_ingresos = Ingreso.objects.filter(
+        fecha__gte=inicio_mes,
+        tipo_documento__in=tipos_entrada
+    ).aggregate(total=Sum('monto_transferencia'))['total'] or 0
+
+    resultado_mes = total_ingresos - total_gastos
+
+    # 2. KPI INVENTARIO (semáforo en una sola consulta)
+    semaforo = Lote.objects.resumen_estados(hoy)
+    stock_vencido = semaforo['vencidos']
+    stock_critico = semaforo['por_vencer']
+
+    # 3. KPI RRHH
+    try:
+        personal_activo = Trabajador.objects.filter(fecha_finiquito__isnull=True).count()
+    except:
+        personal_activo = 0
+
+    context = {
+        'total_gastos': total_gastos,
+        'total_ingresos': total_ingresos,
+        'resultado_mes': resultado_mes,
+        'stock_vencido': stock_vencido,
+        'stock_critico': stock_critico,
+        'personal_activo': personal_activo,
+        'fecha_actual': hoy,
+    }
+    return render(request, 'core/dashboard.html', context)
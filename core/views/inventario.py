@@ -0,0 +1,223 @@
+# core/views/inventario.py
+"""Logística / inventario: semáforo de lotes, ingresos, carga masiva, salida FIFO y alertas."""
+import datetime
+import json
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q
+from django.http import JsonResponse
+from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
+
+from ..alertas import despachar_alertas
+from ..forms import LoteForm, SalidaStockForm
+from ..inventario import (
+    StockInsuficiente,
+    descontar_fifo,
+    ingresar_lotes_masivo,
+    leer_planilla_lotes,
+    registrar_entrada,
+)
+from ..models import Ingreso, Lote, Producto
+from .permisos import es_bodega
+
+
+@login_required
+@user_passes_test(es_bodega)
+def inventario_dashboard(request):
+    # 1. Base Query (Traemos lotes con sus productos y el semáforo calculado en SQL)
+    hoy = datetime.date.today()
+    lotes = Lote.objects.select_related('producto').con_estado(hoy).order_by('fecha_vencimiento')
+
+    # 2. Filtros
+    # Búsqueda Texto
+    q = request.GET.get('q')
+    if q:
+        lotes = lotes.filter(
+            Q(producto__nombre__icontains=q) |
+            Q(producto__codigo__icontains=q) |
+            Q(numero_lote__icontains=q)
+        )
+
+    # Filtro Categoría
+    categoria = request.GET.get('categoria')
+    if categoria:
+        lotes = lotes.filter(producto__categoria=categoria)
+
+    # Filtro Estado (Semáforo)
+    estado = request.GET.get('estado')
+    if estado:
+        lotes = lotes.en_estado(estado, hoy)
+
+    # 3. Datos para el Gráfico (Stock y semáforo por Categoría, una consulta agrupada)
+    resumen_categorias = list(lotes.resumen_por_categoria(hoy))
+    
+    labels_grafico = [d['producto__categoria'] for d in resumen_categorias]
+    data_grafico = [d['total_stock'] for d in resumen_categorias]
+
+    # 4. Paginación
+    paginator = Paginator(lotes, 20)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+
+    # 5. Respuesta AJAX
+    if request.GET.get('modo_ajax'):
+        html_tabla = render_to_string('core/partials/tabla_inventario.html', {'page_obj': page_obj}, request=request)
+        html_paginacion = render_to_string('core/partials/paginacion.html', {'page_obj': page_obj}, request=request)
+        
+        return JsonResponse({
+            'html_tabla': html_tabla,
+            'html_paginacion': html_paginacion,
+            'grafico_labels': labels_grafico,
+            'grafico_data': data_grafico,
+            'resumen_categorias': resumen_categorias,
+        })
+
+    # 6. Respuesta Normal
+    categorias = Producto.objects.values_list('categoria', flat=True).distinct()
+
+    context = {
+        'page_obj': page_obj,
+        'categorias': categorias,
+        'labels_grafico': labels_grafico,
+        'data_grafico': data_grafico,
+        'cat_sel': categoria,
+        'estado_sel': estado,
+    }
+    return render(request, 'core/inventario/dashboard.html', context)
+
+@login_required
+def ingresar_lote(request):
+    if request.method == 'POST':
+        form = LoteForm(request.POST)
+        if form.is_valid():
+            with transaction.atomic():
+                lote = form.save()
+                registrar_entrada(lote, request.user)
+            messages.success(request, 'Lote ingresado correctamente.')
+            return redirect('inventario_dashboard')
+    else:
+        form = LoteForm()
+    
+    return render(request, 'core/inventario/form_lote.html', {'form': form})
+
+@login_required
+@user_passes_test(es_bodega)
+def carga_masiva_lotes(request):
+    """Recepción de camión: muchos lotes desde una planilla .xlsx / .csv"""
+    resultado = None
+    if request.method == 'POST' and request.FILES.get('archivo'):
+        try:
+            filas = leer_planilla_lotes(request.FILES['archivo'])
+            resultado = ingresar_lotes_masivo(filas, usuario=request.user)
+        except Exception as e:
+            messages.error(request, f"Error al leer el archivo: {str(e)}")
+            print(f"Error Carga Lotes: {e}")
+        else:
+            if resultado['creados']:
+                messages.success(
+                    request,
+                    f"Se ingresaron {resultado['creados']} lotes "
+                    f"({resultado['productos_creados']} productos nuevos)."
+                )
+            if resultado['errores']:
+                messages.warning(request, f"{len(resultado['errores'])} filas con errores no se cargaron.")
+
+    return render(request, 'core/inventario/carga_masiva.html', {'resultado': resultado})
+
+@login_required
+@user_passes_test(es_bodega)
+def api_lotes_masivo(request):
+    """
+    POST JSON: {"lotes": [{"codigo", "numero_lote", "fecha_vencimiento", "cantidad",
+                           "nombre"?, "categoria"?, "fecha_elaboracion"?}, ...]}
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+
+    if isinstance(payload, list):
+        payload = {'lotes': payload}
+    filas = payload.get('lotes') if isinstance(payload, dict) else None
+    if not isinstance(filas, list):
+        return JsonResponse({'error': 'Se esperaba una lista en "lotes"'}, status=400)
+    crear_productos = payload.get('crear_productos', True)
+    if not isinstance(crear_productos, bool):  # "false" sería verdadero con bool()
+        return JsonResponse({'error': '"crear_productos" debe ser true o false'}, status=400)
+
+    resultado = ingresar_lotes_masivo(filas, crear_productos=crear_productos, usuario=request.user)
+    return JsonResponse({
+        'creados': resultado['creados'],
+        'productos_creados': resultado['productos_creados'],
+        'errores': resultado['errores'],
+    }, status=200 if resultado['creados'] or not resultado['errores'] else 400)
+
+@login_required
+@user_passes_test(es_bodega)
+def salida_stock(request):
+    """Descuenta stock usando lógica FIFO"""
+    if request.method == 'POST':
+        form = SalidaStockForm(request.POST)
+        if form.is_valid():
+            producto = form.cleaned_data['producto']
+            cantidad_solicitada = form.cleaned_data['cantidad']
+            precio_total = form.cleaned_data['precio_total']
+
+            try:
+                with transaction.atomic():
+                    # A. Lógica FIFO: revisa el stock con los lotes bloqueados y queda en el libro
+                    descontar_fifo(
+                        producto, cantidad_solicitada, request.user,
+                        referencia=f"Venta de {cantidad_solicitada} x {producto.nombre}"
+                    )
+
+                    # B. Lógica FINANCIERA
+                    Ingreso.objects.create(
+                        fecha=datetime.date.today(),
+                        tipo_documento='VENTA', 
+                        monto_transferencia=precio_total,
+                        descripcion_movimiento=f"Venta de {cantidad_solicitada} x {producto.nombre}",
+                        detalle="Generado automáticamente desde Inventario",
+                        clasificacion=None, 
+                        empresa=None 
+                    )
+                
+                messages.success(request, f'¡Venta registrada! Stock descontado y ${precio_total} ingresados a caja.')
+                return redirect('inventario_dashboard')
+
+            except StockInsuficiente as e:
+                messages.error(request, f"Error: {e}")
+            except Exception as e:
+                messages.error(request, f"Error al procesar la venta: {e}")
+
+    else:
+        form = SalidaStockForm()
+
+    return render(request, 'core/inventario/form_salida.html', {'form': form})
+
+@login_required
+def enviar_alerta_vencimientos(request):
+    """Envía al usuario actual el informe de lotes en riesgo (mismo motor que el comando programado)"""
+    if not request.user.email:
+        messages.error(request, 'Tu usuario no tiene un correo registrado.')
+        return redirect('inventario_dashboard')
+
+    try:
+        resumen = despachar_alertas(destinatarios=[request.user], deduplicar=False)
+    except Exception as e:
+        messages.error(request, f'Error al enviar correo: {str(e)}')
+        print(f"Error Email: {e}")
+        return redirect('inventario_dashboard')
+
+    if not resumen['lotes']:
+        messages.info(request, 'No hay productos en riesgo para reportar.')
+    else:
+        messages.success(request, f'Informe enviado correctamente a {request.user.email}')
+
+    return redirect('inventario_dashboard')
@@ -0,0 +1,17 @@
+# core/views/permisos.py
+"""
+Funciones de seguridad (Permisos) para user_passes_test.
+Los grupos salen de la sesión (core/sesion.py), no de una consulta por vista.
+"""
+from ..sesion import grupos_de
+
+
+def es_finanzas(user):
+    # Pasa si es Superusuario O pertenece al grupo Finanzas
+    return user.is_superuser or 'Finanzas' in grupos_de(user)
+
+def es_bodega(user):
+    return user.is_superuser or 'Bodega' in grupos_de(user)
+
+def es_rrhh(user):
+    return user.is_superuser or 'RRHH' in grupos_de(user)
@@ -0,0 +1,331 @@
+# core/views/rrhh.py
+"""RRHH: trabajadores, finiquitos, importador, operaciones masivas y analítica."""
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .. import rrhh, rut as rut_util
+from ..forms import OperacionMasivaTrabajadoresForm, TrabajadorForm
+from ..models import Cargo, Empresa, Trabajador
+from .permisos import es_rrhh
+
+
+@login_required
+@user_passes_test(es_rrhh)
+def dashboard_rrhh(request):
+    # La empresa se filtra por id (índice de la FK), ya no por un LIKE sobre el nombre
+    filtro_empresa = request.GET.get('empresa', '')
+    empresa_id = int(filtro_empresa) if filtro_empresa.isdigit() else None
+
+    workers_queryset = Trabajador.objects.all()
+    if empresa_id:
+        workers_queryset = workers_queryset.filter(empresa_id=empresa_id)
+
+    # 1. KPIs: activos / finiquitados de todas las empresas en una sola consulta
+    resumen_empresas = list(Trabajador.objects.resumen_por_empresa())
+    for fila in resumen_empresas:
+        fila['total'] = fila['activos'] + fila['finiquitados']
+    total_activos = sum(f['activos'] for f in resumen_empresas)
+    total_finiquitados = sum(f['finiquitados'] for f in resumen_empresas)
+
+    nombre_empresa_seleccionada = "Todas las Empresas"
+    if empresa_id:
+        nombre_empresa_seleccionada = next(
+            (f['empresa__nombre'] for f in resumen_empresas if f['empresa_id'] == empresa_id),
+            None
+        ) or Empresa.objects.filter(pk=empresa_id).values_list('nombre', flat=True).first() or "Empresa sin trabajadores"
+
+    # 2. Gráfico: costo mensual de finiquitos
+    finiquitos = workers_queryset.filter(fecha_finiquito__isnull=False)\
+                                 .annotate(mes=TruncMonth('fecha_finiquito'))\
+                                 .values('mes')\
+                                 .annotate(total=Sum('monto_finiquito'))\
+                                 .order_by('mes')
+
+    labels_grafico = [f.get('mes').strftime('%Y-%m') for f in finiquitos if f.get('mes')]
+    data_grafico = [int(f.get('total') or 0) for f in finiquitos if f.get('mes')]
+
+    # 3. Listado paginado (empresa y cargo en el mismo JOIN)
+    lista_trabajadores = workers_queryset.select_related('empresa', 'cargo').order_by('empresa', 'nombre')
+    paginator = Paginator(lista_trabajadores, 25)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    if request.GET.get('modo_ajax') == 'true':
+        html_tabla = render_to_string(
+            'core/partials/tabla_trabajadores.html', 
+            {'page_obj': page_obj},
+            request=request
+        )
+        html_paginacion = render_to_string('core/partials/paginacion.html', {'page_obj': page_obj}, request=request)
+        return JsonResponse({
+            'html_tabla': html_tabla,
+            'html_paginacion': html_paginacion,
+            'labels_grafico': labels_grafico,
+            'data_grafico': data_grafico,
+            'titulo_pagina': nombre_empresa_seleccionada
+        })
+
+    context = {
+        'page_obj': page_obj,
+        'resumen_empresas': resumen_empresas,
+        'empresa_sel': empresa_id,
+        'labels_grafico': labels_grafico,
+        'data_grafico': data_grafico,
+        'nombre_empresa': nombre_empresa_seleccionada,
+        'total_activos': total_activos,
+        'total_finiquitados': total_finiquitados,
+    }
+    return render(request, 'core/dashboard_rrhh.html', context)
+
+@login_required
+def importar_rrhh(request):
+    """Importador Avanzado RRHH"""
+    import pandas as pd
+
+    if request.method == 'POST' and request.FILES.get('archivo_excel'):
+        archivo = request.FILES['archivo_excel']
+        try:
+            xls = pd.ExcelFile(archivo, engine='openpyxl')
+            hojas = xls.sheet_names
+            texto_hojas = "".join(str(h).upper() for h in hojas)
+            
+            empresa_archivo = None
+            if "SAMKA" in texto_hojas and "MAQUEHUE" not in texto_hojas:
+                empresa_archivo, _ = Empresa.objects.get_or_create(nombre="Samka SPA")
+            elif "MAQUEHUE" in texto_hojas and "SAMKA" not in texto_hojas:
+                empresa_archivo, _ = Empresa.objects.get_or_create(nombre="Maquehue SPA")
+            
+            trabajadores_batch = {} 
+            ruts_invalidos = 0
+            
+            for nombre_hoja in hojas:
+                nombre_upper = str(nombre_hoja).upper()
+                empresa_hoja = None
+                if "SAMKA" in nombre_upper:
+                    empresa_hoja, _ = Empresa.objects.get_or_create(nombre="Samka SPA")
+                elif "MAQUEHUE" in nombre_upper:
+                    empresa_hoja, _ = Empresa.objects.get_or_create(nombre="Maquehue SPA")
+                
+                if not empresa_hoja and ("FINIQUITADO" in nombre_upper or "PERSONAL" in nombre_upper):
+                    empresa_hoja = empresa_archivo
+                
+                if not empresa_hoja: continue 
+
+                df = pd.read_excel(archivo, sheet_name=nombre_hoja)
+                df.columns = df.columns.str.strip().str.upper()
+
+                if 'RUT' not in df.columns or 'NOMBRE' not in df.columns: continue
+
+                es_hoja_finiquito = "FINIQUITADO" in nombre_upper or "PERSONAL" in nombre_upper
+
+                # RUT canónico de toda la columna de una vez; los inválidos se informan al final
+                df['RUT_CANONICO'] = rut_util.normalizar_serie(df['RUT'])
+                vacios = df['RUT'].isna() | (df['RUT'].astype(str).str.strip() == '')
+                ruts_invalidos += int((df['RUT_CANONICO'].isna() & ~vacios).sum())
+
+                for index, row in df[df['RUT_CANONICO'].notna()].iterrows():
+                    rut = row['RUT_CANONICO']
+
+                    nombre = str(row.get('NOMBRE', '')).strip()
+                    cargo_txt = str(row.get('CARGO', 'Operario')).strip()
+                    if cargo_txt.upper() == 'NAN': cargo_txt = 'Operario'
+                    
+                    fecha_inicio = row.get('CONTRATO')
+                    if pd.isnull(fecha_inicio): fecha_inicio = None
+                    
+                    fecha_fin = row.get('FINIQUITO')
+                    if pd.isnull(fecha_fin) or isinstance(fecha_fin, (int, float)):
+                         fecha_fin = None
+                    
+                    monto = 0
+                    if 'FINIQUITO.1' in df.columns:
+                        val_monto = row.get('FINIQUITO.1', 0)
+                        if isinstance(val_monto, (int, float)) and not pd.isna(val_monto):
+                            monto = val_monto
+                    
+                    estado_nuevo = 'ACTIVO'
+                    if fecha_fin or es_hoja_finiquito:
+                        estado_nuevo = 'FINIQUITADO'
+
+                    if rut in trabajadores_batch:
+                        previo = trabajadores_batch[rut]
+                        if previo['estado'] == 'FINIQUITADO':
+                            if not previo['fecha_contrato'] and fecha_inicio:
+                                previo['fecha_contrato'] = fecha_inicio
+                            if not previo['monto_finiquito'] and monto > 0:
+                                previo['monto_finiquito'] = monto
+                            if not previo['fecha_finiquito'] and fecha_fin:
+                                previo['fecha_finiquito'] = fecha_fin
+                        continue
+                    
+                    trabajadores_batch[rut] = {
+                        'nombre': nombre,
+                        'cargo_txt': cargo_txt,
+                        'empresa': empresa_hoja,
+                        'fecha_contrato': fecha_inicio,
+                        'fecha_finiquito': fecha_fin,
+                        'monto_finiquito': monto,
+                        'estado': estado_nuevo
+                    }
+
+            # Existentes por RUT canónico (índice único) y cargos resueltos una vez por nombre
+            existentes = Trabajador.objects.in_bulk(list(trabajadores_batch), field_name='rut')
+            cargos = {}
+
+            def _cargo(nombre):
+                if nombre.lower() not in cargos:
+                    cargos[nombre.lower()], _ = Cargo.objects.get_or_create(
+                        nombre__iexact=nombre,
+                        defaults={'nombre': nombre}
+                    )
+                return cargos[nombre.lower()]
+
+            nuevos, modificados = [], []
+            ahora = timezone.now()
+            for rut, data in trabajadores_batch.items():
+                valores = {
+                    'nombre': data['nombre'],
+                    'cargo': _cargo(data['cargo_txt']),
+                    'empresa': data['empresa'],
+                    'fecha_contrato': data['fecha_contrato'],
+                    'estado': data['estado']
+                }
+                
+                if data['fecha_finiquito']:
+                    valores['fecha_finiquito'] = data['fecha_finiquito']
+                elif data['estado'] == 'ACTIVO':
+                    valores['fecha_finiquito'] = None
+                    
+                if data['monto_finiquito'] > 0:
+                    valores['monto_finiquito'] = data['monto_finiquito']
+
+                trabajador = existentes.get(rut)
+                if trabajador is None:
+                    nuevos.append(Trabajador(rut=rut, **valores))
+                    continue
+                for campo, valor in valores.items():
+                    setattr(trabajador, campo, valor)
+                trabajador.fecha_modificacion = ahora  # bulk_update no dispara auto_now
+                modificados.append(trabajador)
+
+            with transaction.atomic():
+                Trabajador.objects.bulk_create(nuevos, batch_size=500)
+                Trabajador.objects.bulk_update(
+                    modificados,
+                    ['nombre', 'cargo', 'empresa', 'fecha_contrato', 'estado',
+                     'fecha_finiquito', 'monto_finiquito', 'fecha_modificacion'],
+                    batch_size=500
+                )
+            cache.delete(Empresa.CACHE_OPCIONES_RRHH)  # bulk_create no dispara señales
+            creados, actualizados = len(nuevos), len(modificados)
+
+            if ruts_invalidos:
+                messages.warning(request, f'{ruts_invalidos} filas omitidas por RUT inválido.')
+            messages.success(request, f'Procesado correctamente: {creados} nuevos, {actualizados} actualizados.')
+            return redirect('dashboard_rrhh')
+
+        except Exception as e:
+            print(f"ERROR IMPT: {e}")
+            messages.error(request, f"Error al importar: {str(e)}")
+
+    return render(request, 'core/importar_rrhh.html')
+
+@login_required
+def nuevo_trabajador(request):
+    if request.method == 'POST':
+        form = TrabajadorForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Trabajador registrado.')
+            return redirect('dashboard_rrhh')
+    else:
+        form = TrabajadorForm()
+    return render(request, 'core/nuevo_trabajador.html', {'form': form})
+
+@login_required
+def editar_trabajador(request, id):
+    trabajador = get_object_or_404(Trabajador, id=id)
+    if request.method == 'POST':
+        form = TrabajadorForm(request.POST, instance=trabajador)
+        if form.is_valid():
+            form.save()
+            messages.success(request, f'Datos de {trabajador.nombre} actualizados.')
+            return redirect('dashboard_rrhh')
+    else:
+        form = TrabajadorForm(instance=trabajador)
+    return render(request, 'core/nuevo_trabajador.html', {'form': form, 'titulo': 'Editar Trabajador'})
+
+@login_required
+@user_passes_test(es_rrhh)
+def operaciones_masivas_rrhh(request):
+    """
+    Finiquito / edición masiva en dos pasos: 'previsualizar' muestra a quiénes afecta
+    y cómo quedan; 'aplicar' hace un solo bulk_update y deja la auditoría.
+    """
+    form = OperacionMasivaTrabajadoresForm(request.POST or None)
+    vista_previa = None
+    no_encontrados = []
+
+    if request.method == 'POST' and form.is_valid():
+        datos = form.cleaned_data
+        trabajadores, no_encontrados = rrhh.seleccionar_trabajadores(
+            empresa_id=datos.get('empresa'),
+            cargo_id=datos['cargo'].pk if datos.get('cargo') else None,
+            solo_activos=datos.get('solo_activos'),
+            ruts=datos.get('ruts'),
+        )
+        try:
+            if request.POST.get('accion') == 'aplicar':
+                operacion = rrhh.aplicar_masivo(
+                    trabajadores, form.cambios(), usuario=request.user,
+                    criterio=form.criterio(), firma=datos.get('firma') or None,
+                )
+                messages.success(request, f'{operacion.cantidad} trabajadores actualizados (operación #{operacion.id}).')
+                return redirect('dashboard_rrhh')
+            vista_previa = rrhh.previsualizar_masivo(trabajadores, form.cambios())
+        except rrhh.OperacionInvalida as e:
+            messages.error(request, str(e))
+            vista_previa = rrhh.previsualizar_masivo(trabajadores, form.cambios())
+
+    return render(request, 'core/rrhh_masivo.html', {
+        'form': form,
+        'vista_previa': vista_previa,
+        'no_encontrados': no_encontrados,
+    })
+
+@login_required
+@user_passes_test(es_rrhh)
+def api_rrhh_analitica(request):
+    """
+    GET ?desde=2025-01-01&hasta=2025-12-31&empresa=<id>
+    Antigüedad por tramos, dotación mensual y rotación por empresa/cargo (core/rrhh.py, cacheado).
+    """
+    try:
+        hasta = parse_date(request.GET.get('hasta', '')) or timezone.localdate()
+        desde = parse_date(request.GET.get('desde', '')) or hasta.replace(year=hasta.year - 1, day=1)
+    except ValueError:
+        return JsonResponse({'error': 'Fechas inválidas (formato AAAA-MM-DD).'}, status=400)
+    if desde > hasta:
+        return JsonResponse({'error': '"desde" no puede ser posterior a "hasta".'}, status=400)
+
+    trabajadores = None
+    filtro_empresa = request.GET.get('empresa', '')
+    if filtro_empresa.isdigit():
+        trabajadores = Trabajador.objects.filter(empresa_id=int(filtro_empresa))
+
+    return JsonResponse({
+        'desde': desde,
+        'hasta': hasta,
+        'antiguedad': rrhh.distribucion_antiguedad(hoy=hasta, trabajadores=trabajadores),
+        'dotacion': rrhh.dotacion_mensual(desde, hasta, trabajadores=trabajadores),
+        'rotacion': rrhh.rotacion(desde, hasta, trabajadores=trabajadores),
+    })
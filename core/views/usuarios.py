@@ -0,0 +1,63 @@
+# core/views/usuarios.py
+"""Usuarios y login."""
+from django.contrib import messages
+from django.contrib.auth import update_session_auth_hash
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.forms import PasswordChangeForm
+from django.contrib.auth.models import Group
+from django.contrib.auth.views import LoginView
+from django.shortcuts import redirect, render
+
+from ..forms import RegistroUsuarioForm
+
+
+@login_required
+def registro_usuario(request):
+    if not request.user.is_superuser:
+        messages.error(request, 'Acceso denegado.')
+        return redirect('dashboard')
+
+    if request.method == 'POST':
+        form = RegistroUsuarioForm(request.POST)
+        if form.is_valid():
+            user = form.save()
+            try:
+                grupo = Group.objects.get(name='Digitadores')
+                user.groups.add(grupo)
+            except Group.DoesNotExist: pass
+            messages.success(request, f'Usuario {user.username} creado.')
+            return redirect('dashboard')
+    else:
+        form = RegistroUsuarioForm()
+    return render(request, 'registration/registro.html', {'form': form})
+
+@login_required
+def perfil_usuario(request):
+    if request.method == 'POST':
+        form = PasswordChangeForm(request.user, request.POST)
+        if form.is_valid():
+            user = form.save()
+            update_session_auth_hash(request, user) 
+            messages.success(request, 'Contraseña actualizada.')
+            return redirect('perfil_usuario')
+    else:
+        form = PasswordChangeForm(request.user)
+    return render(request, 'core/perfil.html', {'form': form})
+
+class CustomLoginView(LoginView):
+    """Login para usuarios normales (Azul)"""
+    template_name = 'core/login.html'
+    redirect_authenticated_user = True 
+
+    def form_valid(self, form):
+        recuerdame = self.request.POST.get('recuerdame')
+        if recuerdame:
+            self.request.session.set_expiry(1209600)
+        else:
+            self.request.session.set_expiry(0)
+        return super().form_valid(form)
+
+class AdminLoginView(CustomLoginView):
+    """Login para administradores (Oscuro)"""
+    template_name = 'core/login_admin.html'
+    redirect_authenticated_user = False
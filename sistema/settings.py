@@ -41,6 +41,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.sesion.ContextoUsuarioMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -151,4 +152,75 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
 # --- CONFIGURACIÓN DE LOGIN ---
-AUTHENTICATION_BACKENDS = ['core.backends.EmailBackend']
\ No newline at end of file
+AUTHENTICATION_BACKENDS = ['core.backends.EmailBackend']
+# Límite de intentos fallidos por cuenta y por IP dentro de la ventana (core/backends.py)
+LOGIN_VENTANA_SEGUNDOS = int(os.getenv('LOGIN_VENTANA_SEGUNDOS', '900'))
+LOGIN_MAX_FALLOS_CUENTA = int(os.getenv('LOGIN_MAX_FALLOS_CUENTA', '5'))
+LOGIN_MAX_FALLOS_IP = int(os.getenv('LOGIN_MAX_FALLOS_IP', '50'))
+
+# --- CACHE Y SESIONES ---
+# Con REDIS_URL el cache se comparte entre workers (sesiones, límite de intentos,
+# analítica RRHH); sin ella cada proceso tiene su cache en memoria y los grupos
+# no se guardan en la sesión (ver core/sesion.py). RedisCache usa el paquete redis.
+if os.getenv('REDIS_URL'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.getenv('REDIS_URL')}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# SESSION_BACKEND: cached_db (cache + respaldo en django_session), signed_cookies
+# (la sesión viaja firmada en la cookie, sin consultas) o db (la de Django por defecto)
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + {
+    'db': 'db',
+    'cached_db': 'cached_db',
+    'signed_cookies': 'signed_cookies',
+}[os.getenv('SESSION_BACKEND', 'cached_db')]
+# Grupos guardados en la sesión (core/sesion.py); se releen pasado este plazo
+SESION_CONTEXTO_SEGUNDOS = int(os.getenv('SESION_CONTEXTO_SEGUNDOS', '300'))
+
+# --- PARTICIONES ANUALES (core/particiones.py, solo PostgreSQL) ---
+# Años por delante del actual que se dejan creados en core_ingreso y core_movimiento
+PARTICIONES_ANIOS_ADELANTE = int(os.getenv('PARTICIONES_ANIOS_ADELANTE', '1'))
+
+# --- ARCHIVO HISTÓRICO (core/archivo.py) ---
+# Años cerrados exportados a Parquet con `manage.py archivar ANIO`
+ARCHIVO_DIR = os.getenv('ARCHIVO_DIR', os.path.join(BASE_DIR, 'archivo'))
+
+# --- CONCILIACIÓN BANCARIA (core/conciliacion.py) ---
+# Días de diferencia aceptados entre el cargo en el banco y el ingreso de la hoja de egresos
+CONCILIACION_TOLERANCIA_DIAS = int(os.getenv('CONCILIACION_TOLERANCIA_DIAS', '3'))
+
+# --- POSIBLES DUPLICADOS (core/duplicados.py) ---
+# Misma empresa y monto, fechas a esta distancia y descripción al menos así de parecida (0..1)
+DUPLICADOS_VENTANA_DIAS = int(os.getenv('DUPLICADOS_VENTANA_DIAS', '2'))
+DUPLICADOS_UMBRAL = float(os.getenv('DUPLICADOS_UMBRAL', '0.85'))
+
+# --- RRHH ---
+# Empresas que aparecen en los formularios de RRHH aunque aún no tengan trabajadores (ids separados por coma)
+RRHH_EMPRESAS_IDS = [int(i) for i in os.getenv('RRHH_EMPRESAS_IDS', '').split(',') if i.strip()]
+
+# --- ADMIN (core/admin.py) ---
+# Listados sin filtros de tablas más grandes que esto muestran el conteo estimado de PostgreSQL
+ADMIN_CONTEO_EXACTO_HASTA = int(os.getenv('ADMIN_CONTEO_EXACTO_HASTA', '10000'))
+ADMIN_MAX_OPCIONES_FILTRO = int(os.getenv('ADMIN_MAX_OPCIONES_FILTRO', '50'))
+
+# --- IA CAJA CHICA (core/ia.py) ---
+# Modelos versionados: modelos_ia/<familia>/vNNNN + puntero ACTUAL (ver core/almacen_ia.py)
+IA_MODELOS_DIR = os.getenv('IA_MODELOS_DIR', os.path.join(BASE_DIR, 'modelos_ia'))
+IA_MODELOS_MAX_VERSIONES = int(os.getenv('IA_MODELOS_MAX_VERSIONES', '10'))
+IA_INTERVALO_ENTRENAMIENTO = int(os.getenv('IA_INTERVALO_ENTRENAMIENTO', '300'))  # segundos
+IA_UMBRAL_CONFIANZA = float(os.getenv('IA_UMBRAL_CONFIANZA', '0.5'))  # bajo esto la IA no elige tipo
+
+# --- REPORTES PDF (core/reportes) ---
+# Los PDFs generados se guardan aquí, con nombre = hash(filtros + versión de datos)
+REPORTES_CACHE_DIR = os.getenv('REPORTES_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'reportes'))
+REPORTES_PDF_WORKERS = int(os.getenv('REPORTES_PDF_WORKERS', '2'))
+
+
+# --- CORREO (alertas de vencimiento: manage.py enviar_alertas_vencimiento) ---
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'webmaster@localhost')